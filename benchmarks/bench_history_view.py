@@ -0,0 +1,162 @@
+"""
+Бенчмарк page.update() для длинной истории чата.
+
+Сравнивает прежний список (ft.ListView со всеми сообщениями сессии)
+с ChatHistoryView (окно из HISTORY_WINDOW_SIZE пар сообщений) при 1k/10k
+сообщений. Для ChatHistoryView история сначала полностью прокручивается
+вверх и обратно, как это делает пользователь при долгой сессии.
+
+Страница Flet подключается к локальному соединению, которое сериализует
+команды так же, как сервер Flet, но не отправляет их клиенту: измеряется
+построение diff и его сериализация в потоке приложения.
+
+Запуск из корня проекта:
+    python benchmarks/bench_history_view.py --messages 1000 10000
+"""
+# Импорт необходимых библиотек
+import argparse  # Разбор аргументов командной строки
+import asyncio   # Цикл событий для страницы Flet
+import json      # Сериализация команд
+import os        # Работа с путями
+import sys       # Настройка пути импорта
+import tempfile  # Временная директория для базы
+import time      # Измерение времени
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import flet as ft  # noqa: E402
+from flet.core.local_connection import LocalConnection  # noqa: E402
+from flet.core.protocol import CommandEncoder, PageCommandsBatchResponsePayload  # noqa: E402
+
+from ui.components import ChatHistoryView, MessageBubble  # noqa: E402
+from ui.styles import AppStyles  # noqa: E402
+from utils.cache import ChatCache  # noqa: E402
+
+PAGE_SIZE = 10
+WINDOW_SIZE = 100
+
+
+class BenchConnection(LocalConnection):
+    """Соединение без клиента: команды обрабатываются и сериализуются в JSON."""
+
+    def __init__(self):
+        super().__init__()
+        self.sent_bytes = 0
+
+    def send_commands(self, session_id, commands):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ["add", "get"]:
+                results.append(result)
+            if message:
+                messages.append(message)
+        self.sent_bytes += len(json.dumps(messages, cls=CommandEncoder, separators=(",", ":")))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def send_command(self, session_id, command):
+        return self.send_commands(session_id, [command])
+
+
+def new_page():
+    """Страница Flet, подключенная к BenchConnection."""
+    conn = BenchConnection()
+    return ft.Page(conn, "bench", asyncio.new_event_loop()), conn
+
+
+def fill(cache, rows):
+    """Заполнение базы сообщениями одной транзакцией."""
+    conn = cache.get_connection()
+    conn.executemany(
+        'INSERT INTO messages (model, user_message, ai_response, timestamp, tokens_used) '
+        'VALUES (?, ?, ?, datetime(\'now\'), 0)',
+        ((f"model-{i % 3}", f"Вопрос {i}", f"Ответ {i} " * 20) for i in range(rows))
+    )
+    conn.commit()
+
+
+def measure(page, conn, chat_history, repeat):
+    """
+    Время page.update() после изменения последнего пузырька (токен потокового
+    ответа) и после добавления новой пары сообщений.
+    """
+    bubble = chat_history.controls[-1]
+    start = time.perf_counter()
+    for i in range(repeat):
+        bubble.append_text(" токен")
+        page.update()
+    token_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    sent = conn.sent_bytes
+    start = time.perf_counter()
+    for i in range(repeat):
+        pair = (MessageBubble(f"Новый вопрос {i}", True), MessageBubble(f"Новый ответ {i}", False))
+        if isinstance(chat_history, ChatHistoryView):
+            chat_history.append(*pair)
+            chat_history.mark_saved(pair[0])
+        else:
+            chat_history.controls.extend(pair)
+        page.update()
+    append_ms = (time.perf_counter() - start) * 1000 / repeat
+    return token_ms, append_ms, (conn.sent_bytes - sent) // repeat
+
+
+def bench_legacy(rows, repeat):
+    """Прежний список: все сообщения остаются в дереве элементов."""
+    page, conn = new_page()
+    chat_history = ft.ListView(**AppStyles.CHAT_HISTORY)
+    for i in range(rows):
+        chat_history.controls.extend([MessageBubble(f"Вопрос {i}", True),
+                                      MessageBubble(f"Ответ {i} " * 20, False)])
+    page.add(chat_history)
+    return measure(page, conn, chat_history, repeat), len(chat_history.controls)
+
+
+def bench_window(cache, rows, repeat):
+    """ChatHistoryView после прокрутки всей истории вверх и обратно."""
+    page, conn = new_page()
+    chat_history = ChatHistoryView(cache, page_size=PAGE_SIZE, window_size=WINDOW_SIZE,
+                                   **AppStyles.CHAT_HISTORY)
+    chat_history.load_latest()
+    page.add(chat_history)
+
+    start = time.perf_counter()
+    pages = 0
+    while not chat_history.history_exhausted:
+        chat_history.load_older()
+        pages += 1
+    while not chat_history.newer_exhausted:
+        chat_history.load_newer()
+        pages += 1
+    scroll_ms = (time.perf_counter() - start) * 1000 / max(pages, 1)
+
+    result = measure(page, conn, chat_history, repeat)
+    return result, len(chat_history.controls), scroll_ms, len(chat_history.pool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ListView vs ChatHistoryView page.update() benchmark")
+    parser.add_argument("--messages", type=int, nargs="+", default=[1000, 10000],
+                        help="Количество пар сообщений в истории")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого замера")
+    args = parser.parse_args()
+
+    print(f"{'messages':>8} {'view':8} {'controls':>8} {'token ms':>9} {'append ms':>10} {'bytes/append':>13}")
+    for rows in args.messages:
+        (token_ms, append_ms, sent), controls = bench_legacy(rows, args.repeat)
+        print(f"{rows:8d} {'legacy':8} {controls:8d} {token_ms:9.2f} {append_ms:10.2f} {sent:13d}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            cache = ChatCache(write_behind=False)
+            fill(cache, rows)
+            (token_ms, append_ms, sent), controls, scroll_ms, pooled = bench_window(cache, rows, args.repeat)
+            cache.close()
+            os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        print(f"{rows:8d} {'window':8} {controls:8d} {token_ms:9.2f} {append_ms:10.2f} {sent:13d}"
+              f"   (page load {scroll_ms:.2f} ms, pooled bubbles {pooled})")
+
+
+if __name__ == "__main__":
+    main()
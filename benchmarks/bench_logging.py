@@ -0,0 +1,95 @@
+"""
+Бенчмарк логирования AppLogger.
+
+Сравнивает прежнюю схему (каждый экземпляр AppLogger добавлял свои
+FileHandler и StreamHandler к общему логгеру, запись синхронная на уровне
+DEBUG) с текущей (один QueueHandler, запись в фоновом потоке, LOG_LEVEL).
+Измеряется время вызова в потоке приложения и количество записанных строк.
+
+Запуск из корня проекта:
+    python benchmarks/bench_logging.py --messages 20000 --instances 2
+"""
+# Импорт необходимых библиотек
+import argparse  # Разбор аргументов командной строки
+import logging   # Стандартная библиотека логирования
+import os        # Работа с путями
+import sys       # Настройка пути импорта и перенаправление консоли
+import tempfile  # Временная директория для логов
+import time      # Измерение времени
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import logger as app_logger  # noqa: E402
+
+
+def legacy_logger(logs_dir, instances):
+    """Прежняя схема: обработчики добавляются при каждом создании AppLogger."""
+    logger = logging.getLogger('LegacyChatApp')
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s',
+                                  datefmt='%Y-%m-%d %H:%M:%S')
+    for _ in range(instances):
+        file_handler = logging.FileHandler(os.path.join(logs_dir, 'legacy.log'), encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+    return logger
+
+
+def run(logger, messages):
+    """Запись сообщений вперемешку debug/info; возвращает время на вызов в мкс."""
+    start = time.perf_counter()
+    for i in range(messages):
+        if i % 4:
+            logger.debug(f"Making API request {i}")
+        else:
+            logger.info(f"Successfully received response from API {i}")
+    return (time.perf_counter() - start) / messages * 1e6
+
+
+def count_lines(logs_dir, prefix):
+    """Количество строк во всех файлах лога с указанным префиксом."""
+    total = 0
+    for name in os.listdir(logs_dir):
+        if name.startswith(prefix):
+            with open(os.path.join(logs_dir, name), encoding='utf-8') as f:
+                total += sum(1 for _ in f)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--instances', type=int, default=2,
+                        help='Количество экземпляров AppLogger (OpenRouterClient, ChatApp, ...)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as logs_dir:
+        # Консольный вывод обоих вариантов отправляется в /dev/null
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            legacy_us = run(legacy_logger(logs_dir, args.instances), args.messages)
+
+            os.environ.setdefault("LOG_LEVEL", "INFO")
+            logger = app_logger.setup_logging(logs_dir)
+            for _ in range(args.instances - 1):
+                app_logger.AppLogger()  # Повторные экземпляры не добавляют обработчиков
+            queued_us = run(logger, args.messages)
+            drain_start = time.perf_counter()
+            app_logger.shutdown_logging()  # Ожидание записи очереди
+            drain_ms = (time.perf_counter() - drain_start) * 1000
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+        print(f"{'scheme':10} {'us/call':>9} {'file lines':>11}")
+        print(f"{'legacy':10} {legacy_us:9.2f} {count_lines(logs_dir, 'legacy'):11d}")
+        print(f"{'queue':10} {queued_us:9.2f} {count_lines(logs_dir, 'chat_app'):11d}"
+              f"   (drain {drain_ms:.0f} ms, LOG_LEVEL={os.environ['LOG_LEVEL']})")
+
+
+if __name__ == '__main__':
+    main()
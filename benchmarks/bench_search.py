@@ -0,0 +1,82 @@
+"""
+Бенчмарк полнотекстового поиска по истории чата.
+
+Сравнивает ChatCache.search (индекс FTS5) с поиском через LIKE '%...%'
+на временной базе с заданным количеством сообщений.
+
+Запуск из корня проекта:
+    python benchmarks/bench_search.py --rows 200000
+"""
+# Импорт необходимых библиотек
+import argparse  # Разбор аргументов командной строки
+import os        # Работа с путями
+import random    # Генерация тестовых сообщений
+import sys       # Настройка пути импорта
+import tempfile  # Временная директория для базы
+import time      # Измерение времени
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.cache import ChatCache  # noqa: E402
+
+# Словарь для генерации текстов сообщений
+WORDS = (
+    "модель ответ запрос токен контекст история python sqlite индекс поиск "
+    "борщ рецепт погода код ошибка функция класс тест баланс кэш поток"
+).split()
+
+
+def fill(cache, rows):
+    """Заполнение базы случайными сообщениями одной транзакцией."""
+    conn = cache.get_connection()
+    conn.executemany(
+        'INSERT INTO messages (model, user_message, ai_response, timestamp, tokens_used) '
+        'VALUES (?, ?, ?, datetime(\'now\'), 0)',
+        (
+            (
+                random.choice(["model-a", "model-b"]),
+                " ".join(random.choices(WORDS, k=12)) + f" тег{random.randrange(max(rows // 10, 1)):06d}",
+                " ".join(random.choices(WORDS, k=60)),
+            )
+            for _ in range(rows)
+        )
+    )
+    conn.commit()
+
+
+def measure(func, repeat):
+    """Среднее время выполнения функции в миллисекундах."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FTS5 vs LIKE search benchmark")
+    parser.add_argument("--rows", type=int, default=100000, help="Количество сообщений")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого запроса")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        cache = ChatCache(write_behind=False)
+
+        start = time.perf_counter()
+        fill(cache, args.rows)
+        print(f"Insert {args.rows} rows (with FTS triggers): {time.perf_counter() - start:.2f}s")
+
+        conn = cache.get_connection()
+        # Редкие термины (~10 совпадений) и частые слова словаря
+        for term in ("тег000042", "тег000777 борщ", "борщ", "индекс кэш"):
+            fts_ms = measure(lambda: cache.search(term, limit=20), args.repeat)
+            like_ms = measure(lambda: conn.execute(
+                "SELECT id FROM messages WHERE user_message LIKE ? OR ai_response LIKE ? LIMIT 20",
+                (f"%{term.split()[0]}%", f"%{term.split()[0]}%")
+            ).fetchall(), args.repeat)
+            print(f"{term!r:18} FTS5: {fts_ms:8.2f} ms   LIKE: {like_ms:8.2f} ms")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,6 @@ API package initialization.
 Contains OpenRouter API client implementations.
 """
 from .openrouter import OpenRouterClient
+from .async_openrouter import AsyncOpenRouterClient
 
-__all__ = ['OpenRouterClient']
+__all__ = ['OpenRouterClient', 'AsyncOpenRouterClient']
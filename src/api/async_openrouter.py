@@ -0,0 +1,344 @@
+# Импорт необходимых библиотек
+import asyncio  # Библиотека для асинхронного программирования
+import logging  # Уровни логирования для структурированных событий
+import os       # Библиотека для работы с переменными окружения
+import time     # Библиотека для измерения времени ответа
+import aiohttp  # Асинхронный HTTP-клиент
+from utils.logger import AppLogger  # Импорт собственного логгера для отслеживания работы
+from utils.model_catalog import ModelCatalog  # Локальный каталог моделей с TTL
+from utils.rate_limiter import get_rate_limiter  # Общее ограничение частоты и одновременных запросов
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
+from api.openrouter import (  # Общие настройки и разбор ответов синхронного клиента
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    POOL_SIZE,
+    MAX_RETRIES,
+    RETRY_STATUSES,
+    IDEMPOTENT_METHODS,
+    DEFAULT_MODELS,
+    _backoff_delay,
+    _retry_after_seconds,
+    _parse_sse_line,
+    _parse_models,
+    _parse_balance,
+    _cached_stream_events,
+    _ChatRequest,
+)
+
+
+class AsyncOpenRouterClient:
+    """
+    Асинхронный клиент для взаимодействия с OpenRouter API.
+
+    Повторяет интерфейс OpenRouterClient (get_models, send_message,
+    stream_message, get_balance), но работает напрямую в цикле событий
+    на aiohttp, не занимая поток пула на каждый запрос. Синхронным
+    фасадом для существующего кода остается OpenRouterClient: оба клиента
+    используют одни и те же настройки таймаутов, повторов и разбора ответов.
+    """
+
+    def __init__(self, connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None):
+        """
+        Инициализация асинхронного клиента.
+
+        HTTP-сессия создается лениво при первом запросе, так как
+        aiohttp.ClientSession должна принадлежать работающему циклу событий.
+
+        Args:
+            connect_timeout (float): Таймаут установки соединения (по умолчанию HTTP_CONNECT_TIMEOUT)
+            read_timeout (float): Таймаут ожидания данных (по умолчанию HTTP_READ_TIMEOUT)
+            max_retries (int): Количество повторов при 429/5xx (по умолчанию HTTP_MAX_RETRIES)
+
+        Raises:
+            ValueError: Если API ключ не найден в переменных окружения
+        """
+        self.logger = AppLogger()
+
+        # Получение необходимых параметров из переменных окружения
+        self.api_key = os.getenv("OPENROUTER_API_KEY")
+        self.base_url = os.getenv("BASE_URL")
+
+        if not self.api_key:
+            self.logger.error("OpenRouter API key not found in .env")
+            raise ValueError("OpenRouter API key not found in .env")
+
+        # Заголовки для всех API запросов
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        # Таймауты на установку соединения и на ожидание очередной порции данных
+        self.timeout = aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=connect_timeout if connect_timeout is not None else CONNECT_TIMEOUT,
+            sock_read=read_timeout if read_timeout is not None else READ_TIMEOUT
+        )
+        self.max_retries = max_retries if max_retries is not None else MAX_RETRIES
+
+        self._session = None  # Сессия создается при первом запросе
+
+        # Общий с OpenRouterClient ограничитель частоты и одновременных запросов
+        self.rate_limiter = get_rate_limiter()
+
+        # Кэш ответов (ResponseCache), подключается приложением при необходимости
+        self.response_cache = None
+
+        # Локальный каталог моделей - запасной список при недоступности API
+        self.catalog = ModelCatalog()
+
+        self.logger.info("AsyncOpenRouterClient initialized successfully")
+
+    def _get_session(self):
+        """
+        Получение HTTP-сессии с пулом keep-alive соединений.
+
+        Returns:
+            aiohttp.ClientSession: Сессия клиента
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=POOL_SIZE)  # Ограничение размера пула
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=self.timeout,
+                connector=connector
+            )
+        return self._session
+
+    async def _request(self, method: str, path: str, lease=None, **kwargs):
+        """
+        Выполнение HTTP-запроса с повторными попытками.
+
+        При ответах 429/5xx и сетевых ошибках запрос повторяется с экспоненциальной
+        задержкой и jitter, учитывая заголовок Retry-After. Неидемпотентные запросы
+        (POST) повторяются после сетевой ошибки, только если соединение не было
+        установлено. Каждая попытка проходит через общий RateLimiter,
+        как в OpenRouterClient._request.
+
+        Args:
+            method (str): HTTP-метод ("GET", "POST")
+            path (str): Путь эндпоинта относительно базового URL
+            lease: Разрешение RateLimiter, полученное вызывающим кодом на весь запрос
+                   (None - служебный запрос, разрешение берется на время попыток)
+            **kwargs: Дополнительные параметры для aiohttp.ClientSession.request
+
+        Returns:
+            aiohttp.ClientResponse: Ответ сервера; вызывающий код обязан его освободить
+
+        Raises:
+            aiohttp.ClientError: Если сетевая ошибка повторялась во всех попытках
+        """
+        session = self._get_session()
+        own_lease = lease is None
+        if own_lease:
+            lease = await self.rate_limiter.acquire_async()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt > 0:
+                    await self.rate_limiter.pace_async(lease)  # Повтор тоже расходует лимит запросов
+                start_time = time.monotonic()
+                try:
+                    # Спан охватывает соединение и ожидание заголовков ответа сервера
+                    with tracer.span("http.request", method=method, path=path, attempt=attempt) as span:
+                        response = await session.request(method, f"{self.base_url}{path}", **kwargs)
+                        span.set(status=response.status)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    # Ошибка соединения или таймаут подключения: тело запроса не отправлено
+                    connect_failed = isinstance(e, (aiohttp.ClientConnectorError,
+                                                    aiohttp.ConnectionTimeoutError))
+                    if attempt >= self.max_retries or not (method in IDEMPOTENT_METHODS or connect_failed):
+                        raise
+                    delay = _backoff_delay(attempt)
+                    self.logger.warning("Request %s failed (%s), retry in %.2fs", path, e, delay)
+                    await asyncio.sleep(delay)
+                    continue
+
+                retry_after = response.headers.get("Retry-After")
+                self.rate_limiter.on_response(lease, response.status, time.monotonic() - start_time,
+                                              _retry_after_seconds(retry_after))
+
+                # Успешный ответ или ошибка, которую не имеет смысла повторять
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+
+                delay = _backoff_delay(attempt, retry_after)
+                self.logger.warning("Request %s returned %s, retry in %.2fs", path, response.status, delay)
+                response.release()  # Возврат соединения в пул
+                await asyncio.sleep(delay)
+        finally:
+            if own_lease:
+                self.rate_limiter.release(lease)
+
+    async def get_models(self):
+        """
+        Получение списка доступных языковых моделей.
+
+        Returns:
+            list: [{"id": "model-id", "name": "Model Name"}, ...];
+                  при ошибке - последний сохраненный каталог или список по умолчанию
+        """
+        self.logger.debug("Fetching available models")
+        try:
+            response = await self._request("GET", "/models")
+            async with response:
+                response.raise_for_status()
+                models_data = await response.json()
+            self.logger.info(f"Retrieved {len(models_data['data'])} models")
+            return _parse_models(models_data)
+        except Exception as e:
+            # Последний сохраненный каталог или список по умолчанию, как в OpenRouterClient
+            models = self.catalog.models or list(DEFAULT_MODELS)
+            self.logger.info(f"Retrieved {len(models)} models with Error: {e}")
+            return models
+
+    async def send_message(self, message: str, model: str, history: list = None,
+                           params: dict = None, use_cache: bool = True):
+        """
+        Отправка сообщения выбранной языковой модели.
+
+        Args:
+            message (str): Текст сообщения для отправки
+            model (str): Идентификатор выбранной модели
+            history (list): Предыдущие сообщения диалога [{"role", "content"}, ...]
+            params (dict): Параметры генерации (temperature, max_tokens и т.п.)
+            use_cache (bool): Разрешить ответ из кэша ответов
+
+        Returns:
+            dict: Ответ от API, содержащий либо ответ модели, либо информацию об ошибке.
+                  Ответ из кэша помечается ключом "cached": True
+        """
+        self.logger.debug("Sending message to model: %s", model)
+        request = _ChatRequest(self, message, model, history, params, use_cache)
+
+        # Проверка кэша ответов перед обращением к API
+        cached = request.cached()
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        # Ожидание разрешения общего ограничителя частоты и одновременных запросов
+        lease = await self.rate_limiter.acquire_async(model, self.rate_limiter.estimate(request.data))
+        try:
+            self.logger.event("api.request", "Making API request", level=logging.DEBUG, model=model)
+            response = await self._request("POST", "/chat/completions", json=request.data, lease=lease)
+            async with response:
+                response.raise_for_status()
+                with tracer.span("http.json_decode"):
+                    result = await response.json()
+            return request.complete(result)
+        except Exception as e:
+            return request.error(e)
+        finally:
+            # Освобождение места и уточнение расхода токенов по usage ответа
+            self.rate_limiter.release(lease, request.usage)
+
+    @staticmethod
+    async def _iter_sse(response):
+        """
+        Чтение JSON-фрагментов SSE-потока из ответа aiohttp.
+
+        Строки собираются из произвольных порций данных, поэтому длина
+        отдельной строки не ограничена буфером StreamReader.
+
+        Args:
+            response (aiohttp.ClientResponse): Ответ с потоковым телом
+
+        Yields:
+            dict: Распарсенные фрагменты до маркера [DONE]
+        """
+        buffer = b""
+        async for data_chunk in response.content.iter_any():
+            buffer += data_chunk
+            *lines, buffer = buffer.split(b"\n")
+            for raw_line in lines:
+                chunk = _parse_sse_line(raw_line.decode("utf-8").rstrip("\r"))
+                if chunk is None:
+                    continue
+                if chunk == "[DONE]":
+                    return
+                yield chunk
+
+    async def stream_message(self, message: str, model: str, history: list = None,
+                             params: dict = None, use_cache: bool = True):
+        """
+        Потоковая отправка сообщения выбранной языковой модели (SSE).
+
+        Args:
+            message (str): Текст сообщения для отправки
+            model (str): Идентификатор выбранной модели
+            history (list): Предыдущие сообщения диалога [{"role", "content"}, ...]
+            params (dict): Параметры генерации (temperature, max_tokens и т.п.)
+            use_cache (bool): Разрешить ответ из кэша ответов
+
+        Yields:
+            dict: События потока, как в OpenRouterClient.stream_message:
+                {"type": "delta", "content": str}
+                {"type": "done", "usage": dict}
+                {"type": "error", "error": str}
+        """
+        self.logger.debug("Streaming message to model: %s", model)
+        request = _ChatRequest(self, message, model, history, params, use_cache, stream=True)
+
+        # Проверка кэша ответов перед обращением к API
+        cached = request.cached()
+        if cached is not None:
+            for event in _cached_stream_events(cached):
+                yield event
+            return
+
+        response = None
+        # Место среди одновременных запросов занято до конца чтения потока
+        lease = await self.rate_limiter.acquire_async(model, self.rate_limiter.estimate(request.data))
+        try:
+            self.logger.event("api.request", "Making API request", level=logging.DEBUG, model=model,
+                              stream=True)
+            response = await self._request("POST", "/chat/completions", json=request.data, lease=lease)
+            async with response:
+                response.raise_for_status()
+
+                # Время от заголовков до последнего фрагмента (включая обработку событий вызывающим кодом)
+                with tracer.span("http.stream", path="/chat/completions"):
+                    async for chunk in self._iter_sse(response):
+                        for event in request.stream_events(chunk):
+                            yield event
+                            if event["type"] == "error":
+                                return
+
+            yield request.stream_done()
+
+        except asyncio.CancelledError:
+            # Отмена запроса: соединение закрывается, а не возвращается в пул
+            # с недочитанным телом, чтобы сервер прекратил генерацию
+            if response is not None:
+                response.close()
+            self.logger.event("api.cancelled", "Streaming request cancelled", model=model,
+                              received_chunks=len(request.content))
+            raise
+        except Exception as e:
+            yield request.error(e)
+        finally:
+            # Выполняется и при отмене, и при досрочном закрытии генератора
+            self.rate_limiter.release(lease, request.usage)
+
+    async def get_balance(self):
+        """
+        Получение текущего баланса аккаунта.
+
+        Returns:
+            float | str: Остаток кредитов или 'Ошибка' при неудаче
+        """
+        try:
+            response = await self._request("GET", "/credits")
+            async with response:
+                data = await response.json()
+            return _parse_balance(data)
+        except Exception as e:
+            self.logger.error(f"API request failed: {str(e)}", exc_info=True)
+            return "Ошибка"
+
+    async def close(self):
+        """
+        Закрытие HTTP-сессии и освобождение соединений пула.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -1,21 +1,391 @@
 # Импорт необходимых библиотек
 import requests  # Библиотека для выполнения HTTP-запросов к API
+import logging  # Уровни логирования для структурированных событий
 import os       # Библиотека для работы с операционной системой и переменными окружения
+import json     # Библиотека для разбора JSON-фрагментов потокового ответа
+import random   # Библиотека для случайной составляющей (jitter) задержки повторов
+import threading  # Библиотека для потокобезопасного создания общей HTTP-сессии
+import time     # Библиотека для задержек между повторными попытками
+from email.utils import parsedate_to_datetime  # Разбор заголовка Retry-After в формате HTTP-даты
+from requests.adapters import HTTPAdapter  # Адаптер с пулом соединений для requests.Session
+from urllib3.exceptions import NewConnectionError  # Ошибка установки соединения (тело еще не отправлено)
 from dotenv import load_dotenv  # Библиотека для загрузки переменных окружения из .env файла
 from utils.logger import AppLogger  # Импорт собственного логгера для отслеживания работы
+from utils.model_catalog import ModelCatalog  # Локальный каталог моделей с TTL
+from utils.rate_limiter import get_rate_limiter  # Общее ограничение частоты и одновременных запросов
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
 
 # Загрузка переменных окружения из .env файла при импорте модуля
 load_dotenv()
 
+# Параметры HTTP-соединений (могут быть переопределены в .env)
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))   # Таймаут установки соединения, сек
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))        # Таймаут ожидания данных, сек
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))                # Максимум соединений в пуле
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))             # Количество повторных попыток
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))       # Базовая задержка повтора, сек
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))          # Максимальная задержка повтора, сек
+
+# HTTP-статусы, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Идемпотентные методы: сетевую ошибку можно повторить на любом этапе запроса.
+# POST /chat/completions повторяется только при ошибке соединения, иначе
+# сервер мог уже принять запрос и повтор создаст второе платное завершение
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Список моделей по умолчанию на случай недоступности API
+DEFAULT_MODELS = [
+    {"id": "deepseek-coder", "name": "DeepSeek"},
+    {"id": "claude-3-sonnet", "name": "Claude 3.5 Sonnet"},
+    {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo"}
+]
+
+
+def _retry_after_seconds(value):
+    """
+    Преобразование заголовка Retry-After в количество секунд.
+
+    Args:
+        value (str | None): Значение заголовка (число секунд или HTTP-дата)
+
+    Returns:
+        float | None: Задержка в секундах или None, если заголовок не задан или некорректен
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        # Формат HTTP-даты: "Wed, 21 Oct 2015 07:28:00 GMT"
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _connect_failed(error):
+    """
+    Проверка, что сетевая ошибка requests произошла до отправки запроса.
+
+    Args:
+        error (requests.RequestException): Ошибка запроса
+
+    Returns:
+        bool: True для таймаута и ошибок установки соединения
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _backoff_delay(attempt, retry_after=None, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """
+    Расчет задержки перед повторной попыткой.
+
+    Используется экспоненциальный рост с полным jitter (случайная задержка
+    от 0 до base * 2^attempt), чтобы клиенты не повторяли запросы синхронно.
+    Если сервер прислал Retry-After, используется его значение.
+
+    Args:
+        attempt (int): Номер попытки, начиная с 0
+        retry_after (str | None): Значение заголовка Retry-After
+        base (float): Базовая задержка в секундах
+        cap (float): Верхняя граница задержки в секундах
+
+    Returns:
+        float: Задержка в секундах
+    """
+    server_delay = _retry_after_seconds(retry_after)
+    if server_delay is not None:
+        return min(server_delay, cap)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _parse_sse_line(line):
+    """
+    Разбор одной строки потока Server-Sent Events от OpenRouter.
+
+    Args:
+        line (str): Строка потока без завершающего перевода строки
+
+    Returns:
+        dict | str | None: Распарсенный JSON-фрагмент, строка "[DONE]"
+                           в конце потока или None для служебных строк
+    """
+    # Пустые строки разделяют события, строки с ":" - комментарии (keep-alive)
+    if not line or line.startswith(":"):
+        return None
+    # Интересуют только строки с данными
+    if not line.startswith("data:"):
+        return None
+    payload = line[len("data:"):].strip()
+    # Маркер завершения потока
+    if payload == "[DONE]":
+        return payload
+    try:
+        return json.loads(payload)
+    except ValueError:
+        # Неполные или поврежденные фрагменты пропускаются
+        return None
+
+
+def _parse_models(models_data):
+    """
+    Преобразование ответа эндпоинта /models в список моделей приложения.
+
+    Args:
+        models_data (dict): JSON-ответ API
+
+    Returns:
+        list: [{"id": "model-id", "name": "Model Name",
+                "context_length": int, "pricing": {"prompt": float, "completion": float}}, ...]
+    """
+    models = []
+    for model in models_data["data"]:
+        pricing = model.get("pricing") or {}
+        models.append({
+            "id": model["id"],     # Идентификатор модели для API
+            "name": model["name"],  # Человекочитаемое название модели
+            "context_length": model.get("context_length"),  # Размер контекстного окна в токенах
+            "pricing": {           # Стоимость одного токена в долларах
+                "prompt": float(pricing.get("prompt") or 0),
+                "completion": float(pricing.get("completion") or 0)
+            }
+        })
+    return models
+
+
+def _parse_balance(data):
+    """
+    Вычисление доступного баланса из ответа эндпоинта /credits.
+
+    Args:
+        data (dict): JSON-ответ API
+
+    Returns:
+        float | str: Остаток кредитов или 'Ошибка', если ответ пустой
+    """
+    if data:
+        data = data.get('data')
+        # Вычисление доступного баланса (всего кредитов минус использовано)
+        return data.get('total_credits', 0) - data.get('total_usage', 0)
+    return "Ошибка"
+
+
+def _stream_events(chunk):
+    """
+    Преобразование JSON-фрагмента потока в события клиента.
+
+    Args:
+        chunk (dict): Распарсенный фрагмент SSE-потока
+
+    Returns:
+        list: События {"type": "delta" | "usage" | "error", ...}
+    """
+    # Ошибка, возникшая уже в процессе генерации
+    if "error" in chunk:
+        error = chunk["error"]
+        if isinstance(error, dict):
+            error = error.get("message", str(error))
+        return [{"type": "error", "error": str(error)}]
+
+    events = []
+    # Извлечение очередных фрагментов текста
+    for choice in chunk.get("choices", []):
+        content = choice.get("delta", {}).get("content")
+        if content:
+            events.append({"type": "delta", "content": content})
+    # Статистика токенов приходит в последнем фрагменте
+    if chunk.get("usage"):
+        events.append({"type": "usage", "usage": chunk["usage"]})
+    return events
+
+
+def _cached_stream_events(response):
+    """
+    Представление ответа из кэша в виде событий потока.
+
+    Args:
+        response (dict): Сохраненный ответ API
+
+    Returns:
+        list: Событие с полным текстом ответа и событие завершения с флагом cached
+    """
+    content = response["choices"][0]["message"]["content"]
+    return [
+        {"type": "delta", "content": content},
+        {"type": "done", "usage": response.get("usage", {}), "cached": True}
+    ]
+
+
+def _stream_response(model, content, usage):
+    """
+    Сборка ответа в формате /chat/completions из принятого потока.
+
+    Args:
+        model (str): Идентификатор модели
+        content (str): Полный текст ответа
+        usage (dict): Итоговая статистика токенов
+
+    Returns:
+        dict: Ответ в том же формате, что и у send_message
+    """
+    return {
+        "model": model,
+        "choices": [{"message": {"role": "assistant", "content": content}}],
+        "usage": usage
+    }
+
+
+class _ChatRequest:
+    """
+    Запрос к /chat/completions без привязки к транспорту.
+
+    Формирует тело запроса, проверяет и пополняет кэш ответов, накапливает
+    текст и usage потока и оформляет ошибки. Синхронный и асинхронный
+    клиенты отличаются только способом отправки запроса и чтения ответа.
+    """
+
+    def __init__(self, client, message: str, model: str, history: list = None,
+                 params: dict = None, use_cache: bool = True, stream: bool = False):
+        """
+        Args:
+            client: Клиент с атрибутами logger и response_cache
+            message (str): Текст сообщения для отправки
+            model (str): Идентификатор выбранной модели
+            history (list): Предыдущие сообщения диалога [{"role", "content"}, ...]
+            params (dict): Параметры генерации (temperature, max_tokens и т.п.)
+            use_cache (bool): Разрешить ответ из кэша ответов
+            stream (bool): Потоковый режим (SSE)
+        """
+        self.logger = client.logger
+        self.model = model
+        self.params = params
+        self.stream = stream
+        self.response_cache = client.response_cache if use_cache else None
+        self.cache_key = None
+        self.usage = {} if stream else None  # Итоговая статистика токенов для RateLimiter
+        self.content = []  # Накопленный текст потокового ответа для кэша
+
+        # Тело запроса: история, новое сообщение и параметры генерации
+        self.data = {
+            "model": model,
+            "messages": (history or []) + [{"role": "user", "content": message}],
+        }
+        if stream:
+            self.data["stream"] = True
+            self.data["stream_options"] = {"include_usage": True}  # Запрос usage в последнем фрагменте
+        self.data.update(params or {})
+
+    def cached(self):
+        """
+        Поиск ответа в кэше ответов.
+
+        Returns:
+            dict | None: Сохраненный ответ API или None, если кэш выключен или пуст
+        """
+        if self.response_cache is None:
+            return None
+        self.cache_key = self.response_cache.make_key(self.model, self.data["messages"], self.params)
+        cached = self.response_cache.get(self.cache_key)
+        if cached is not None:
+            self.logger.event("response_cache.hit", "Response cache hit", level=logging.DEBUG,
+                              model=self.model)
+        return cached
+
+    def complete(self, result: dict) -> dict:
+        """
+        Обработка полного ответа API: учет usage и сохранение в кэш.
+
+        Args:
+            result (dict): JSON-ответ /chat/completions
+
+        Returns:
+            dict: Тот же ответ
+        """
+        self.usage = result.get("usage")
+        self.logger.info("Successfully received response from API")
+        if self.cache_key is not None:
+            self.response_cache.put(self.cache_key, self.model, result)
+        return result
+
+    def stream_events(self, chunk: dict) -> list:
+        """
+        Разбор фрагмента потока с накоплением текста и usage.
+
+        Args:
+            chunk (dict): Распарсенный фрагмент SSE-потока
+
+        Returns:
+            list: События для вызывающего кода ("delta" или "error");
+                  после события "error" чтение потока прекращается
+        """
+        events = []
+        for event in _stream_events(chunk):
+            if event["type"] == "usage":
+                self.usage = event["usage"]
+            elif event["type"] == "error":
+                self.logger.error("API stream error: %s", event["error"])
+                events.append(event)
+                break
+            else:
+                self.content.append(event["content"])
+                events.append(event)
+        return events
+
+    def stream_done(self) -> dict:
+        """
+        Завершение потока: сохранение собранного ответа в кэш.
+
+        Returns:
+            dict: Событие {"type": "done", "usage": dict}
+        """
+        self.logger.info("Successfully received streamed response from API")
+        if self.cache_key is not None:
+            self.response_cache.put(self.cache_key, self.model,
+                                    _stream_response(self.model, "".join(self.content), self.usage))
+        return {"type": "done", "usage": self.usage}
+
+    def error(self, error: Exception) -> dict:
+        """
+        Логирование ошибки запроса и ее представление в формате клиента.
+
+        Вызывается из обработчика исключения, чтобы в лог попал стектрейс.
+
+        Args:
+            error (Exception): Исключение запроса
+
+        Returns:
+            dict: {"type": "error", "error": str} для потока или {"error": str}
+        """
+        if self.stream:
+            self.logger.error("API stream failed: %s", error, exc_info=True)
+            return {"type": "error", "error": str(error)}
+        self.logger.error("API request failed: %s", error, exc_info=True)
+        return {"error": str(error)}
+
+
 class OpenRouterClient:
     """
     Клиент для взаимодействия с OpenRouter API.
     
     OpenRouter - это сервис, предоставляющий унифицированный доступ к различным
     языковым моделям (GPT, Claude и др.) через единый API интерфейс.
+
+    Все экземпляры используют одну общую HTTP-сессию с пулом keep-alive
+    соединений, поэтому повторные запросы не тратят время на TCP/TLS рукопожатие.
     """
-    
-    def __init__(self):
+
+    # Общая для всех клиентов HTTP-сессия и блокировка для ее создания
+    _session = None
+    _session_lock = threading.Lock()
+
+    def __init__(self, connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None):
         """
         Инициализация клиента OpenRouter.
         
@@ -23,7 +393,13 @@ class OpenRouterClient:
         - Систему логирования
         - API ключ и базовый URL из переменных окружения
         - Заголовки для HTTP запросов
-        - Список доступных моделей
+        - Таймауты и политику повторных попыток
+        - Список доступных моделей (из локального каталога, без ожидания сети)
+
+        Args:
+            connect_timeout (float): Таймаут установки соединения (по умолчанию HTTP_CONNECT_TIMEOUT)
+            read_timeout (float): Таймаут ожидания данных (по умолчанию HTTP_READ_TIMEOUT)
+            max_retries (int): Количество повторов при 429/5xx (по умолчанию HTTP_MAX_RETRIES)
         
         Raises:
             ValueError: Если API ключ не найден в переменных окружения
@@ -48,11 +424,139 @@ class OpenRouterClient:
             "Content-Type": "application/json"          # Указание формата данных
         }
 
+        # Таймауты (соединение, чтение) и количество повторных попыток
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else READ_TIMEOUT
+        )
+        self.max_retries = max_retries if max_retries is not None else MAX_RETRIES
+
+        # Получение общей сессии с пулом соединений
+        self.session = self._get_session()
+
+        # Общий для всех клиентов процесса ограничитель частоты и одновременных запросов
+        self.rate_limiter = get_rate_limiter()
+
         # Логирование успешной инициализации клиента
         self.logger.info("OpenRouterClient initialized successfully")
         
-        # Загрузка списка доступных моделей при инициализации
-        self.available_models = self.get_models()
+        # Загрузка списка доступных моделей из локального каталога
+        # Сетевой запрос не блокирует запуск: устаревший каталог обновляется
+        # в фоне после подключения обработчика (start_model_refresh)
+        self.catalog = ModelCatalog()
+        self.available_models = self.catalog.models or list(DEFAULT_MODELS)
+
+        # Обработчик, вызываемый после фонового обновления списка моделей
+        self.on_models_updated = None
+
+        # Кэш ответов (ResponseCache), подключается приложением при необходимости
+        self.response_cache = None
+
+    def start_model_refresh(self, on_updated=None):
+        """
+        Запуск фонового обновления каталога моделей, если он устарел.
+
+        Обработчик подключается до запуска потока, поэтому быстрое обновление
+        не может завершиться раньше, чем интерфейс готов принять новый список.
+
+        Args:
+            on_updated (callable): Обработчик нового списка моделей (on_models_updated)
+        """
+        if on_updated is not None:
+            self.on_models_updated = on_updated
+        if self.catalog.is_stale():
+            threading.Thread(target=self.refresh_models, daemon=True).start()
+
+    @classmethod
+    def _get_session(cls):
+        """
+        Получение общей HTTP-сессии с пулом keep-alive соединений.
+
+        Сессия создается один раз на процесс. Размер пула ограничен POOL_SIZE,
+        при исчерпании пула запросы ожидают освобождения соединения.
+
+        Returns:
+            requests.Session: Общая сессия для всех экземпляров клиента
+        """
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_SIZE,  # Количество кэшируемых пулов (по хостам)
+                    pool_maxsize=POOL_SIZE,      # Максимум соединений в пуле
+                    pool_block=True              # Ожидание свободного соединения вместо создания лишних
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._session = session
+            return cls._session
+
+    def _request(self, method: str, path: str, lease=None, **kwargs):
+        """
+        Выполнение HTTP-запроса с таймаутами и повторными попытками.
+
+        При ответах 429/5xx и сетевых ошибках запрос повторяется с экспоненциальной
+        задержкой и jitter, учитывая заголовок Retry-After. Неидемпотентные запросы
+        (POST) повторяются после сетевой ошибки, только если соединение не было
+        установлено. Каждая попытка проходит через общий RateLimiter, а ее результат
+        (429, время до заголовков) управляет пределом одновременных запросов.
+
+        Args:
+            method (str): HTTP-метод ("GET", "POST")
+            path (str): Путь эндпоинта относительно базового URL
+            lease: Разрешение RateLimiter, полученное вызывающим кодом на весь запрос
+                   (None - служебный запрос, разрешение берется на время попыток)
+            **kwargs: Дополнительные параметры для requests.Session.request
+
+        Returns:
+            requests.Response: Ответ сервера (последняя попытка)
+
+        Raises:
+            requests.RequestException: Если сетевая ошибка повторялась во всех попытках
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("headers", self.headers)
+        own_lease = lease is None
+        if own_lease:
+            lease = self.rate_limiter.acquire()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt > 0:
+                    self.rate_limiter.pace(lease)  # Повтор тоже расходует лимит запросов
+                start_time = time.monotonic()
+                try:
+                    # Спан охватывает соединение и ожидание заголовков ответа сервера
+                    with tracer.span("http.request", method=method, path=path, attempt=attempt) as span:
+                        response = self.session.request(
+                            method,
+                            f"{self.base_url}{path}",
+                            **kwargs
+                        )
+                        span.set(status=response.status_code)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    # Сетевые ошибки повторяются, пока есть попытки; POST - только до отправки тела
+                    if attempt >= self.max_retries or not (method in IDEMPOTENT_METHODS or _connect_failed(e)):
+                        raise
+                    delay = _backoff_delay(attempt)
+                    self.logger.warning("Request %s failed (%s), retry in %.2fs", path, e, delay)
+                    time.sleep(delay)
+                    continue
+
+                retry_after = response.headers.get("Retry-After")
+                self.rate_limiter.on_response(lease, response.status_code, time.monotonic() - start_time,
+                                              _retry_after_seconds(retry_after))
+
+                # Успешный ответ или ошибка, которую не имеет смысла повторять
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+
+                delay = _backoff_delay(attempt, retry_after)
+                self.logger.warning("Request %s returned %s, retry in %.2fs", path, response.status_code, delay)
+                response.close()  # Возврат соединения в пул
+                time.sleep(delay)
+        finally:
+            if own_lease:
+                self.rate_limiter.release(lease)
 
     def get_models(self):
         """
@@ -60,92 +564,200 @@ class OpenRouterClient:
         
         Returns:
             list: Список словарей с информацией о моделях:
-                 [{"id": "model-id", "name": "Model Name"}, ...]
+                 [{"id": "model-id", "name": "Model Name", ...}, ...]
                  
         Note:
-            При ошибке запроса возвращает список базовых моделей по умолчанию
+            При ошибке запроса возвращает последний сохраненный каталог,
+            а если его нет - список базовых моделей по умолчанию
         """
         # Логирование начала запроса списка моделей
         self.logger.debug("Fetching available models")
         
         try:
             # Выполнение GET запроса к API для получения списка моделей
-            response = requests.get(
-                f"{self.base_url}/models",
-                headers=self.headers
-            )
+            response = self._request("GET", "/models")
+            response.raise_for_status()
             # Преобразование ответа из JSON в словарь Python
             models_data = response.json()
             
             # Логирование успешного получения списка моделей
-            self.logger.info(f"Retrieved {len(models_data["data"])} models")
+            self.logger.info(f"Retrieved {len(models_data['data'])} models")
             
             # Преобразование данных в нужный формат
-            return [
-                {
-                    "id": model["id"],     # Идентификатор модели для API
-                    "name": model["name"]   # Человекочитаемое название модели
-                }
-                for model in models_data["data"]
-            ]
+            return _parse_models(models_data)
+        except Exception as e:
+            # Последний сохраненный каталог или список по умолчанию
+            models = self.catalog.models or list(DEFAULT_MODELS)
+            self.logger.info(f"Retrieved {len(models)} models with Error: {e}")
+            return models
+
+    def refresh_models(self):
+        """
+        Условное обновление локального каталога моделей.
+
+        Отправляет If-None-Match / If-Modified-Since с сохраненными валидаторами:
+        при ответе 304 продлевает срок жизни каталога, при 200 сохраняет новый
+        список и уведомляет обработчик on_models_updated.
+
+        Returns:
+            list: Актуальный список доступных моделей
+        """
+        self.logger.debug("Refreshing models catalog")
+
+        # Заголовки условного запроса
+        headers = dict(self.headers)
+        if self.catalog.etag:
+            headers["If-None-Match"] = self.catalog.etag
+        if self.catalog.last_modified:
+            headers["If-Modified-Since"] = self.catalog.last_modified
+
+        try:
+            response = self._request("GET", "/models", headers=headers)
+
+            # Каталог на сервере не изменился
+            if response.status_code == 304 and self.catalog.models:
+                self.catalog.touch()
+                self.logger.info("Models catalog is up to date")
+                return self.available_models
+
+            response.raise_for_status()
+            models = _parse_models(response.json())
+            self.catalog.save(
+                models,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+            self.available_models = models
+            self.logger.info(f"Models catalog refreshed: {len(models)} models")
+
+            # Уведомление интерфейса о новом списке моделей
+            if self.on_models_updated:
+                self.on_models_updated(models)
         except Exception as e:
-            # Список моделей по умолчанию при ошибке API
-            models_default = [
-                {"id": "deepseek-coder", "name": "DeepSeek"},
-                {"id": "claude-3-sonnet", "name": "Claude 3.5 Sonnet"},
-                {"id": "gpt-3.5-turbo", "name": "GPT-3.5 Turbo"}
-            ]
-            # Логирование ошибки и возврата списка по умолчанию
-            self.logger.info(f"Retrieved {len(models_default)} models with Error: {e}")
-            return models_default
-
-    def send_message(self, message: str, model: str):
+            # При ошибке продолжаем работать с прежним каталогом
+            self.logger.error(f"Models catalog refresh failed: {e}")
+
+        return self.available_models
+
+    def send_message(self, message: str, model: str, history: list = None,
+                     params: dict = None, use_cache: bool = True):
         """
         Отправка сообщения выбранной языковой модели.
         
         Args:
             message (str): Текст сообщения для отправки
             model (str): Идентификатор выбранной модели
+            history (list): Предыдущие сообщения диалога [{"role", "content"}, ...]
+            params (dict): Параметры генерации (temperature, max_tokens и т.п.)
+            use_cache (bool): Разрешить ответ из кэша ответов
             
         Returns:
-            dict: Ответ от API, содержащий либо ответ модели, либо информацию об ошибке
+            dict: Ответ от API, содержащий либо ответ модели, либо информацию об ошибке.
+                  Ответ из кэша помечается ключом "cached": True
         """
         # Логирование отправки сообщения
-        self.logger.debug(f"Sending message to model: {model}")
-        
-        # Формирование данных для отправки в API
-        data = {
-            "model": model,  # Идентификатор выбранной модели
-            "messages": [{"role": "user", "content": message}]  # Сообщение в формате API
-        }
+        self.logger.debug("Sending message to model: %s", model)
+        request = _ChatRequest(self, message, model, history, params, use_cache)
+
+        # Проверка кэша ответов перед обращением к API
+        cached = request.cached()
+        if cached is not None:
+            return {**cached, "cached": True}
         
+        # Ожидание разрешения общего ограничителя частоты и одновременных запросов
+        lease = self.rate_limiter.acquire(model, self.rate_limiter.estimate(request.data))
         try:
             # Логирование начала выполнения запроса
-            self.logger.debug("Making API request")
+            self.logger.event("api.request", "Making API request", level=logging.DEBUG, model=model)
 
             # Отправка POST запроса к API
-            response = requests.post(
-                f"{self.base_url}/chat/completions",  # Эндпоинт для чата
-                headers=self.headers,                 # Заголовки с авторизацией
-                json=data                            # Данные запроса
+            response = self._request(
+                "POST",
+                "/chat/completions",  # Эндпоинт для чата
+                json=request.data,    # Данные запроса
+                lease=lease
             )
             
             # Проверка на ошибки HTTP
             response.raise_for_status()
-            
-            # Логирование успешного получения ответа
-            self.logger.info("Successfully received response from API")
-            
-            # Возврат данных ответа
-            return response.json()
+            with tracer.span("http.json_decode"):
+                result = response.json()
+
+            # Учет usage и сохранение ответа в кэш
+            return request.complete(result)
 
         except Exception as e:
-            # Формирование информативного сообщения об ошибке
-            error_msg = f"API request failed: {str(e)}"
-            # Логирование ошибки с полным стектрейсом для отладки
-            self.logger.error(error_msg, exc_info=True)
             # Возврат сообщения об ошибке в формате ответа API
-            return {"error": str(e)}       
+            return request.error(e)
+        finally:
+            # Освобождение места и уточнение расхода токенов по usage ответа
+            self.rate_limiter.release(lease, request.usage)
+
+    def stream_message(self, message: str, model: str, history: list = None,
+                       params: dict = None, use_cache: bool = True):
+        """
+        Потоковая отправка сообщения выбранной языковой модели (SSE).
+
+        В отличие от send_message, не дожидается окончания генерации,
+        а выдает фрагменты ответа по мере их поступления от API.
+
+        Args:
+            message (str): Текст сообщения для отправки
+            model (str): Идентификатор выбранной модели
+            history (list): Предыдущие сообщения диалога [{"role", "content"}, ...]
+            params (dict): Параметры генерации (temperature, max_tokens и т.п.)
+            use_cache (bool): Разрешить ответ из кэша ответов
+
+        Yields:
+            dict: События потока:
+                {"type": "delta", "content": str}  - очередной фрагмент текста
+                {"type": "done", "usage": dict}    - завершение потока с итоговым usage
+                                                     (и "cached": True для ответа из кэша)
+                {"type": "error", "error": str}    - ошибка запроса или генерации
+        """
+        # Логирование начала потоковой отправки
+        self.logger.debug("Streaming message to model: %s", model)
+        request = _ChatRequest(self, message, model, history, params, use_cache, stream=True)
+
+        # Проверка кэша ответов перед обращением к API
+        cached = request.cached()
+        if cached is not None:
+            yield from _cached_stream_events(cached)
+            return
+
+        # Место среди одновременных запросов занято до конца чтения потока
+        lease = self.rate_limiter.acquire(model, self.rate_limiter.estimate(request.data))
+        try:
+            self.logger.event("api.request", "Making API request", level=logging.DEBUG, model=model,
+                              stream=True)
+            # Отправка POST запроса с потоковым чтением тела ответа
+            with self._request("POST", "/chat/completions", json=request.data, stream=True,
+                               lease=lease) as response:
+                response.raise_for_status()
+
+                # Построчное чтение событий SSE; время от заголовков до последнего
+                # фрагмента (включая обработку событий вызывающим кодом)
+                with tracer.span("http.stream", path="/chat/completions"):
+                    for line in response.iter_lines(decode_unicode=True):
+                        chunk = _parse_sse_line(line)
+                        if chunk is None:
+                            continue
+                        if chunk == "[DONE]":
+                            break
+
+                        for event in request.stream_events(chunk):
+                            yield event
+                            if event["type"] == "error":
+                                return
+
+            # Сохранение полного ответа в кэш
+            yield request.stream_done()
+
+        except Exception as e:
+            yield request.error(e)
+        finally:
+            # Выполняется и при досрочном закрытии генератора вызывающим кодом
+            self.rate_limiter.release(lease, request.usage)
 
     def get_balance(self):
         """
@@ -156,18 +768,9 @@ class OpenRouterClient:
         """
         try:
             # Запрос баланса через API
-            response = requests.get(
-                f"{self.base_url}/credits",  # Эндпоинт для проверки баланса
-                headers=self.headers         # Заголовки с авторизацией
-            )
+            response = self._request("GET", "/credits")  # Эндпоинт для проверки баланса
             # Получение данных из ответа
-            data = response.json()
-            if data:
-                data = data.get('data')
-                # Вычисление доступного баланса (всего кредитов минус использовано)
-                balance = (data.get('total_credits', 0)-data.get('total_usage', 0))
-                return balance
-            return "Ошибка"
+            return _parse_balance(response.json())
         except Exception as e:
             # Формирование сообщения об ошибке
             error_msg = f"API request failed: {str(e)}"
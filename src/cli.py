@@ -0,0 +1,408 @@
+"""
+Пакетная отправка запросов к моделям без графического интерфейса.
+
+Читает запросы из JSONL, CSV или стандартного ввода, выполняет их
+пулом из нескольких потоков через OpenRouterClient (частоту и количество
+одновременных запросов регулирует общий RateLimiter клиента) и записывает
+результаты в JSONL по мере завершения (в произвольном порядке, каждая
+строка содержит id запроса). Все ответы сохраняются
+в ChatCache и учитываются в Analytics, как и ответы из окна чата.
+
+Формат входных данных:
+    JSONL: {"id": "q1", "prompt": "...", "model": "...", "params": {...}}
+           (id, model и params необязательны; без id используется номер строки)
+    CSV:   столбцы id, prompt, model (обязателен только prompt)
+    text:  каждая непустая строка - отдельный запрос
+
+Некорректная строка JSONL не прерывает запуск: в результаты записывается
+{"id": ..., "error": "invalid input: ..."}, и обработка продолжается.
+
+Пример запуска из корня проекта:
+    python src/cli.py prompts.jsonl -o results.jsonl --model openai/gpt-4o-mini --workers 8 --rpm 120
+    python src/cli.py prompts.jsonl -o results.jsonl --resume   # Продолжение прерванного запуска
+"""
+# Импорт необходимых библиотек и модулей
+import argparse  # Разбор аргументов командной строки
+import csv       # Чтение запросов из CSV
+import json      # Чтение и запись JSONL
+import os        # Работа с путями и переменными окружения
+import sys       # Стандартные потоки ввода-вывода
+import time      # Измерение времени выполнения
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait  # Пул рабочих потоков
+from datetime import datetime  # Класс для работы с датой и временем
+from api.openrouter import OpenRouterClient  # Клиент для взаимодействия с AI API через OpenRouter
+from utils.analytics import Analytics  # Модуль для сбора и анализа статистики использования
+from utils.cache import ChatCache  # Модуль для кэширования истории чата
+from utils.conversation import estimate_tokens  # Оценка количества токенов
+from utils.logger import AppLogger  # Модуль для логирования работы приложения
+from utils.response_cache import ResponseCache  # Кэш ответов API
+
+# Количество рабочих потоков по умолчанию
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Ограничение частоты запросов в минуту по умолчанию (0 - без ограничения)
+BATCH_RPM = float(os.getenv("BATCH_RPM", "60"))
+
+# Интервал вывода прогресса (количество завершенных запросов)
+PROGRESS_EVERY = 100
+
+
+def read_prompts(path: str, input_format: str = None):
+    """
+    Чтение запросов из файла или стандартного ввода.
+
+    Args:
+        path (str): Путь к файлу или "-" для стандартного ввода
+        input_format (str): "jsonl", "csv" или "text" (по умолчанию по расширению
+                            файла; для стандартного ввода - jsonl, если строка
+                            начинается с "{", иначе text)
+
+    Yields:
+        dict: {"id": str, "prompt": str, "model": str | None, "params": dict | None};
+              для некорректной строки JSONL prompt равен None, а в поле error
+              описана ошибка, чтобы она попала в результаты, не прерывая запуск
+    """
+    if input_format is None and path != "-":
+        input_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    source = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8', newline='')
+    try:
+        if input_format == "csv":
+            for number, row in enumerate(csv.DictReader(source), 1):
+                if not row.get("prompt"):
+                    continue
+                yield {
+                    "id": row.get("id") or str(number),
+                    "prompt": row["prompt"],
+                    "model": row.get("model") or None,
+                    "params": None
+                }
+            return
+
+        for number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if input_format == "text" or (input_format is None and not line.startswith("{")):
+                yield {"id": str(number), "prompt": line, "model": None, "params": None}
+                continue
+            record, error = None, None
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                error = f"invalid JSON: {e}"
+            else:
+                if not isinstance(record, dict):
+                    record, error = None, "expected a JSON object"
+                elif not isinstance(record.get("prompt"), str) or not record["prompt"]:
+                    error = 'missing "prompt"'
+                elif not isinstance(record.get("params") or {}, dict):
+                    error = '"params" must be an object'
+            item_id = str(record.get("id", number)) if record else str(number)
+            if error:
+                yield {"id": item_id, "prompt": None, "model": None, "params": None,
+                       "error": f"invalid input: {error}"}
+                continue
+            yield {
+                "id": item_id,
+                "prompt": record["prompt"],
+                "model": record.get("model"),
+                "params": record.get("params")
+            }
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
+def completed_ids(path: str) -> set:
+    """
+    ID запросов, успешно выполненных при прошлом запуске.
+
+    Запросы с ошибкой и оборванная последняя строка (прерывание во время
+    записи) не учитываются и выполняются повторно.
+
+    Args:
+        path (str): Путь к файлу результатов
+
+    Returns:
+        set: ID выполненных запросов
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not record.get("error"):
+                done.add(str(record.get("id")))
+    return done
+
+
+def open_output(path: str, resume: bool):
+    """
+    Открытие файла результатов.
+
+    Args:
+        path (str): Путь к файлу или "-" для стандартного вывода
+        resume (bool): Дописывать к существующему файлу
+
+    Returns:
+        file: Открытый файл
+    """
+    if path == "-":
+        return sys.stdout
+    if resume and os.path.exists(path):
+        output = open(path, 'a+', encoding='utf-8')
+        # Завершение оборванной строки, чтобы новая запись начиналась с начала строки
+        if output.tell() > 0:
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+        return output
+    return open(path, 'w', encoding='utf-8')
+
+
+class BatchRunner:
+    """
+    Выполнение пакета запросов пулом рабочих потоков.
+
+    Рабочие потоки только отправляют запросы; запись результатов, сохранение
+    в ChatCache и учет в Analytics выполняются в основном потоке по мере
+    завершения запросов. Одновременно в работе находится не более
+    workers * 2 запросов, поэтому входной файл читается постепенно.
+    """
+
+    def __init__(self, client: OpenRouterClient, cache: ChatCache, analytics: Analytics,
+                 model: str, workers: int = None, params: dict = None, use_cache: bool = False):
+        """
+        Инициализация пакетного запуска.
+
+        Args:
+            client (OpenRouterClient): Клиент API
+            cache (ChatCache): Кэш для сохранения истории
+            analytics (Analytics): Аналитика использования
+            model (str): Модель по умолчанию для запросов без поля model
+            workers (int): Количество рабочих потоков (по умолчанию BATCH_WORKERS); фактическое
+                           количество одновременных запросов подбирает RateLimiter клиента
+            params (dict): Параметры генерации по умолчанию
+            use_cache (bool): Разрешить ответы из кэша ответов
+        """
+        self.client = client
+        self.cache = cache
+        self.analytics = analytics
+        self.model = model
+        self.workers = workers or BATCH_WORKERS
+        self.params = params or {}
+        self.use_cache = use_cache
+        self.logger = AppLogger()
+
+        # Итоги запуска
+        self.completed = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def _execute(self, item: dict) -> dict:
+        """
+        Отправка одного запроса (выполняется в рабочем потоке).
+
+        Args:
+            item (dict): Запрос из read_prompts
+
+        Returns:
+            dict: Запись результата для JSONL
+        """
+        model = item["model"] or self.model
+        start_time = time.time()
+        response = self.client.send_message(item["prompt"], model,
+                                            params={**self.params, **(item["params"] or {})},
+                                            use_cache=self.use_cache)
+        latency = time.time() - start_time
+
+        result = {"id": item["id"], "model": model, "prompt": item["prompt"],
+                  "latency_ms": round(latency * 1000),
+                  "timestamp": datetime.now().isoformat(timespec="seconds")}
+        if "error" in response:
+            result.update(response=None, error=response["error"])
+            return result
+
+        usage = response.get("usage") or {}
+        try:
+            result["response"] = response["choices"][0]["message"]["content"]
+            result["error"] = None
+        except (KeyError, IndexError, TypeError):
+            result.update(response=None, error=f"Unexpected response: {str(response)[:200]}")
+        result.update(
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            tokens=usage.get("total_tokens", 0),
+            cached=response.get("cached", False)
+        )
+        return result
+
+    def _record(self, result: dict, output):
+        """
+        Запись результата в файл, историю и аналитику (основной поток).
+        """
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()  # Результат сохраняется сразу: при прерывании его не придется повторять
+
+        self.completed += 1
+        if result["error"]:
+            self.errors += 1
+            self.logger.error("Запрос %s завершился ошибкой: %s", result["id"], result["error"])
+            return
+
+        tokens = result.get("tokens") or 0
+        self.cache.save_message(
+            model=result["model"],
+            user_message=result["prompt"],
+            ai_response=result["response"],
+            tokens_used=tokens
+        )
+        self.analytics.track_message(
+            model=result["model"],
+            message_length=len(result["prompt"]),
+            response_time=result["latency_ms"] / 1000,
+            tokens_used=tokens,
+            context_tokens=result.get("prompt_tokens") or estimate_tokens(result["prompt"]),
+            cache_hit=result.get("cached", False),
+            completion_tokens=result.get("completion_tokens")
+        )
+
+    def run(self, items, output, skip_ids: set = None):
+        """
+        Выполнение запросов с записью результатов по мере завершения.
+
+        Args:
+            items (iterable): Запросы из read_prompts
+            output (file): Файл результатов JSONL
+            skip_ids (set): ID запросов, уже выполненных при прошлом запуске
+        """
+        skip_ids = skip_ids or set()
+        start_time = time.time()
+        pending = set()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+        try:
+            for item in items:
+                if item["id"] in skip_ids:
+                    self.skipped += 1
+                    continue
+                if item.get("error"):
+                    # Некорректная строка входных данных записывается как ошибка без запроса
+                    self._record({"id": item["id"], "model": None, "prompt": None,
+                                  "response": None, "error": item["error"]}, output)
+                    continue
+                pending.add(executor.submit(self._execute, item))
+
+                # Ограничение количества запросов в работе: ожидание завершения части из них
+                while len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(done, output, start_time)
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self._collect(done, output, start_time)
+        finally:
+            # При прерывании невыполненные запросы отменяются и будут выполнены при --resume
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        elapsed = time.time() - start_time
+        self.logger.event(
+            "batch.completed", "Batch run completed",
+            completed=self.completed, errors=self.errors, skipped=self.skipped,
+            elapsed_s=round(elapsed, 1),
+            throughput_rpm=round(self.completed / elapsed * 60, 1) if elapsed > 0 else None,
+            **self.client.rate_limiter.get_stats()
+        )
+
+    def _collect(self, futures, output, start_time: float):
+        """
+        Обработка завершенных запросов и вывод прогресса.
+        """
+        for future in futures:
+            self._record(future.result(), output)
+            if self.completed % PROGRESS_EVERY == 0:
+                elapsed = time.time() - start_time
+                print(f"Выполнено {self.completed} (ошибок {self.errors}) за {elapsed:.0f} с",
+                      file=sys.stderr)
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        description="Пакетная отправка запросов к моделям OpenRouter без графического интерфейса"
+    )
+    parser.add_argument("input", help='Файл запросов (JSONL или CSV) или "-" для стандартного ввода')
+    parser.add_argument("-o", "--output", default="-",
+                        help='Файл результатов JSONL (по умолчанию "-" - стандартный вывод)')
+    parser.add_argument("-m", "--model", help="Модель для запросов без поля model "
+                                              "(по умолчанию первая модель каталога)")
+    parser.add_argument("--format", choices=["jsonl", "csv", "text"], help="Формат входных данных")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS,
+                        help=f"Количество рабочих потоков (по умолчанию {BATCH_WORKERS})")
+    parser.add_argument("--rpm", type=float, default=BATCH_RPM,
+                        help=f"Ограничение запросов в минуту, 0 - без ограничения (по умолчанию {BATCH_RPM:g})")
+    parser.add_argument("--tpm", type=float,
+                        help="Ограничение токенов в минуту, 0 - без ограничения (по умолчанию RATE_LIMIT_TPM)")
+    parser.add_argument("--temperature", type=float, help="Температура генерации")
+    parser.add_argument("--max-tokens", type=int, help="Максимальное количество токенов ответа")
+    parser.add_argument("--resume", action="store_true",
+                        help="Дописать результаты в существующий файл, пропустив выполненные запросы")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Разрешить ответы из кэша ответов (по умолчанию каждый запрос отправляется в API)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """
+    Точка входа пакетного запуска.
+
+    Returns:
+        int: Код завершения: 0 - все запросы выполнены, 1 - были ошибки,
+             130 - запуск прерван (продолжается с --resume)
+    """
+    args = parse_args(argv)
+    if args.resume and args.output == "-":
+        print("--resume требует файл результатов (-o)", file=sys.stderr)
+        return 2
+
+    client = OpenRouterClient()
+    model = args.model or client.available_models[0]['id']
+    cache = ChatCache()
+    analytics = Analytics(cache)
+    if args.use_cache:
+        client.response_cache = ResponseCache(cache)
+
+    params = {}
+    if args.temperature is not None:
+        params["temperature"] = args.temperature
+    if args.max_tokens is not None:
+        params["max_tokens"] = args.max_tokens
+
+    # Ограничения частоты применяются к общему ограничителю всех запросов процесса
+    client.rate_limiter.configure(rpm=args.rpm, tpm=args.tpm)
+
+    runner = BatchRunner(client, cache, analytics, model, workers=args.workers,
+                         params=params, use_cache=args.use_cache)
+    skip_ids = completed_ids(args.output) if args.resume else set()
+    output = open_output(args.output, args.resume)
+    try:
+        runner.run(read_prompts(args.input, args.format), output, skip_ids)
+    except KeyboardInterrupt:
+        print(f"Прервано: выполнено {runner.completed}, продолжите запуск с --resume", file=sys.stderr)
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        cache.close()  # Запись отложенных вставок истории и аналитики
+
+    print(f"Готово: выполнено {runner.completed}, ошибок {runner.errors}, "
+          f"пропущено {runner.skipped}", file=sys.stderr)
+    return 1 if runner.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,40 @@
 # Импорт необходимых библиотек и модулей
 import flet as ft  # Фреймворк для создания кроссплатформенных приложений с современным UI
 from api.openrouter import OpenRouterClient  # Клиент для взаимодействия с AI API через OpenRouter
+from api.async_openrouter import AsyncOpenRouterClient  # Асинхронный клиент для отправки сообщений
 from ui.styles import AppStyles  # Модуль с настройками стилей интерфейса
-from ui.components import MessageBubble, ModelSelector  # Компоненты пользовательского интерфейса
+from ui.update_scheduler import UpdateScheduler  # Объединение обновлений страницы по кадрам
+from ui.components import ChatHistoryView, ComparisonRow, MessageBubble, ModelSelector, RequestStatus  # Компоненты пользовательского интерфейса
 from utils.cache import ChatCache  # Модуль для кэширования истории чата
-from utils.logger import AppLogger  # Модуль для логирования работы приложения
+from utils.logger import AppLogger, new_request_id  # Модуль для логирования работы приложения
 from utils.analytics import Analytics  # Модуль для сбора и анализа статистики использования
 from utils.monitor import PerformanceMonitor  # Модуль для мониторинга производительности
-from utils.notifications import send_telegram_message
+from utils.conversation import ConversationSession, estimate_tokens  # Сессия диалога и оценка токенов
+from utils.response_cache import ResponseCache  # Кэш ответов API
+from utils.notifications import get_notifier  # Фоновая отправка уведомлений в Telegram
+from utils.balance import BalanceService  # Кэшируемый и периодически обновляемый баланс
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
 import asyncio  # Библиотека для асинхронного программирования
 import time  # Библиотека для работы с временными метками
 import json  # Библиотека для работы с JSON-данными
 from datetime import datetime  # Класс для работы с датой и временем
 import os  # Библиотека для работы с операционной системой
 
+# Количество записей истории (пар сообщений), загружаемых за один раз
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+# Максимальное количество одновременно выполняющихся запросов к моделям (остальные ждут в очереди)
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "3"))
+
+# Максимальное количество моделей, которым одновременно отправляется сообщение при сравнении
+FANOUT_MAX_MODELS = int(os.getenv("FANOUT_MAX_MODELS", "4"))
+
+# Максимальное количество пар сообщений, одновременно находящихся в списке истории
+HISTORY_WINDOW_SIZE = int(os.getenv("HISTORY_WINDOW_SIZE", "100"))
+
+# Расстояние до края списка (в пикселях), при котором подгружается следующая страница
+HISTORY_SCROLL_THRESHOLD = 200
+
 
 class ChatApp:
     """
@@ -32,17 +53,44 @@ class ChatApp:
         """
         # Инициализация основных компонентов
         self.api_client = OpenRouterClient()  # Создание клиента для работы с AI API
+        self.async_client = AsyncOpenRouterClient()  # Асинхронный клиент для сообщений без пула потоков
         self.cache = ChatCache()  # Инициализация системы кэширования
         self.logger = AppLogger()  # Инициализация системы логирования
         self.analytics = Analytics(self.cache)  # Инициализация системы аналитики с передачей кэша
         self.monitor = PerformanceMonitor()  # Инициализация системы мониторинга
 
+        # Сохранение спанов трассировки рядом с аналитикой (при TRACING_ENABLED=1)
+        if tracer.enabled:
+            tracer.sink = self.cache.save_span
+
+        # Подключение кэша ответов к клиентам API
+        self.response_cache = ResponseCache(self.cache)
+        self.api_client.response_cache = self.response_cache
+        self.async_client.response_cache = self.response_cache
+
+        # Продолжение последней сессии диалога, чтобы модель видела предыдущие реплики
+        self.conversation = ConversationSession(self.cache, self.cache.get_last_session_id())
+
+        # Сервис баланса: запрос к API выполняется в фоне после отрисовки окна
+        self.started_at = time.time()
+        self.balance = BalanceService(self.async_client, self.api_client.catalog, get_notifier())
+
         # Создание компонента для отображения баланса API
         self.balance_text = ft.Text(
             "Баланс: Загрузка...",  # Начальный текст до загрузки реального баланса
             **AppStyles.BALANCE_TEXT  # Применение стилей из конфигурации
         )
-        self.update_balance()  # Первичное обновление баланса
+        self.update_balance(self.balance)  # Показ последнего сохраненного баланса без запроса к API
+
+        # Выполняющиеся и ожидающие в очереди запросы к моделям
+        self.request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.active_requests = set()
+
+        # Подключенные страницы: HTTP-сессия aiohttp закрывается после отключения последней
+        self.connected_pages = 0
+
+        # Модели, которым сообщение отправляется одновременно для сравнения ответов
+        self.compare_models = []
 
         # Создание директории для экспорта истории чата
         self.exports_dir = "exports"  # Путь к директории экспорта
@@ -50,55 +98,39 @@ class ChatApp:
 
     def load_chat_history(self):
         """
-        Загрузка истории чата из кэша и отображение её в интерфейсе.
-        Сообщения добавляются в обратном порядке для правильной хронологии.
+        Загрузка последней страницы истории чата из кэша и отображение её в интерфейсе.
+        Остальные сообщения подгружаются при прокрутке (ChatHistoryView).
         """
         try:
-            history = self.cache.get_chat_history()  # Получение истории из кэша
-            for msg in reversed(history):  # Перебор сообщений в обратном порядке
-                # Распаковка данных сообщения в отдельные переменные
-                _, model, user_message, ai_response, timestamp, tokens = msg
-                # Добавление пары сообщений (пользователь + AI) в интерфейс
-                self.chat_history.controls.extend([
-                    MessageBubble(  # Создание пузырька сообщения пользователя
-                        message=user_message,
-                        is_user=True
-                    ),
-                    MessageBubble(  # Создание пузырька ответа AI
-                        message=ai_response,
-                        is_user=False
-                    )
-                ])
+            self.chat_history.load_latest()
         except Exception as e:
             # Логирование ошибки при загрузке истории
             self.logger.error(f"Ошибка загрузки истории чата: {e}")
 
-    def update_balance(self):
+    def update_balance(self, service: BalanceService):
         """
         Обновление отображения баланса API в интерфейсе.
-        При успешном получении баланса показывает его зеленым цветом,
-        при ошибке - красным с текстом 'н/д' (не доступен).
-        """
-        try:
-            balance = self.api_client.get_balance()  # Запрос баланса через API
-            balance = float(balance)
-            self.balance_text.value = f"Баланс: {balance}"  # Обновление текста с балансом
-
-            # Проверка баланса и отправка уведомления
-            try:
-                if balance < 1.0:
-                    asyncio.run(send_telegram_message(
-                        text=f"⚠️ Внимание! Баланс OpenRouter API стал ниже $1.0 и составляет: {balance:.2f}"
-                    ))
-            except ValueError:
-                self.logger.error(f"Не удалось преобразовать баланс в число: {balance}")
+        Полученный от API баланс показывается зеленым цветом, сохраненный
+        с прошлого запуска или оцененный по расходу - с пометкой,
+        при ошибке без известного значения - красным с текстом 'н/д'.
 
-            self.balance_text.color = ft.Colors.GREEN_400  # Установка зеленого цвета для успешного получения
-        except Exception as e:
-            # Обработка ошибки получения баланса
-            self.balance_text.value = "Баланс: н/д"  # Установка текста ошибки
-            self.balance_text.color = ft.Colors.RED_400  # Установка красного цвета для ошибки
-            self.logger.error(f"Ошибка обновления баланса: {e}")
+        Args:
+            service (BalanceService): Сервис баланса
+        """
+        value = service.value
+        if value is None:
+            if service.error:
+                self.balance_text.value = "Баланс: н/д"  # Установка текста ошибки
+                self.balance_text.color = ft.Colors.RED_400  # Установка красного цвета для ошибки
+            return
+
+        text = f"Баланс: {value:.4f}"
+        if service.is_estimate:
+            text += " (оценка)"  # Расход после последнего запроса учтен локально
+        elif service.error or not service.fetched_at or service.fetched_at < self.started_at:
+            text += " (кэш)"  # Значение с прошлого запуска или до ошибки запроса
+        self.balance_text.value = text
+        self.balance_text.color = ft.Colors.GREEN_400  # Установка зеленого цвета для известного баланса
 
     def main(self, page: ft.Page):
         """
@@ -114,105 +146,400 @@ class ChatApp:
 
         AppStyles.set_window_size(page)  # Установка размеров окна приложения
 
+        # Обновления страницы объединяются и отправляются не чаще раза в кадр
+        self.ui = UpdateScheduler(page)
+
         # Инициализация выпадающего списка для выбора модели AI
         models = self.api_client.available_models
         self.model_dropdown = ModelSelector(models)
-        self.model_dropdown.value = models[0] if models else None
+        self.model_dropdown.value = models[0]['id'] if models else None
+
+        def on_models_updated(updated_models):
+            """Обновление списка моделей после фонового обновления каталога"""
+            self.model_dropdown.set_models(updated_models)
+            self.ui.request()
+
+        # Фоновое обновление каталога запускается только после подключения обработчика
+        self.api_client.start_model_refresh(on_models_updated)
+
+        def on_balance_changed(service):
+            """Отображение баланса после обновления или оценки расхода"""
+            self.update_balance(service)
+            self.ui.request()
 
         async def send_message_click(e):
             """
-            Асинхронная функция отправки сообщения.
+            Отправка сообщения.
+
+            Сообщение и строка состояния с кнопкой остановки сразу добавляются
+            в историю, а запрос выполняется отдельной задачей: поле ввода
+            остается доступным для следующих сообщений. Одновременно выполняется
+            не более MAX_CONCURRENT_REQUESTS запросов, остальные ждут в очереди.
+            Если выбраны модели для сравнения, сообщение отправляется им всем.
             """
             if not self.message_input.value:
                 return
 
-            try:
-                # Визуальная индикация процесса
-                self.message_input.border_color = ft.Colors.BLUE_400
-                page.update()
+            # Визуальная индикация процесса
+            self.message_input.border_color = ft.Colors.BLUE_400
+            user_message = self.message_input.value
+            self.message_input.value = ""
 
-                # Сохранение данных сообщения
-                start_time = time.time()
-                user_message = self.message_input.value
-                self.message_input.value = ""
-                page.update()
+            # Добавление сообщения пользователя после последних сообщений истории
+            self.chat_history.show_latest()
+            user_bubble = MessageBubble(message=user_message, is_user=True)
 
-                # Добавление сообщения пользователя
-                self.chat_history.controls.append(
-                    MessageBubble(message=user_message, is_user=True)
-                )
+            # Строка состояния (очередь, генерация) с кнопкой остановки запроса
+            status = RequestStatus(on_stop=lambda _: page.loop.call_soon_threadsafe(task.cancel))
+            self.chat_history.append(user_bubble, status)
+            self.ui.request()  # Одно обновление для индикации, очистки ввода и пузырька
 
-                # Индикатор загрузки
-                loading = ft.ProgressRing()
-                self.chat_history.controls.append(loading)
-                page.update()
+            models = list(self.compare_models) if len(self.compare_models) > 1 else [self.model_dropdown.value]
+            task = asyncio.create_task(process_request(user_message, models, user_bubble, status))
+            self.active_requests.add(task)
+            task.add_done_callback(self.active_requests.discard)
 
-                # Асинхронная отправка запроса
-                loop = asyncio.get_event_loop()
-                response = await loop.run_in_executor(
-                    None,
-                    lambda: self.api_client.send_message(
-                        user_message,
-                        self.model_dropdown.value
+        async def process_request(user_message: str, models: list, user_bubble: MessageBubble,
+                                  status: RequestStatus):
+            """
+            Выполнение запроса к модели (или к нескольким моделям при сравнении)
+            с потоковым выводом ответа.
+
+            При отмене (кнопка остановки) HTTP-поток закрывается, а частичный
+            ответ, время и оценка токенов сохраняются в истории и аналитике.
+            Сравнение занимает одно место среди выполняющихся запросов.
+
+            Args:
+                user_message (str): Текст сообщения пользователя
+                models (list): Идентификаторы выбранных моделей
+                user_bubble (MessageBubble): Пузырек сообщения пользователя
+                status (RequestStatus): Строка состояния запроса
+            """
+            # Идентификатор запроса для всех записей лога, сделанных при его обработке
+            request_id = new_request_id()
+
+            # Корневой спан трассировки запроса: этапы ниже объединяются общим trace_id
+            with tracer.span("chat.send_message", new_trace=True, request_id=request_id,
+                             model=",".join(models)) as request_span:
+                try:
+                    # Ожидание свободного места среди выполняющихся запросов
+                    try:
+                        with tracer.span("request.queue"):
+                            await self.request_slots.acquire()
+                    except asyncio.CancelledError:
+                        # Отмена до начала запроса: сообщение не отправлялось и возвращается в поле ввода
+                        self.chat_history.remove(user_bubble, status)
+                        if not self.message_input.value:
+                            self.message_input.value = user_message
+                        self.ui.request()
+                        request_span.set(cancelled=True, queued=True)
+                        return
+
+                    try:
+                        if len(models) > 1:
+                            await stream_comparison(user_message, models, user_bubble, status, request_span)
+                        else:
+                            await stream_response(user_message, models[0], user_bubble, status, request_span)
+                    finally:
+                        self.request_slots.release()
+
+                except Exception as e:
+                    self.logger.error(f"Ошибка отправки сообщения: {e}")
+                    self.message_input.border_color = ft.Colors.RED_500
+                    self.chat_history.remove(status)
+
+                    # Показ уведомления об ошибке
+                    snack = ft.SnackBar(
+                        content=ft.Text(
+                            str(e),
+                            color=ft.Colors.RED_500,
+                            weight=ft.FontWeight.BOLD
+                        ),
+                        bgcolor=ft.Colors.GREY_900,
+                        duration=5000,
                     )
-                )
+                    page.overlay.append(snack)
+                    snack.open = True
+                    self.ui.flush()
 
-                # Удаление индикатора загрузки
-                self.chat_history.controls.remove(loading)
+        async def stream_model(user_message: str, model: str, response_bubble: MessageBubble,
+                               on_first_token, session_id):
+            """
+            Потоковое получение ответа одной модели, сохранение в историю и учет в аналитике.
 
-                # Обработка ответа
-                if "error" in response:
-                    response_text = f"Ошибка: {response['error']}"
-                    tokens_used = 0
-                    self.logger.error(f"Ошибка API: {response['error']}")
-                else:
-                    response_text = response["choices"][0]["message"]["content"]
-                    tokens_used = response.get("usage", {}).get("total_tokens", 0)
-
-                # Сохранение в кэш
-                self.cache.save_message(
-                    model=self.model_dropdown.value,
-                    user_message=user_message,
-                    ai_response=response_text,
-                    tokens_used=tokens_used
-                )
+            Отмена не пробрасывается: частичный ответ, время и оценка токенов
+            сохраняются вне контекста сессии, а результат помечается остановленным.
 
-                # Добавление ответа в чат
-                self.chat_history.controls.append(
-                    MessageBubble(message=response_text, is_user=False)
-                )
+            Args:
+                user_message (str): Текст сообщения пользователя
+                model (str): Идентификатор модели
+                response_bubble (MessageBubble): Пузырек, заполняемый по мере поступления токенов
+                on_first_token (callable): Вызывается при получении первого фрагмента ответа
+                session_id (str): Сессия диалога для сохранения ответа (None - вне диалога)
+
+            Returns:
+                dict: {"response_time": float, "cancelled": bool, "error": str | None,
+                       "row_key": str} - row_key идентифицирует сохраненную запись
+            """
+            start_time = time.time()
+            response_text = ""
+            tokens_used = 0
+            completion_tokens = None
+            first_token_time = None  # Время до первого токена
+            cache_hit = False
+            cancelled = False
+            usage = None
+            error = None
+
+            # Сборка истории диалога в пределах контекстного окна модели
+            model_info = self.api_client.catalog.get_model(model) or {}
+            history, context_tokens = self.conversation.build_history(
+                user_message,
+                context_limit=model_info.get("context_length")
+            )
+
+            # Потоковое получение ответа; токены одного кадра отправляются одним обновлением
+            stream_span = tracer.span("api.stream", model=model)
+            ui_flushes = self.ui.flushes
+            with stream_span:
+                try:
+                    async for event in self.async_client.stream_message(user_message, model, history):
+                        if event["type"] == "delta":
+                            if first_token_time is None:
+                                first_token_time = time.time() - start_time
+                                on_first_token()
+                            response_text += event["content"]
+                            response_bubble.append_text(event["content"])
+                            self.ui.request()
+                        elif event["type"] == "done":
+                            tokens_used = event["usage"].get("total_tokens", 0)
+                            completion_tokens = event["usage"].get("completion_tokens")
+                            usage = event["usage"]
+                            cache_hit = event.get("cached", False)
+                        elif event["type"] == "error":
+                            error = event["error"]
+                except asyncio.CancelledError:
+                    # Остановка пользователем: HTTP-поток уже закрыт клиентом
+                    cancelled = True
+                    completion_tokens = estimate_tokens(response_text)
+                    tokens_used = context_tokens + completion_tokens
+                    usage = {"prompt_tokens": context_tokens, "completion_tokens": completion_tokens}
+                stream_span.set(ttft=first_token_time, ui_updates=self.ui.flushes - ui_flushes,
+                                cache_hit=cache_hit, cancelled=cancelled)
+
+            # Обработка ошибки
+            if error:
+                self.logger.error(f"Ошибка API: {error}")
+                if not response_text:
+                    response_text = f"Ошибка: {error}"
+                    response_bubble.set_text(response_text)
+            if cancelled:
+                response_text += "\n[Остановлено]"
+                response_bubble.set_text(response_text)
+
+            # Сохранение в кэш; неудачная или остановленная реплика остается
+            # в истории чата, но не попадает в контекст следующих запросов сессии
+            # (иначе модель получила бы текст ошибки или пометку "[Остановлено]")
+            row_key = self.cache.save_message(
+                model=model,
+                user_message=user_message,
+                ai_response=response_text,
+                tokens_used=tokens_used,
+                session_id=None if error or cancelled else session_id
+            )
+
+            # Обновление аналитики (для остановленного запроса - частичные время и токены)
+            response_time = time.time() - start_time
+            self.analytics.track_message(
+                model=model,
+                message_length=len(user_message),
+                response_time=response_time,
+                tokens_used=tokens_used,
+                context_tokens=context_tokens,
+                cache_hit=cache_hit,
+                ttft=first_token_time,
+                completion_tokens=completion_tokens,
+                cancelled=cancelled,
+                error=bool(error)
+            )
+
+            self.logger.event(
+                "chat.response", "Response received",
+                model=model,
+                latency_ms=round(response_time * 1000),
+                ttft_ms=round(first_token_time * 1000) if first_token_time is not None else None,
+                tokens=tokens_used,
+                cache_hit=cache_hit,
+                cancelled=cancelled
+            )
+
+            # Учет расхода в балансе (ответы из кэша не тарифицируются)
+            if not cache_hit and not error:
+                page.run_task(self.balance.on_completion, model, usage)
+
+            return {"response_time": response_time, "cancelled": cancelled, "error": error,
+                    "row_key": row_key}
+
+        async def stream_response(user_message: str, model: str, user_bubble: MessageBubble,
+                                  status: RequestStatus, request_span):
+            """
+            Потоковое получение ответа выбранной модели в продолжение диалога.
+            """
+            status.set_status("Генерация...")
+            self.ui.request()
+
+            # Пузырек ответа появляется над строкой состояния при первом токене
+            response_bubble = MessageBubble(message="", is_user=False)
+            result = await stream_model(
+                user_message, model, response_bubble,
+                on_first_token=lambda: self.chat_history.insert_before(status, response_bubble),
+                session_id=self.conversation.session_id
+            )
+
+            # Замена строки состояния пузырьком ответа
+            if response_bubble not in self.chat_history.controls:
+                self.chat_history.insert_before(status, response_bubble)
+            self.chat_history.remove(status)
+            self.chat_history.mark_saved(user_bubble, [result["row_key"]])
+            request_span.set(cancelled=result["cancelled"])
+
+            # Логирование метрик
+            self.monitor.log_metrics(self.logger)
+            self.ui.flush()  # Итоговое состояние ответа без ожидания кадра
+
+        async def stream_comparison(user_message: str, models: list, user_bubble: MessageBubble,
+                                    status: RequestStatus, request_span):
+            """
+            Одновременная отправка сообщения нескольким моделям.
 
-                # Обновление аналитики
-                response_time = time.time() - start_time
-                self.analytics.track_message(
-                    model=self.model_dropdown.value,
-                    message_length=len(user_message),
-                    response_time=response_time,
-                    tokens_used=tokens_used
+            Ответы выводятся рядом по мере поступления, каждый сохраняется
+            в историю и аналитику со своим временем ответа, поэтому общее время
+            определяется самой медленной моделью, а не суммой. Сравнение
+            не входит в контекст диалога: ответы сохраняются без сессии.
+            """
+            status.set_status(f"Генерация ({len(models)} модели)...")
+            comparison = ComparisonRow(models)
+            self.chat_history.insert_before(status, comparison)
+            self.ui.request()
+
+            async def run_model(model):
+                """Ответ одной модели в своей колонке"""
+                result = await stream_model(
+                    user_message, model, comparison.bubbles[model],
+                    on_first_token=lambda: comparison.set_model_status(model, "генерация..."),
+                    session_id=None
                 )
+                if result["cancelled"]:
+                    comparison.set_model_status(model, "остановлено")
+                elif result["error"]:
+                    comparison.set_model_status(model, "ошибка")
+                else:
+                    comparison.set_model_status(model, f"{result['response_time']:.1f} с")
+                self.ui.request()
+                return result
 
-                # Логирование метрик
-                self.monitor.log_metrics(self.logger)
+            start_time = time.time()
+            tasks = [asyncio.create_task(run_model(model)) for model in models]
+            try:
+                await asyncio.gather(*tasks)
+            except asyncio.CancelledError:
+                pass  # Остановка пользователем: частичные ответы уже сохранены задачами моделей
+
+            # Задача, отмененная до начала выполнения, ничего не сохранила
+            results = [task.result() for task in tasks if not task.cancelled()]
+            for model, task in zip(models, tasks):
+                if task.cancelled():
+                    comparison.set_model_status(model, "остановлено")
+
+            self.chat_history.remove(status)
+            self.chat_history.mark_saved(user_bubble, [result["row_key"] for result in results])
+
+            wall_time = time.time() - start_time
+            cancelled = any(result["cancelled"] for result in results) or len(results) < len(models)
+            self.logger.event(
+                "chat.comparison", "Comparison completed",
+                models=len(models),
+                wall_ms=round(wall_time * 1000),
+                slowest_ms=round(max((r["response_time"] for r in results), default=0) * 1000),
+                total_ms=round(sum(r["response_time"] for r in results) * 1000),
+                cancelled=cancelled
+            )
+            request_span.set(cancelled=cancelled, models=len(models))
+
+            # Логирование метрик
+            self.monitor.log_metrics(self.logger)
+            self.ui.flush()  # Итоговое состояние ответов без ожидания кадра
+
+        def update_compare_label():
+            """Отображение списка моделей, выбранных для сравнения"""
+            if len(self.compare_models) > 1:
+                self.compare_label.value = f"Сравнение: {', '.join(self.compare_models)}"
+            else:
+                self.compare_label.value = "Сравнение моделей выключено"
+
+        async def select_compare_models(e):
+            """Выбор моделей для одновременной отправки сообщения и сравнения ответов"""
+            selected = list(self.compare_models)
+            models_list = ft.ListView(spacing=0, height=400, width=500)
+            counter = ft.Text()
+            filter_field = ft.TextField(hint_text="Поиск модели", width=500)
+
+            def toggle(e, model_id):
+                """Добавление или исключение модели из сравнения"""
+                if e.control.value and model_id not in selected:
+                    if len(selected) >= FANOUT_MAX_MODELS:
+                        e.control.value = False  # Достигнут предел количества моделей
+                    else:
+                        selected.append(model_id)
+                elif not e.control.value and model_id in selected:
+                    selected.remove(model_id)
+                counter.value = f"Выбрано: {len(selected)} из {FANOUT_MAX_MODELS}"
                 page.update()
 
-            except Exception as e:
-                self.logger.error(f"Ошибка отправки сообщения: {e}")
-                self.message_input.border_color = ft.Colors.RED_500
-
-                # Показ уведомления об ошибке
-                snack = ft.SnackBar(
-                    content=ft.Text(
-                        str(e),
-                        color=ft.Colors.RED_500,
-                        weight=ft.FontWeight.BOLD
-                    ),
-                    bgcolor=ft.Colors.GREY_900,
-                    duration=5000,
-                )
-                page.overlay.append(snack)
-                snack.open = True
+            def render(e=None):
+                """Отображение моделей, подходящих под фильтр"""
+                query = (filter_field.value or "").lower()
+                models_list.controls = [
+                    ft.Checkbox(
+                        label=model['name'],
+                        value=model['id'] in selected,
+                        on_change=lambda e, model_id=model['id']: toggle(e, model_id)
+                    )
+                    for model in self.api_client.available_models
+                    if not query or query in model['id'].lower() or query in model['name'].lower()
+                ]
+                counter.value = f"Выбрано: {len(selected)} из {FANOUT_MAX_MODELS}"
                 page.update()
 
+            def apply(e):
+                """Сохранение выбора"""
+                self.compare_models = list(selected)
+                update_compare_label()
+                close_dialog(dialog)
+
+            def reset(e):
+                """Выключение сравнения"""
+                self.compare_models = []
+                update_compare_label()
+                close_dialog(dialog)
+
+            filter_field.on_change = render
+
+            # Создание диалога выбора моделей
+            dialog = ft.AlertDialog(
+                title=ft.Text("Сравнение моделей"),
+                content=ft.Column([filter_field, counter, models_list], tight=True),
+                actions=[
+                    ft.TextButton("Выключить", on_click=reset),
+                    ft.TextButton("Отмена", on_click=lambda e: close_dialog(dialog)),
+                    ft.TextButton("Готово", on_click=apply),
+                ],
+            )
+
+            page.overlay.append(dialog)
+            dialog.open = True
+            render()
+
         def show_error_snack(page, message: str):
             """Показ уведомления об ошибке"""
             snack = ft.SnackBar(  # Создание уведомления
@@ -227,20 +554,56 @@ class ChatApp:
             snack.open = True  # Открытие уведомления
             page.update()  # Обновление страницы
 
+        async def export_trace(e):
+            """Экспорт сохраненных спанов в формате Chrome trace JSON"""
+            try:
+                filename = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+                filepath = tracer.export_chrome_trace(
+                    os.path.join(self.exports_dir, filename),
+                    self.cache.get_trace_spans()
+                )
+                snack = ft.SnackBar(content=ft.Text(f"Трассировка сохранена: {filepath}"))
+                page.overlay.append(snack)
+                snack.open = True
+                page.update()
+            except Exception as ex:
+                self.logger.error(f"Ошибка экспорта трассировки: {ex}")
+                show_error_snack(page, f"Ошибка экспорта трассировки: {str(ex)}")
+
         async def show_analytics(e):
             """Показ статистики использования"""
             stats = self.analytics.get_statistics()  # Получение статистики
 
+            # Перцентили задержек по моделям
+            latency_rows = []
+            for model, latency in stats['latency'].items():
+                latency_rows.extend([
+                    ft.Text(model, weight=ft.FontWeight.BOLD),
+                    ft.Text(f"Ответ p50/p90/p99: {latency['p50']:.2f} / {latency['p90']:.2f} / "
+                            f"{latency['p99']:.2f} с"),
+                    ft.Text(f"Первый токен p50/p90/p99: {latency['ttft_p50']:.2f} / "
+                            f"{latency['ttft_p90']:.2f} / {latency['ttft_p99']:.2f} с"),
+                    ft.Text(f"Скорость генерации: {latency['tokens_per_sec']:.1f} токенов/с")
+                ])
+
             # Создание диалога статистики
             dialog = ft.AlertDialog(
                 title=ft.Text("Аналитика"),
-                content=ft.Column([
+                content=ft.Column(scroll=ft.ScrollMode.AUTO, controls=[
                     ft.Text(f"Всего сообщений: {stats['total_messages']}"),
                     ft.Text(f"Всего токенов: {stats['total_tokens']}"),
                     ft.Text(f"Среднее токенов/сообщение: {stats['tokens_per_message']:.2f}"),
-                    ft.Text(f"Сообщений в минуту: {stats['messages_per_minute']:.2f}")
+                    ft.Text(f"Сообщений в минуту: {stats['messages_per_minute']:.2f}"),
+                    ft.Text(f"Средний контекст (токенов): {stats['context_tokens_per_message']:.0f}"),
+                    ft.Text(f"Ответов из кэша: {stats['cache_hits']}"),
+                    ft.Text(f"Сэкономлено токенов: {stats['cache_tokens_saved']}"),
+                    ft.Text(f"Сэкономлено времени: {stats['cache_time_saved']:.1f} с"),
+                    ft.Text(f"Остановлено запросов: {stats['cancelled_requests']}"),
+                    *latency_rows
                 ]),
                 actions=[
+                    ft.TextButton("Экспорт трассировки", on_click=export_trace,
+                                  visible=tracer.enabled),
                     ft.TextButton("Закрыть", on_click=lambda e: close_dialog(dialog)),
                 ],
             )
@@ -256,7 +619,8 @@ class ChatApp:
             try:
                 self.cache.clear_history()  # Очистка кэша
                 self.analytics.clear_data()  # Очистка аналитики
-                self.chat_history.controls.clear()  # Очистка истории чата
+                self.conversation.reset()  # Начало новой сессии диалога
+                self.chat_history.clear()  # Очистка истории чата
 
             except Exception as e:
                 self.logger.error(f"Ошибка очистки истории: {e}")
@@ -288,6 +652,61 @@ class ChatApp:
             dialog.open = True
             page.update()
 
+        async def search_history(e):
+            """Полнотекстовый поиск по истории и показ результатов"""
+            query = (self.search_input.value or "").strip()
+            if not query:
+                return
+
+            results_list = ft.ListView(spacing=5, height=400, width=500)
+            more_button = ft.TextButton("Показать ещё", visible=False)
+            state = {"cursor": None}
+
+            def open_hit(message_id):
+                """Переход к найденному сообщению"""
+                close_dialog(dialog)
+                try:
+                    self.chat_history.jump_to(message_id)
+                except Exception as ex:
+                    self.logger.error(f"Ошибка перехода к сообщению: {ex}")
+                    show_error_snack(page, f"Ошибка перехода к сообщению: {str(ex)}")
+
+            def load_results(e=None):
+                """Загрузка очередной страницы результатов"""
+                found = self.cache.search(query, cursor=state["cursor"])
+                state["cursor"] = found["next_cursor"]
+                for hit in found["results"]:
+                    results_list.controls.append(ft.ListTile(
+                        title=ft.Text(hit["user_snippet"], max_lines=2),
+                        subtitle=ft.Text(f"{hit['model']} · {hit['ai_snippet']}", max_lines=2),
+                        on_click=lambda e, message_id=hit["id"]: open_hit(message_id)
+                    ))
+                if not results_list.controls:
+                    results_list.controls.append(ft.Text("Ничего не найдено"))
+                more_button.visible = state["cursor"] is not None
+                page.update()
+
+            more_button.on_click = load_results
+
+            # Создание диалога результатов поиска
+            dialog = ft.AlertDialog(
+                title=ft.Text(f"Поиск: {query}"),
+                content=results_list,
+                actions=[
+                    more_button,
+                    ft.TextButton("Закрыть", on_click=lambda e: close_dialog(dialog)),
+                ],
+            )
+
+            page.overlay.append(dialog)
+            dialog.open = True
+            try:
+                load_results()
+            except Exception as ex:
+                self.logger.error(f"Ошибка поиска: {ex}")
+                close_dialog(dialog)
+                show_error_snack(page, f"Ошибка поиска: {str(ex)}")
+
         def close_dialog(dialog):
             """Закрытие диалогового окна"""
             dialog.open = False  # Закрытие диалога
@@ -349,11 +768,31 @@ class ChatApp:
 
         # Создание компонентов интерфейса
         self.message_input = ft.TextField(**AppStyles.MESSAGE_INPUT)  # Поле ввода
-        self.chat_history = ft.ListView(**AppStyles.CHAT_HISTORY)  # История чата
+        self.chat_history = ChatHistoryView(  # История чата (окно из последних сообщений)
+            self.cache,
+            page_size=HISTORY_PAGE_SIZE,
+            window_size=HISTORY_WINDOW_SIZE,
+            scroll_threshold=HISTORY_SCROLL_THRESHOLD,
+            **AppStyles.CHAT_HISTORY
+        )
+        self.chat_history.scheduler = self.ui
+
+        self.search_input = ft.TextField(  # Поле поиска по истории
+            on_submit=search_history,
+            **AppStyles.HISTORY_SEARCH_FIELD
+        )
 
         # Загрузка существующей истории
         self.load_chat_history()
 
+        # Кнопка и список моделей для сравнения ответов
+        compare_button = ft.IconButton(
+            on_click=select_compare_models,  # Привязка функции выбора моделей
+            **AppStyles.COMPARE_BUTTON  # Применение стилей
+        )
+        self.compare_label = ft.Text(**AppStyles.COMPARE_LABEL)
+        update_compare_label()
+
         # Создание кнопок управления
         save_button = ft.ElevatedButton(
             on_click=save_dialog,  # Привязка функции сохранения
@@ -416,6 +855,7 @@ class ChatApp:
             controls=[  # Размещение элементов выбора модели
                 self.model_dropdown.search_field,
                 self.model_dropdown,
+                ft.Row(controls=[compare_button, self.compare_label]),
                 balance_container
             ],
             **AppStyles.MODEL_SELECTION_COLUMN  # Применение стилей к колонке
@@ -425,6 +865,7 @@ class ChatApp:
         self.main_column = ft.Column(
             controls=[  # Размещение основных элементов
                 model_selection,
+                self.search_input,
                 self.chat_history,
                 controls_column
             ],
@@ -434,8 +875,27 @@ class ChatApp:
         # Добавление основной колонки на страницу
         page.add(self.main_column)
 
-        # Запуск монитора
+        # Запуск монитора (фоновые замеры, если задан MONITOR_SAMPLE_INTERVAL)
         self.monitor.get_metrics()
+        self.monitor.start_sampling()
+
+        # Фоновое получение и периодическое обновление баланса
+        self.balance.on_change = on_balance_changed
+        page.run_task(self.balance.run)
+
+        def on_connect(e):
+            """Повторное подключение страницы (веб-режим)"""
+            self.connected_pages += 1
+
+        async def on_disconnect(e):
+            """Закрытие HTTP-сессии асинхронного клиента после отключения последней страницы"""
+            self.connected_pages -= 1
+            if self.connected_pages <= 0:
+                await self.async_client.close()  # Сессия создается заново при следующем запросе
+
+        self.connected_pages += 1
+        page.on_connect = on_connect
+        page.on_disconnect = on_disconnect
 
         # Логирование запуска
         self.logger.info("Приложение запущено")
@@ -1,13 +1,12 @@
 # Импорт необходимых библиотек
 import flet as ft  # Основной фреймворк для создания GUI
-from api import OpenRouterClient  # Клиент для работы с API OpenRouter
+from api import AsyncOpenRouterClient  # Асинхронный клиент для работы с API OpenRouter
 from ui import MessageBubble  # Компонент для отображения сообщений
-import asyncio  # Библиотека для асинхронного программирования
 
 class SimpleChatApp:
     def __init__(self):
         # Инициализация основных компонентов приложения
-        self.api_client = OpenRouterClient()  # Клиент для API
+        self.api_client = AsyncOpenRouterClient()  # Клиент для API
 
     def main(self, page: ft.Page):
         # Настройка основных параметров страницы
@@ -62,13 +61,9 @@ class SimpleChatApp:
             page.update()
 
             # Асинхронная отправка запроса к API
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.api_client.send_message(
-                    user_message, 
-                    "openai/gpt-3.5-turbo"
-                )
+            response = await self.api_client.send_message(
+                user_message,
+                "openai/gpt-3.5-turbo"
             )
 
             # Удаление индикатора загрузки
@@ -93,6 +88,12 @@ class SimpleChatApp:
             on_click=send_message  # Обработчик нажатия
         )
 
+        async def on_disconnect(e):
+            # Закрытие HTTP-сессии клиента и соединений ее пула при отключении страницы
+            await self.api_client.close()
+
+        page.on_disconnect = on_disconnect
+
         # Добавление всех элементов на страницу
         page.add(
             ft.Container(
@@ -2,7 +2,8 @@
 UI package initialization.
 Contains UI components and styles.
 """
-from .components import MessageBubble, ModelSelector
+from .components import ChatHistoryView, ComparisonRow, MessageBubble, ModelSelector, RequestStatus
 from .styles import AppStyles
+from .update_scheduler import UpdateScheduler
 
-__all__ = ['MessageBubble', 'ModelSelector', 'AppStyles']
+__all__ = ['ChatHistoryView', 'ComparisonRow', 'MessageBubble', 'ModelSelector', 'RequestStatus', 'AppStyles', 'UpdateScheduler']
@@ -24,16 +24,47 @@ class MessageBubble(ft.Container):
         # Настройка скругления углов пузырька
         self.border_radius = 10
         
+        # Цвет, выравнивание и отступы в зависимости от отправителя
+        self.set_role(is_user)
+
+        # Текст сообщения с настройками отображения
+        # Ссылка сохраняется для последующего дополнения текста при потоковом ответе
+        self.message_text = ft.Text(
+            value=message,                    # Текст сообщения
+            color=ft.Colors.WHITE,            # Белый цвет текста
+            size=16,                         # Размер шрифта
+            selectable=True,                 # Возможность выделения текста
+            weight=ft.FontWeight.W_400       # Нормальная толщина шрифта
+        )
+
+        # Создание содержимого пузырька
+        self.content = ft.Column(
+            controls=[self.message_text],
+            tight=True  # Плотное расположение элементов в колонке
+        )
+
+    def set_role(self, is_user: bool):
+        """
+        Оформление пузырька для сообщения пользователя или AI.
+
+        Используется при создании и при повторном использовании пузырька
+        в ChatHistoryView.
+
+        Args:
+            is_user (bool): Флаг, указывающий, является ли это сообщением пользователя
+        """
+        self.is_user = is_user
+
         # Установка цвета фона в зависимости от отправителя:
         # - Синий для сообщений пользователя
         # - Серый для сообщений AI
         self.bgcolor = ft.Colors.BLUE_700 if is_user else ft.Colors.GREY_700
-        
+
         # Установка выравнивания пузырька:
         # - Справа для сообщений пользователя
         # - Слева для сообщений AI
         self.alignment = ft.alignment.center_right if is_user else ft.alignment.center_left
-        
+
         # Настройка внешних отступов для создания эффекта диалога:
         # - Отступ слева для сообщений пользователя
         # - Отступ справа для сообщений AI
@@ -44,22 +75,95 @@ class MessageBubble(ft.Container):
             top=5,                           # Отступ сверху
             bottom=5                         # Отступ снизу
         )
-        
-        # Создание содержимого пузырька
-        self.content = ft.Column(
+
+    def append_text(self, chunk: str):
+        """
+        Дополнение текста сообщения очередным фрагментом.
+
+        Используется при потоковом получении ответа: текст пузырька
+        растет по мере поступления токенов от API.
+
+        Args:
+            chunk (str): Фрагмент текста для добавления в конец сообщения
+        """
+        self.message_text.value = (self.message_text.value or "") + chunk
+
+    def set_text(self, message: str):
+        """
+        Полная замена текста сообщения.
+
+        Args:
+            message (str): Новый текст сообщения
+        """
+        self.message_text.value = message
+
+
+class RequestStatus(ft.Row):
+    """
+    Строка состояния выполняющегося запроса.
+
+    Наследуется от ft.Row. Показывает индикатор загрузки, состояние
+    запроса (в очереди, генерация) и кнопку остановки.
+
+    Args:
+        on_stop (callable): Обработчик нажатия кнопки остановки
+    """
+    def __init__(self, on_stop):
+        # Индикатор загрузки и текст состояния
+        self.status_text = ft.Text("В очереди...", **AppStyles.REQUEST_STATUS_TEXT)
+        self.stop_button = ft.IconButton(on_click=on_stop, **AppStyles.STOP_BUTTON)
+        super().__init__(
             controls=[
-                # Текст сообщения с настройками отображения
-                ft.Text(
-                    value=message,                    # Текст сообщения
-                    color=ft.Colors.WHITE,            # Белый цвет текста
-                    size=16,                         # Размер шрифта
-                    selectable=True,                 # Возможность выделения текста
-                    weight=ft.FontWeight.W_400       # Нормальная толщина шрифта
-                )
+                ft.ProgressRing(width=16, height=16, stroke_width=2),
+                self.status_text,
+                self.stop_button
             ],
-            tight=True  # Плотное расположение элементов в колонке
+            spacing=10
         )
 
+    def set_status(self, text: str):
+        """
+        Замена текста состояния.
+
+        Args:
+            text (str): Новое состояние запроса
+        """
+        self.status_text.value = text
+
+
+class ComparisonRow(ft.Row):
+    """
+    Ответы нескольких моделей на одно сообщение, расположенные рядом.
+
+    Наследуется от ft.Row. Для каждой модели создается колонка с заголовком
+    (название модели и состояние ответа) и пузырьком ответа, который
+    заполняется по мере поступления токенов.
+
+    Args:
+        models (list): Идентификаторы моделей в порядке отображения
+    """
+    def __init__(self, models: list):
+        self.headers = {}  # Заголовки колонок по ID модели
+        self.bubbles = {}  # Пузырьки ответов по ID модели
+        panels = []
+        for model in models:
+            self.headers[model] = ft.Text(f"{model} · ожидание", **AppStyles.COMPARISON_HEADER)
+            bubble = MessageBubble(message="", is_user=False)
+            bubble.margin = ft.margin.only(top=5, bottom=5)  # Колонки стоят вплотную друг к другу
+            self.bubbles[model] = bubble
+            panels.append(ft.Column(controls=[self.headers[model], bubble], tight=True, expand=True))
+        super().__init__(controls=panels, **AppStyles.COMPARISON_ROW)
+
+    def set_model_status(self, model: str, text: str):
+        """
+        Замена состояния ответа модели в заголовке колонки.
+
+        Args:
+            model (str): Идентификатор модели
+            text (str): Новое состояние (генерация, время ответа, ошибка)
+        """
+        self.headers[model].value = f"{model} · {text}"
+
 
 class ModelSelector(ft.Dropdown):
     """
@@ -105,6 +209,33 @@ class ModelSelector(ft.Dropdown):
             **AppStyles.MODEL_SEARCH_FIELD       # Применение стилей из конфигурации
         )
 
+    def set_models(self, models: list):
+        """
+        Замена списка моделей (например, после фонового обновления каталога).
+
+        Текущий выбор сохраняется, если выбранная модель осталась в списке.
+
+        Args:
+            models (list): Новый список моделей в формате [{"id": ..., "name": ...}, ...]
+        """
+        self.all_options = [
+            ft.dropdown.Option(key=model['id'], text=model['name'])
+            for model in models
+        ]
+        self.options = self.all_options
+
+        # Сохранение выбранной модели или выбор первой доступной
+        if self.value not in {model['id'] for model in models}:
+            self.value = models[0]['id'] if models else None
+
+        # Повторное применение текущего фильтра поиска
+        if self.search_field.value:
+            search_text = self.search_field.value.lower()
+            self.options = [
+                opt for opt in self.all_options
+                if search_text in opt.text.lower() or search_text in opt.key.lower()
+            ]
+
     def filter_options(self, e):
         """
         Фильтрация списка моделей на основе введенного текста поиска.
@@ -128,3 +259,379 @@ class ModelSelector(ft.Dropdown):
         
         # Обновление интерфейса для отображения отфильтрованного списка
         e.page.update()
+
+
+class ChatHistoryView(ft.ListView):
+    """
+    Виртуализированный список истории чата.
+
+    Наследуется от ft.ListView. В дереве элементов держится только окно
+    из не более чем window_size сообщений: при прокрутке страницы истории
+    подгружаются из ChatCache, а сообщения с противоположного края окна
+    удаляются, поэтому стоимость page.update() не растет с длиной чата.
+    Удаленные пузырьки переиспользуются для новых сообщений.
+
+    Каждая группа сообщений (пользователь + ответ AI или ответы нескольких
+    моделей при сравнении) начинается с пузырька пользователя, в data
+    которого хранится ID первой записи группы в базе, а в last_id - последней.
+
+    Args:
+        cache (ChatCache): Кэш с историей сообщений
+        page_size (int): Количество пар сообщений, загружаемых за один раз
+        window_size (int): Максимальное количество пар сообщений в окне
+        scroll_threshold (int): Расстояние до края списка (в пикселях),
+                                при котором подгружается следующая страница
+    """
+
+    # Пометка сообщения, сохраненного в базу, ID которого еще не известен
+    SAVED = -1
+
+    def __init__(self, cache, page_size: int = 10, window_size: int = 100,
+                 scroll_threshold: int = 200, **kwargs):
+        # Инициализация родительского класса ListView
+        super().__init__(**kwargs)
+
+        self.cache = cache
+        self.page_size = page_size
+        self.window_size = max(window_size, page_size * 2)  # Окно вмещает хотя бы две страницы
+        self.scroll_threshold = scroll_threshold
+
+        # Пузырьки, доступные для повторного использования
+        self.pool = []
+        # Пузырьки, удаленные до ближайшего обновления: переиспользуются только
+        # после того, как их удаление отправлено клиенту
+        self.released = []
+        self.released_flush = 0  # Счетчик обновлений планировщика на момент удаления
+
+        # Состояние окна
+        self.oldest_loaded_id = None   # ID самого старого сообщения в окне
+        self.newest_loaded_id = None   # ID самого нового сообщения в окне
+        self.history_exhausted = True  # Вся более старая история уже в окне
+        self.newer_exhausted = True    # Окно заканчивается последним сообщением
+        self.history_loading = False   # Идет загрузка страницы
+
+        # Планировщик обновлений страницы (UpdateScheduler); без него список
+        # обновляется сразу через ListView.update()
+        self.scheduler = None
+
+        self.on_scroll = self._on_scroll
+        self.on_scroll_interval = 100  # Не чаще одного события в 100 мс
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        """Подгрузка сообщений при приближении к началу или концу списка"""
+        if e.pixels <= e.min_scroll_extent + self.scroll_threshold:
+            self.load_older()
+        elif e.pixels >= e.max_scroll_extent - self.scroll_threshold:
+            self.load_newer()
+
+    def _refresh(self, immediate: bool = False):
+        """
+        Отправка изменений окна клиенту.
+
+        Args:
+            immediate (bool): Обновить сразу, а не в ближайшем кадре планировщика
+                              (нужно перед scroll_to к добавленным сообщениям)
+        """
+        if self.scheduler is None:
+            self.update()
+        elif immediate:
+            self.scheduler.flush()
+        else:
+            self.scheduler.request()
+
+    def _acquire(self, message: str, is_user: bool) -> MessageBubble:
+        """
+        Пузырек для сообщения: из пула или новый.
+        """
+        if self.pool:
+            bubble = self.pool.pop()
+            bubble.set_role(is_user)
+            bubble.set_text(message)
+            return bubble
+        bubble = MessageBubble(message=message, is_user=is_user)
+        bubble.recyclable = True
+        return bubble
+
+    def _release(self, controls):
+        """
+        Возврат удаленных из окна пузырьков для повторного использования.
+
+        Переиспользуются только пузырьки, созданные самим списком: пузырьки
+        выполняющихся запросов могут продолжать заполняться вне окна.
+        """
+        for control in controls:
+            if getattr(control, 'recyclable', False) and len(self.released) < self.window_size * 2:
+                control.key = None
+                control.data = None
+                control.last_id = None
+                self.released.append(control)
+        if self.scheduler is not None:
+            self.released_flush = self.scheduler.flushes
+
+    def _recycle(self):
+        """
+        Перенос удаленных пузырьков в пул.
+
+        Вызывается перед каждым изменением окна. Обновление через планировщик
+        может быть еще отложено, поэтому пузырьки переносятся, только если
+        после их удаления страница уже обновлялась: иначе клиент получил бы
+        переиспользованный пузырек как перемещенный, а не удаленный.
+        """
+        if self.scheduler is not None and self.scheduler.flushes <= self.released_flush:
+            return
+        self.pool.extend(self.released)
+        self.released = []
+
+    def _make_bubbles(self, history):
+        """
+        Создание пузырьков для строк истории.
+
+        Args:
+            history (iterable): Строки истории в хронологическом порядке
+
+        Returns:
+            list: Пузырьки сообщений; пузырек пользователя получает ключ
+                  msg-<id> для прокрутки к найденному сообщению
+        """
+        bubbles = []
+        for msg in history:
+            # Распаковка данных сообщения в отдельные переменные
+            message_id, model, user_message, ai_response, timestamp, tokens = msg
+            user_bubble = self._acquire(user_message, is_user=True)
+            user_bubble.key = f"msg-{message_id}"
+            user_bubble.data = message_id
+            user_bubble.last_id = message_id
+            bubbles.extend([user_bubble, self._acquire(ai_response, is_user=False)])
+        return bubbles
+
+    def _groups(self):
+        """
+        Разбиение элементов окна на группы сообщений.
+
+        Returns:
+            list: Кортежи (начальный индекс, ID первой записи, ID последней записи)
+                  для каждой группы; ID равен None для сообщения, которое еще
+                  не сохранено
+        """
+        groups = []
+        for i, control in enumerate(self.controls):
+            if isinstance(control, MessageBubble) and control.is_user:
+                groups.append((i, control.data, getattr(control, 'last_id', None) or control.data))
+        return groups
+
+    def _resolve_ids(self):
+        """
+        Получение ID сообщений, отправленных в этой сессии.
+
+        Запросы завершаются в произвольном порядке, а сравнение моделей
+        сохраняет несколько записей на одно сообщение, поэтому пузырек
+        хранит ключи своих записей (ChatCache.save_message) и ID находятся
+        по ним. Пока хотя бы одна запись группы не сохранена, пузырек
+        остается помеченным SAVED и сопоставляется при следующем вызове.
+        """
+        saved = [c for c in self.controls
+                 if isinstance(c, MessageBubble) and c.is_user and c.data == self.SAVED]
+        if not saved:
+            return
+        ids = self.cache.get_message_ids([key for bubble in saved for key in bubble.row_keys])
+        for bubble in saved:
+            if not all(key in ids for key in bubble.row_keys):
+                continue
+            row_ids = sorted(ids[key] for key in bubble.row_keys)
+            bubble.data = row_ids[0]
+            bubble.last_id = row_ids[-1]
+            bubble.key = f"msg-{row_ids[0]}"
+
+    def _trim_top(self):
+        """
+        Удаление самых старых сообщений, не помещающихся в окно.
+        """
+        groups = self._groups()
+        excess = len(groups) - self.window_size
+        if excess <= 0:
+            return
+        self._resolve_ids()
+        groups = self._groups()
+        # Окно должно начинаться с сохраненного сообщения, чтобы его можно было подгрузить снова
+        while excess < len(groups) and not (groups[excess][1] or 0) > 0:
+            excess += 1
+        if excess >= len(groups):
+            return
+        start, first_id, _ = groups[excess]
+        self._release(self.controls[:start])
+        del self.controls[:start]
+        self.oldest_loaded_id = first_id
+        self.history_exhausted = False
+
+    def _trim_bottom(self):
+        """
+        Удаление самых новых сообщений, не помещающихся в окно.
+        """
+        groups = self._groups()
+        excess = len(groups) - self.window_size
+        if excess <= 0:
+            return
+        if any(message_id is None for _, message_id, _ in groups[-excess:]):
+            return  # Ответ еще не получен: окно временно превышает лимит
+        self._resolve_ids()
+        groups = self._groups()
+        start = groups[-excess][0]
+        self._release(self.controls[start:])
+        del self.controls[start:]
+        self.newest_loaded_id = groups[-excess - 1][2]
+        self.newer_exhausted = False
+        self.auto_scroll = False  # Новые сообщения не видны, автопрокрутка не нужна
+
+    def load_latest(self):
+        """
+        Загрузка первой страницы истории (последних сообщений).
+        Более старые сообщения подгружаются при прокрутке вверх.
+        """
+        self._recycle()
+        self._release(self.controls)
+        self.controls.clear()
+        history = self.cache.get_history_page(None, self.page_size)
+        self.history_exhausted = len(history) < self.page_size
+        self.newer_exhausted = True
+        self.oldest_loaded_id = history[-1][0] if history else None
+        self.newest_loaded_id = history[0][0] if history else None
+        self.controls.extend(self._make_bubbles(reversed(history)))
+
+    def show_latest(self):
+        """
+        Возврат к последней странице истории, если в окне показан
+        фрагмент из середины (после прокрутки или перехода к результату поиска).
+        """
+        if not self.newer_exhausted:
+            self.load_latest()
+        self.auto_scroll = True  # Возврат к последним сообщениям
+
+    def clear(self):
+        """
+        Очистка окна после удаления истории.
+        """
+        self._recycle()
+        self._release(self.controls)
+        self.controls.clear()
+        self.oldest_loaded_id = None
+        self.newest_loaded_id = None
+        self.history_exhausted = True
+        self.newer_exhausted = True
+
+    def append(self, *controls):
+        """
+        Добавление элементов нового сообщения в конец окна.
+
+        Args:
+            *controls: Пузырьки сообщений и индикаторы загрузки
+        """
+        self._recycle()
+        self.controls.extend(controls)
+        self._trim_top()
+
+    def insert_before(self, anchor, control):
+        """
+        Вставка элемента перед другим элементом окна
+        (например, пузырька ответа перед строкой состояния запроса).
+
+        Args:
+            anchor: Элемент, перед которым выполняется вставка
+            control: Вставляемый элемент
+        """
+        if anchor in self.controls:  # Окно могло смениться (например, переход к результату поиска)
+            self.controls.insert(self.controls.index(anchor), control)
+
+    def remove(self, *controls):
+        """
+        Удаление элементов из окна, если они в нем есть.
+
+        Args:
+            *controls: Пузырьки сообщений и строки состояния
+        """
+        for control in controls:
+            if control in self.controls:
+                self.controls.remove(control)
+
+    def mark_saved(self, user_bubble: MessageBubble, row_keys: list):
+        """
+        Отметка сообщения пользователя как сохраненного в базу.
+
+        Args:
+            user_bubble (MessageBubble): Пузырек сообщения пользователя
+            row_keys (list): Ключи сохраненных записей (ответов моделей)
+        """
+        if user_bubble.data is None and row_keys:
+            user_bubble.data = self.SAVED
+            user_bubble.row_keys = list(row_keys)
+
+    def load_older(self):
+        """
+        Подгрузка более старых сообщений в начало окна.
+        """
+        if self.history_exhausted or self.history_loading:
+            return
+        self.history_loading = True
+        try:
+            self._recycle()
+            history = self.cache.get_history_page(self.oldest_loaded_id, self.page_size)
+            if len(history) < self.page_size:
+                self.history_exhausted = True
+            if history:
+                self.oldest_loaded_id = history[-1][0]
+                # Отключение автопрокрутки, чтобы не уводить пользователя вниз
+                self.auto_scroll = False
+                self.controls[0:0] = self._make_bubbles(reversed(history))
+                self._trim_bottom()
+                self._refresh()
+        finally:
+            self.history_loading = False
+
+    def load_newer(self):
+        """
+        Подгрузка более новых сообщений в конец окна.
+        """
+        if self.newer_exhausted or self.history_loading:
+            return
+        self.history_loading = True
+        try:
+            self._recycle()
+            history = self.cache.get_history_after(self.newest_loaded_id, self.page_size)
+            if len(history) < self.page_size:
+                self.newer_exhausted = True
+            if history:
+                self.newest_loaded_id = history[-1][0]
+                self.controls.extend(self._make_bubbles(history))
+                trimmed = len(self._groups()) > self.window_size
+                self._trim_top()
+                self._refresh(immediate=trimmed)
+                if trimmed:
+                    # Удаление сверху сдвигает содержимое: возврат к границе подгруженной страницы
+                    self.scroll_to(key=f"msg-{history[0][0]}", duration=0)
+        finally:
+            self.history_loading = False
+
+    def jump_to(self, message_id: int):
+        """
+        Переход к сообщению из результатов поиска.
+
+        Показывает страницу истории, заканчивающуюся найденным сообщением,
+        и следующую за ним страницу; остальное подгружается прокруткой
+        в обе стороны.
+
+        Args:
+            message_id (int): ID найденного сообщения
+        """
+        self._recycle()
+        older = self.cache.get_history_page(message_id + 1, self.page_size)
+        newer = self.cache.get_history_after(message_id, self.page_size)
+
+        self.oldest_loaded_id = older[-1][0] if older else message_id
+        self.newest_loaded_id = newer[-1][0] if newer else message_id
+        self.history_exhausted = len(older) < self.page_size
+        self.newer_exhausted = len(newer) < self.page_size
+
+        self.auto_scroll = False
+        self._release(self.controls)
+        self.controls = self._make_bubbles(list(reversed(older)) + newer)
+        self._refresh(immediate=True)
+        self.scroll_to(key=f"msg-{message_id}", duration=300)
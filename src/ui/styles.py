@@ -61,6 +61,47 @@ class AppStyles:
         "width": 130,                        # Ширина кнопки
     }
 
+    # Настройки кнопки остановки запроса (в строке состояния под сообщением)
+    STOP_BUTTON = {
+        "icon": ft.icons.STOP_CIRCLE_OUTLINED,  # Иконка остановки
+        "icon_color": ft.Colors.RED_400,     # Цвет иконки
+        "icon_size": 20,                     # Размер иконки
+        "tooltip": "Остановить генерацию",   # Всплывающая подсказка
+    }
+
+    # Настройки текста состояния запроса ("В очереди", "Генерация...")
+    REQUEST_STATUS_TEXT = {
+        "size": 12,                          # Размер шрифта
+        "color": ft.Colors.GREY_400,         # Цвет текста
+    }
+
+    # Настройки кнопки выбора моделей для сравнения ответов
+    COMPARE_BUTTON = {
+        "icon": ft.icons.COMPARE_ARROWS,     # Иконка сравнения
+        "icon_color": ft.Colors.BLUE_400,    # Цвет иконки
+        "tooltip": "Сравнить ответы нескольких моделей",  # Всплывающая подсказка
+    }
+
+    # Настройки текста со списком моделей для сравнения
+    COMPARE_LABEL = {
+        "size": 12,                          # Размер шрифта
+        "color": ft.Colors.GREY_400,         # Цвет текста
+        "expand": True,                      # Занимает оставшуюся ширину строки
+    }
+
+    # Настройки ряда ответов моделей при сравнении
+    COMPARISON_ROW = {
+        "spacing": 10,                       # Отступ между колонками моделей
+        "vertical_alignment": ft.CrossAxisAlignment.START,  # Выравнивание колонок по верху
+    }
+
+    # Настройки заголовка колонки модели при сравнении
+    COMPARISON_HEADER = {
+        "size": 12,                          # Размер шрифта
+        "color": ft.Colors.GREY_400,         # Цвет текста
+        "weight": ft.FontWeight.BOLD,        # Жирное начертание
+    }
+
     # Настройки кнопки сохранения диалога
     SAVE_BUTTON = {
         "text": "Сохранить",                 # Текст на кнопке
@@ -149,6 +190,21 @@ class AppStyles:
         "height": 45,                        # Высота поля
     }
 
+    # Настройки поля полнотекстового поиска по истории чата
+    HISTORY_SEARCH_FIELD = {
+        "width": 400,                        # Ширина поля в пикселях
+        "height": 45,                        # Высота поля
+        "border_radius": 8,                  # Радиус скругления углов
+        "bgcolor": ft.Colors.GREY_900,       # Цвет фона поля
+        "border_color": ft.Colors.GREY_700,  # Цвет границы в обычном состоянии
+        "color": ft.Colors.WHITE,            # Цвет текста
+        "content_padding": 10,               # Внутренние отступы
+        "cursor_color": ft.Colors.WHITE,     # Цвет курсора
+        "focused_border_color": ft.Colors.BLUE_400,  # Цвет границы при фокусе
+        "hint_text": "Поиск по истории (Enter)",     # Текст-подсказка
+        "prefix_icon": ft.icons.MANAGE_SEARCH,       # Иконка поиска слева от поля
+    }
+
     # Настройки выпадающего списка выбора модели
     MODEL_DROPDOWN = {
         "width": 400,                        # Ширина списка
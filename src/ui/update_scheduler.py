@@ -0,0 +1,108 @@
+# Импорт необходимых библиотек
+import os          # Библиотека для работы с переменными окружения
+import threading   # Синхронизация запросов из потоков обработчиков Flet
+import time        # Библиотека для измерения интервалов
+from utils.logger import AppLogger  # Импорт собственного логгера
+from utils.tracing import tracer    # Трассировка этапов обработки запроса
+
+
+class UpdateScheduler:
+    """
+    Планировщик обновлений страницы Flet.
+
+    Каждый page.update() строит diff всего дерева элементов и отправляет
+    его клиенту. Вместо немедленного обновления код помечает страницу
+    измененной (request), а планировщик выполняет одно обновление не чаще
+    раза в interval секунд, объединяя изменения от потоковых токенов,
+    обновлений баланса и подгрузки истории.
+
+    request() можно вызывать из любого потока: обновление всегда
+    выполняется в цикле событий страницы.
+    """
+
+    def __init__(self, page, interval: float = None):
+        """
+        Инициализация планировщика.
+
+        Args:
+            page (ft.Page): Страница Flet
+            interval (float): Минимальный интервал между обновлениями в секундах
+                              (по умолчанию UI_FRAME_INTERVAL_MS из .env или 33 мс)
+        """
+        self.page = page
+        self.interval = interval if interval is not None else float(
+            os.getenv("UI_FRAME_INTERVAL_MS", "33")) / 1000
+        self.logger = AppLogger()
+
+        self.lock = threading.Lock()
+        self.dirty = False         # Есть изменения, не отправленные клиенту
+        self.scheduled = None      # Запланированный вызов _flush
+        self.last_flush = 0.0      # Время последнего обновления (time.monotonic)
+
+        # Статистика: сколько запросов объединено в сколько обновлений
+        self.requests = 0
+        self.flushes = 0
+        self.pending_requests = 0
+
+    def request(self):
+        """
+        Пометка страницы измененной.
+
+        Обновление выполняется в ближайшем кадре: сразу, если с прошлого
+        обновления прошло не меньше interval, иначе в конце интервала.
+        """
+        with self.lock:
+            self.requests += 1
+            self.pending_requests += 1
+            self.dirty = True
+            if self.scheduled is not None:
+                return  # Обновление уже запланировано и учтет это изменение
+            self.scheduled = True
+        self.page.loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        """
+        Планирование обновления в цикле событий страницы.
+        """
+        delay = self.last_flush + self.interval - time.monotonic()
+        with self.lock:
+            if self.scheduled is not True:
+                return  # Обновление уже выполнено через flush()
+            self.scheduled = self.page.loop.call_later(max(delay, 0), self._flush)
+
+    def _flush(self):
+        """
+        Выполнение запланированного обновления.
+        """
+        with self.lock:
+            self.scheduled = None
+            if not self.dirty:
+                return
+            self.dirty = False
+            coalesced, self.pending_requests = self.pending_requests, 0
+        self.last_flush = time.monotonic()
+        self.flushes += 1
+        try:
+            with tracer.span("ui.update", coalesced=coalesced):
+                self.page.update()
+        except Exception as e:
+            self.logger.error("Ошибка обновления интерфейса: %s", e)
+
+    def flush(self):
+        """
+        Немедленное обновление страницы.
+
+        Используется, когда следующий шаг зависит от уже отправленного
+        клиенту состояния (например, scroll_to к только что добавленному
+        сообщению) или в конце обработки запроса.
+        """
+        with self.lock:
+            handle, self.scheduled = self.scheduled, None
+            self.dirty = False
+            coalesced, self.pending_requests = self.pending_requests, 0
+        if handle is not None and handle is not True:
+            handle.cancel()
+        self.last_flush = time.monotonic()
+        self.flushes += 1
+        with tracer.span("ui.update", coalesced=coalesced):
+            self.page.update()
@@ -3,15 +3,37 @@ Utils package initialization.
 Contains utility modules for the application.
 """
 from .analytics import Analytics
+from .balance import BalanceService
 from .cache import ChatCache
+from .conversation import ConversationSession, estimate_tokens
+from .latency_histogram import LatencyHistogram
 from .logger import AppLogger
+from .model_catalog import ModelCatalog
 from .monitor import PerformanceMonitor
-from .notifications import send_telegram_message
+from .rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+from .notifications import TelegramNotifier, get_notifier, send_telegram_message
+from .response_cache import ResponseCache
+from .session_store import SessionStore
+from .tracing import Tracer, tracer
 
 __all__ = [
     'Analytics',
+    'BalanceService',
     'ChatCache',
+    'ConversationSession',
+    'estimate_tokens',
+    'LatencyHistogram',
     'AppLogger',
+    'ModelCatalog',
     'PerformanceMonitor',
+    'RateLimiter',
+    'ResponseCache',
+    'SessionStore',
+    'TokenBucket',
+    'Tracer',
+    'tracer',
+    'TelegramNotifier',
+    'get_notifier',
+    'get_rate_limiter',
     'send_telegram_message'
 ]
@@ -1,6 +1,13 @@
 # Импорт необходимых библиотек
+import atexit                # Сохранение гистограмм при завершении процесса
 import time                  # Библиотека для работы с временными метками и измерения интервалов
 from datetime import datetime  # Библиотека для работы с датой и временем в удобном формате
+from utils.session_store import SessionStore  # Колоночное хранилище записей по сообщениям
+from utils.latency_histogram import LatencyHistogram  # Гистограммы для перцентилей задержек
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
+
+# Метрики, для которых ведутся гистограммы по моделям
+LATENCY_METRICS = ('response_time', 'ttft', 'tokens_per_sec')
 
 class Analytics:
     """
@@ -29,40 +36,205 @@ class Analytics:
         self.cache = cache
         self.start_time = time.time()
         self.model_usage = {}
-        self.session_data = []
+        self.session_data = SessionStore()  # Записи сообщений текущей сессии
+        self.context_tokens_total = 0  # Суммарный размер контекста всех запросов
+
+        # Статистика кэша ответов: попадания отделены от реальных запросов к API
+        self.cache_stats = {
+            'hits': 0,            # Ответов, полученных из кэша
+            'tokens_saved': 0,    # Токенов, не потраченных благодаря кэшу
+            'hit_time': 0.0,      # Суммарное время ответов из кэша
+            'api_count': 0,       # Ответов, полученных от API
+            'api_time': 0.0       # Суммарное время ответов API
+        }
+        
+        # Гистограммы задержек: модель -> {метрика: LatencyHistogram}
+        self.latency = {}
+        self.dirty_latency = set()  # Модели с несохраненными изменениями гистограмм
         
         # Загрузка исторических данных из базы
         self._load_historical_data()
+
+        # Гистограммы сохраняются при завершении, а не после каждого сообщения
+        atexit.register(self.flush)
         
     def _load_historical_data(self):
         """
-        Загрузка исторических данных из базы данных.
-        Обновляет статистику использования моделей и сессионные данные.
+        Загрузка исторической статистики из базы данных.
+
+        Читаются только агрегаты по моделям (analytics_rollup), поэтому
+        время запуска не зависит от объема истории. Записи по отдельным
+        сообщениям загружаются по запросу (load_records, export_data).
         """
-        history = self.cache.get_analytics_history()
-        
-        for record in history:
-            timestamp, model, message_length, response_time, tokens_used = record
-            
-            # Обновление статистики моделей
-            if model not in self.model_usage:
-                self.model_usage[model] = {
-                    'count': 0,
-                    'tokens': 0
-                }
-            self.model_usage[model]['count'] += 1
-            self.model_usage[model]['tokens'] += tokens_used
-            
-            # Добавление в сессионные данные
-            self.session_data.append({
-                'timestamp': datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f'),
-                'model': model,
-                'message_length': message_length,
-                'response_time': response_time,
-                'tokens_used': tokens_used
-            })
+        for (model, count, tokens, context_tokens, latency_sum, latency_min, latency_max,
+             cache_hits, cache_tokens, cache_latency_sum, cancelled,
+             cancelled_latency_sum) in self.cache.get_analytics_totals():
+            usage = self._model_entry(model)
+            usage['count'] += count
+            usage['tokens'] += tokens
+            usage['latency_sum'] += latency_sum
+            usage['latency_min'] = min(usage['latency_min'], latency_min)
+            usage['latency_max'] = max(usage['latency_max'], latency_max)
+            usage['cancelled'] += cancelled
+            self.context_tokens_total += context_tokens
+
+            self.cache_stats['hits'] += cache_hits
+            self.cache_stats['tokens_saved'] += cache_tokens
+            self.cache_stats['hit_time'] += cache_latency_sum
+            # Отмененные запросы не входят в среднее время полного ответа API
+            self.cache_stats['api_count'] += count - cache_hits - cancelled
+            self.cache_stats['api_time'] += latency_sum - cache_latency_sum - cancelled_latency_sum
+
+        # Гистограммы прошлых сессий объединяются с текущей
+        for model, metric, data in self.cache.get_latency_histograms():
+            if metric in LATENCY_METRICS:
+                self._model_histograms(model)[metric].merge(LatencyHistogram.from_json(data))
+
+    def _model_histograms(self, model: str) -> dict:
+        """
+        Получение гистограмм задержек модели с созданием при первом использовании.
+        """
+        if model not in self.latency:
+            self.latency[model] = {metric: LatencyHistogram() for metric in LATENCY_METRICS}
+        return self.latency[model]
+
+    def _record_latency(self, model: str, response_time: float, ttft: float = None,
+                        completion_tokens: int = None):
+        """
+        Добавление задержек ответа API в гистограммы модели.
+
+        Гистограмма помечается измененной и сохраняется в базу при flush.
+
+        Args:
+            model (str): Идентификатор модели
+            response_time (float): Полное время ответа в секундах
+            ttft (float): Время до первого токена в секундах
+            completion_tokens (int): Количество сгенерированных токенов
+        """
+        histograms = self._model_histograms(model)
+        histograms['response_time'].record(response_time)
+        if ttft is not None:
+            histograms['ttft'].record(ttft)
+
+        # Скорость генерации считается после первого токена
+        generation_time = response_time - (ttft or 0)
+        if completion_tokens and generation_time > 0:
+            histograms['tokens_per_sec'].record(completion_tokens / generation_time)
+
+        self.dirty_latency.add(model)
+
+    def flush(self):
+        """
+        Сохранение измененных гистограмм задержек в базу данных.
+
+        Записываются только модели, получившие новые замеры после
+        предыдущего сохранения.
+        """
+        for model in sorted(self.dirty_latency):
+            for metric, histogram in self.latency[model].items():
+                if histogram.count:
+                    self.cache.save_latency_histogram(model, metric, histogram.to_json())
+        self.dirty_latency.clear()
+
+    def _model_entry(self, model: str) -> dict:
+        """
+        Получение статистики модели с инициализацией при первом использовании.
+        """
+        if model not in self.model_usage:
+            self.model_usage[model] = {
+                'count': 0,                    # Счетчик использований
+                'tokens': 0,                   # Счетчик токенов
+                'latency_sum': 0.0,            # Суммарное время ответа
+                'latency_min': float('inf'),   # Минимальное время ответа
+                'latency_max': 0.0,            # Максимальное время ответа
+                'cancelled': 0                 # Отмененных пользователем запросов
+            }
+        return self.model_usage[model]
+
+    def _account(self, model: str, response_time: float, tokens_used: int,
+                 context_tokens: int, cache_hit: bool, cancelled: bool = False):
+        """
+        Обновление агрегированной статистики одним сообщением.
+
+        Токены ответов из кэша не учитываются в расходе модели,
+        а записываются в сэкономленные. Частичные токены отмененного
+        запроса входят в расход, а его время - только в счетчик отмен.
+        """
+        usage = self._model_entry(model)
+
+        # Обновление статистики использования модели
+        usage['count'] += 1          # Увеличение счетчика сообщений
+        usage['latency_sum'] += response_time
+        usage['latency_min'] = min(usage['latency_min'], response_time)
+        usage['latency_max'] = max(usage['latency_max'], response_time)
+        self.context_tokens_total += context_tokens
+
+        if cache_hit:
+            self.cache_stats['hits'] += 1
+            self.cache_stats['tokens_saved'] += tokens_used
+            self.cache_stats['hit_time'] += response_time
+        else:
+            usage['tokens'] += tokens_used  # Добавление использованных токенов
+            if cancelled:
+                usage['cancelled'] += 1
+            else:
+                self.cache_stats['api_count'] += 1
+                self.cache_stats['api_time'] += response_time
 
-    def track_message(self, model: str, message_length: int, response_time: float, tokens_used: int):
+    def load_records(self, model: str = None, since: datetime = None,
+                     limit: int = None) -> SessionStore:
+        """
+        Загрузка записей по отдельным сообщениям для детализации.
+
+        Args:
+            model (str): Только сообщения указанной модели
+            since (datetime): Только сообщения начиная с указанного времени
+            limit (int): Максимальное количество последних записей
+
+        Returns:
+            SessionStore: Колоночное хранилище записей; обращение по индексу
+                          и итерация дают словари в формате session_data
+        """
+        records = SessionStore()
+        for (timestamp, model_id, message_length, response_time, tokens_used,
+             context_tokens, cache_hit, cancelled) in self.cache.get_analytics_history(model, since, limit):
+            records.append(datetime.fromisoformat(timestamp), model_id, message_length,
+                           response_time, tokens_used, context_tokens, bool(cache_hit),
+                           bool(cancelled))
+        return records
+
+    def get_timeline(self, period: str = 'day', model: str = None, since: str = None) -> list:
+        """
+        Получение статистики по часам или дням из агрегатов.
+
+        Args:
+            period (str): Гранулярность: 'hour' или 'day'
+            model (str): Только указанная модель
+            since (str): Начало первого периода ('YYYY-MM-DD' или 'YYYY-MM-DD HH:00')
+
+        Returns:
+            list: Словари {bucket, model, count, tokens, avg_latency,
+                  latency_min, latency_max, cache_hits} в хронологическом порядке
+        """
+        return [
+            {
+                'bucket': bucket,
+                'model': model_id,
+                'count': count,
+                'tokens': tokens,
+                'avg_latency': latency_sum / count if count else 0,
+                'latency_min': latency_min,
+                'latency_max': latency_max,
+                'cache_hits': cache_hits
+            }
+            for (bucket, model_id, count, tokens, _, latency_sum, latency_min, latency_max,
+                 cache_hits, _, _) in self.cache.get_analytics_rollups(period, model, since)
+        ]
+
+    @tracer.traced("analytics.track_message")
+    def track_message(self, model: str, message_length: int, response_time: float, tokens_used: int,
+                      context_tokens: int = 0, cache_hit: bool = False, ttft: float = None,
+                      completion_tokens: int = None, cancelled: bool = False, error: bool = False):
         """
         Отслеживание метрик отдельного сообщения.
         
@@ -74,32 +246,33 @@ class Analytics:
             message_length (int): Длина сообщения в символах
             response_time (float): Время ответа в секундах
             tokens_used (int): Количество использованных токенов
+            context_tokens (int): Оценка размера контекста запроса в токенах
+            cache_hit (bool): Ответ получен из кэша ответов (tokens_used - сэкономленные токены)
+            ttft (float): Время до первого токена ответа в секундах
+            completion_tokens (int): Количество сгенерированных моделью токенов
+            cancelled (bool): Запрос отменен пользователем; response_time и tokens_used
+                              частичные (до момента отмены)
+            error (bool): Запрос завершился ошибкой API; время ошибки не учитывается
+                          в перцентилях задержек
         """
         timestamp = datetime.now()
         
         # Сохранение в базу данных
-        self.cache.save_analytics(timestamp, model, message_length, response_time, tokens_used)
-        
-        # Инициализация статистики для новой модели при первом использовании
-        if model not in self.model_usage:
-            self.model_usage[model] = {
-                'count': 0,    # Счетчик использований
-                'tokens': 0    # Счетчик токенов
-            }
+        self.cache.save_analytics(timestamp, model, message_length, response_time, tokens_used,
+                                  context_tokens, cache_hit, cancelled)
 
-        # Обновление статистики использования модели
-        self.model_usage[model]['count'] += 1          # Увеличение счетчика сообщений
-        self.model_usage[model]['tokens'] += tokens_used  # Добавление использованных токенов
-
-        # Сохранение подробной информации о сообщении
-        self.session_data.append({
-            'timestamp': timestamp,           # Время отправки сообщения
-            'model': model,                   # Использованная модель
-            'message_length': message_length, # Длина сообщения
-            'response_time': response_time,   # Время ответа
-            'tokens_used': tokens_used        # Количество токенов
-        })
+        # Обновление агрегированной статистики
+        self._account(model, response_time, tokens_used, context_tokens, cache_hit, cancelled)
+
+        # Перцентили задержек считаются только по полным успешным ответам API
+        if not cache_hit and not cancelled and not error:
+            self._record_latency(model, response_time, ttft, completion_tokens)
+
+        # Сохранение подробной информации о сообщении текущей сессии
+        self.session_data.append(timestamp, model, message_length, response_time, tokens_used,
+                                 context_tokens, cache_hit, cancelled)
 
+    @tracer.traced("analytics.get_statistics")
     def get_statistics(self) -> dict:
         """
         Получение общей статистики использования.
@@ -114,7 +287,14 @@ class Analytics:
                 - session_duration: длительность сессии в секундах
                 - messages_per_minute: среднее количество сообщений в минуту
                 - tokens_per_message: среднее количество токенов на сообщение
+                - context_tokens_per_message: средний размер контекста запроса
+                - cache_hits: количество ответов из кэша
+                - cache_tokens_saved: токены, сэкономленные кэшем
+                - cache_time_saved: оценка сэкономленного времени ожидания в секундах
+                - cancelled_requests: количество отмененных запросов
                 - model_usage: статистика использования каждой модели
+                  (count, tokens, latency_sum, latency_min, latency_max, cancelled)
+                - latency: перцентили по моделям (get_latency_percentiles)
         """
         # Расчет общей длительности сессии
         total_time = time.time() - self.start_time
@@ -139,20 +319,80 @@ class Analytics:
             # Расчет среднего количества токенов на сообщение
             # Если сообщений нет, возвращаем 0 чтобы избежать деления на ноль
             'tokens_per_message': total_tokens / total_messages if total_messages > 0 else 0,
+
+            # Средний размер контекста (история + новое сообщение) на запрос
+            'context_tokens_per_message': (
+                self.context_tokens_total / total_messages if total_messages > 0 else 0
+            ),
             
+            # Статистика кэша ответов
+            'cache_hits': self.cache_stats['hits'],
+            'cache_tokens_saved': self.cache_stats['tokens_saved'],
+            'cache_time_saved': self._cache_time_saved(),
+
+            # Запросы, отмененные пользователем до получения полного ответа
+            'cancelled_requests': sum(model['cancelled'] for model in self.model_usage.values()),
+
             # Полная статистика использования моделей
-            'model_usage': self.model_usage
+            'model_usage': self.model_usage,
+
+            # Перцентили задержек и скорость генерации по моделям
+            'latency': self.get_latency_percentiles()
         }
 
-    def export_data(self) -> list:
+    def get_latency_percentiles(self) -> dict:
+        """
+        Перцентили задержек и скорость генерации по моделям.
+
+        Returns:
+            dict: {model: {"count", "p50", "p90", "p99", "ttft_p50", "ttft_p90",
+                   "ttft_p99", "tokens_per_sec"}}, где времена в секундах,
+                   а tokens_per_sec - медиана скорости генерации
         """
-        Экспорт всех собранных данных сессии.
+        result = {}
+        for model, histograms in self.latency.items():
+            response_time, ttft = histograms['response_time'], histograms['ttft']
+            if not response_time.count:
+                continue
+            result[model] = {
+                'count': response_time.count,
+                'p50': response_time.quantile(0.5),
+                'p90': response_time.quantile(0.9),
+                'p99': response_time.quantile(0.99),
+                'ttft_p50': ttft.quantile(0.5),
+                'ttft_p90': ttft.quantile(0.9),
+                'ttft_p99': ttft.quantile(0.99),
+                'tokens_per_sec': histograms['tokens_per_sec'].quantile(0.5)
+            }
+        return result
+
+    def _cache_time_saved(self) -> float:
+        """
+        Оценка времени, сэкономленного ответами из кэша.
+
+        Returns:
+            float: Попадания в кэш, умноженные на разницу среднего времени
+                   ответа API и среднего времени ответа из кэша
+        """
+        stats = self.cache_stats
+        if not stats['hits'] or not stats['api_count']:
+            return 0.0
+        avg_api = stats['api_time'] / stats['api_count']
+        avg_hit = stats['hit_time'] / stats['hits']
+        return max(0.0, avg_api - avg_hit) * stats['hits']
+
+    def export_data(self) -> SessionStore:
+        """
+        Экспорт подробных данных обо всех сообщениях.
+
+        Записи читаются из базы только при вызове, так как при запуске
+        загружаются лишь агрегаты.
         
         Returns:
-            list: Список словарей с подробной информацией о каждом сообщении
-                 включая временные метки, использованные модели и метрики.
+            SessionStore: Последовательность записей о каждом сообщении; словари
+                 с временными метками, моделями и метриками создаются при обращении.
         """
-        return self.session_data
+        return self.load_records()
 
     def clear_data(self):
         """
@@ -161,7 +401,14 @@ class Analytics:
         Сбрасывает все счетчики и метрики, начиная новую сессию:
         - Очищает статистику использования моделей
         - Очищает историю сообщений
+        - Удаляет сохраненные записи, агрегаты и гистограммы из базы
         - Сбрасывает время начала сессии
         """
+        self.cache.clear_analytics()  # Удаление сохраненной аналитики
         self.model_usage.clear()    # Очистка статистики по моделям
         self.session_data.clear()   # Очистка истории сообщений
+        self.latency.clear()        # Очистка гистограмм задержек
+        self.dirty_latency.clear()  # Несохраненные гистограммы больше не нужны
+        self.context_tokens_total = 0  # Сброс суммарного размера контекста
+        for key in self.cache_stats:  # Сброс статистики кэша ответов
+            self.cache_stats[key] = 0
@@ -0,0 +1,212 @@
+# Импорт необходимых библиотек
+import asyncio     # Библиотека для асинхронного программирования
+import json        # Библиотека для работы с JSON форматом
+import os          # Библиотека для работы с файлами и переменными окружения
+import time        # Библиотека для работы с временными метками
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+
+class BalanceService:
+    """
+    Сервис баланса аккаунта OpenRouter.
+
+    Обеспечивает:
+    - Показ последнего известного баланса при запуске без запроса к API
+    - Асинхронное обновление после отрисовки окна и по расписанию
+    - Локальную оценку расхода по usage ответа и ценам из каталога моделей
+    - Уведомление только при пересечении порога вниз (повторно - после
+      пополнения выше порога)
+    """
+
+    def __init__(self, client, catalog=None, notifier=None, threshold: float = None,
+                 refresh_interval: float = None, path: str = 'balance_cache.json'):
+        """
+        Инициализация сервиса баланса.
+
+        Args:
+            client (AsyncOpenRouterClient): Клиент API с методом get_balance
+            catalog (ModelCatalog): Каталог моделей с ценами для оценки расхода
+            notifier (TelegramNotifier): Отправитель уведомлений о низком балансе
+            threshold (float): Порог уведомления (по умолчанию BALANCE_ALERT_THRESHOLD или 1.0)
+            refresh_interval (float): Интервал обновления в секундах
+                                      (по умолчанию BALANCE_REFRESH_INTERVAL или 300)
+            path (str): Файл с последним полученным балансом
+        """
+        self.client = client
+        self.catalog = catalog
+        self.notifier = notifier
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("BALANCE_ALERT_THRESHOLD", "1.0"))
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.getenv("BALANCE_REFRESH_INTERVAL", "300"))
+        self.path = path
+        self.logger = AppLogger()
+
+        # Последний полученный от API баланс и оценка расхода после него
+        cached = self._read()
+        self.balance = cached.get("balance")
+        self.fetched_at = cached.get("fetched_at", 0)
+        self.estimated_spend = 0.0
+        self.error = None
+
+        # Баланс ниже порога (None - еще неизвестно). Сохраняется вместе с балансом,
+        # чтобы запуск с сохраненным низким балансом не отправлял уведомление повторно;
+        # для файла прежнего формата состояние выводится из сохраненного баланса
+        self.below_threshold = cached.get("below_threshold")
+        if self.below_threshold is None and self.balance is not None:
+            self.below_threshold = self.balance < self.threshold
+
+        # Функция обновления интерфейса: on_change(service)
+        self.on_change = None
+
+        self._refresh_lock = None  # Создается в цикле событий при первом обновлении
+
+    def _read(self) -> dict:
+        """
+        Чтение сохраненного баланса.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        """
+        Атомарное сохранение последнего полученного баланса и состояния порога.
+        """
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"balance": self.balance, "fetched_at": self.fetched_at,
+                           "below_threshold": self.below_threshold}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning("Не удалось сохранить баланс: %s", e)
+
+    @property
+    def value(self):
+        """
+        Текущий баланс с учетом оценки расхода.
+
+        Returns:
+            float | None: Баланс или None, если он еще ни разу не был получен
+        """
+        if self.balance is None:
+            return None
+        return self.balance - self.estimated_spend
+
+    @property
+    def is_estimate(self) -> bool:
+        """Баланс включает локальную оценку расхода."""
+        return self.estimated_spend > 0
+
+    def _changed(self):
+        """
+        Проверка порога и уведомление интерфейса об изменении.
+        """
+        self._check_threshold()
+        if self.on_change:
+            self.on_change(self)
+
+    def _check_threshold(self):
+        """
+        Отправка уведомления только при переходе баланса ниже порога.
+        """
+        value = self.value
+        if value is None:
+            return
+        below = value < self.threshold
+        if below == self.below_threshold:
+            return
+        if below and self.notifier is not None:
+            self.notifier.notify(
+                f"⚠️ Внимание! Баланс OpenRouter API стал ниже ${self.threshold} "
+                f"и составляет: {value:.2f}",
+                key="low_balance"
+            )
+        self.below_threshold = below
+        self._write()  # Переход сохраняется: после перезапуска уведомление не повторяется
+
+    async def refresh(self, min_age: float = 0):
+        """
+        Запрос баланса у API.
+
+        Args:
+            min_age (float): Не запрашивать, если баланс получен менее min_age секунд назад
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:  # Одновременно выполняется один запрос
+            if self.balance is not None and time.time() - self.fetched_at < min_age:
+                return
+            balance = await self.client.get_balance()
+            try:
+                self.balance = float(balance)
+            except (TypeError, ValueError):
+                self.error = str(balance)
+                self.logger.error("Ошибка обновления баланса: %s", balance)
+            else:
+                self.error = None
+                self.fetched_at = time.time()
+                self.estimated_spend = 0.0
+                self._write()
+            self._changed()
+
+    def record_usage(self, model: str, usage: dict) -> bool:
+        """
+        Локальная оценка расхода по usage ответа.
+
+        Args:
+            model (str): Идентификатор модели
+            usage (dict): Блок usage ответа API (prompt_tokens, completion_tokens, cost)
+
+        Returns:
+            bool: True, если расход оценен; False, если цена модели неизвестна
+        """
+        if self.balance is None or not usage:
+            return False
+        cost = usage.get("cost")
+        if cost is None:
+            model_info = self.catalog.get_model(model) if self.catalog else None
+            if not model_info:
+                return False
+            pricing = model_info.get("pricing") or {}
+            cost = (usage.get("prompt_tokens", 0) * pricing.get("prompt", 0)
+                    + usage.get("completion_tokens", 0) * pricing.get("completion", 0))
+        self.estimated_spend += float(cost)
+        self._changed()
+        return True
+
+    async def on_completion(self, model: str, usage: dict):
+        """
+        Обновление баланса после ответа модели.
+
+        При известной цене расход оценивается локально без запроса к API,
+        иначе баланс запрашивается, если он не обновлялся последние 30 секунд.
+
+        Args:
+            model (str): Идентификатор модели
+            usage (dict): Блок usage ответа API
+        """
+        if not self.record_usage(model, usage):
+            await self.refresh(min_age=30)
+
+    async def run(self):
+        """
+        Первичное получение баланса и периодическое обновление.
+
+        Запускается как фоновая задача после отрисовки интерфейса.
+        """
+        if self.balance is not None:
+            self._changed()  # Показ сохраненного значения до ответа API
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.error = str(e)
+                self.logger.error("Ошибка обновления баланса: %s", e)
+                if self.on_change:
+                    self.on_change(self)
+            await asyncio.sleep(self.refresh_interval)
@@ -3,6 +3,192 @@ import sqlite3      # Библиотека для работы с SQLite баз
 import json        # Библиотека для работы с JSON форматом
 from datetime import datetime  # Библиотека для работы с датой и временем
 import threading   # Библиотека для обеспечения потокобезопасности
+import time        # Библиотека для работы с временными метками кэша ответов
+import os          # Библиотека для работы с переменными окружения
+import queue       # Потокобезопасная очередь для отложенной записи
+import atexit      # Сброс очереди записи при завершении процесса
+import logging     # Логирование ошибок фонового потока записи
+import uuid        # Генерация ключей записей сообщений
+from collections import Counter  # Счетчики незаписанных операций по ключам
+from itertools import groupby  # Группировка подряд идущих одинаковых запросов
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
+
+
+class WriteBehindQueue:
+    """
+    Очередь отложенной записи в SQLite.
+
+    Вставки из потока интерфейса помещаются в очередь и записываются
+    фоновым потоком пачками в одной транзакции. Пачка сбрасывается
+    при наборе batch_size записей, по истечении flush_interval
+    или по запросу flush(); при закрытии выполняется контрольная
+    точка WAL, чтобы данные были надежно сохранены на диске.
+
+    Операции помечаются ключами (таблица, сессия, ключ ответа), чтобы
+    чтение ожидало записи только при наличии незаписанных операций
+    по своему ключу, а не при любой активности очереди.
+    """
+
+    # Маркер остановки фонового потока
+    _STOP = object()
+
+    def __init__(self, connect, batch_size: int = None, flush_interval: float = None):
+        """
+        Инициализация очереди и запуск фонового потока записи.
+
+        Args:
+            connect (callable): Функция открытия соединения с базой
+            batch_size (int): Максимум записей в одной транзакции
+                              (по умолчанию CACHE_BATCH_SIZE из .env)
+            flush_interval (float): Максимальная задержка записи в секундах
+                                    (по умолчанию CACHE_FLUSH_INTERVAL из .env)
+        """
+        self.connect = connect
+        self.batch_size = batch_size or int(os.getenv("CACHE_BATCH_SIZE", "200"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(
+            os.getenv("CACHE_FLUSH_INTERVAL", "0.5"))
+
+        self.queue = queue.Queue()
+        self.pending = 0                 # Количество еще не записанных операций
+        self.pending_keys = Counter()    # Незаписанные операции по ключам
+        self.lock = threading.Lock()
+        self.closed = False
+        self.logger = logging.getLogger('ChatApp')
+
+        self.thread = threading.Thread(target=self._run, name='ChatCacheWriter', daemon=True)
+        self.thread.start()
+
+    def put(self, sql: str, params: tuple, keys: tuple = ()):
+        """
+        Постановка операции записи в очередь.
+
+        Args:
+            sql (str): SQL-запрос
+            params (tuple): Параметры запроса
+            keys (tuple): Ключи данных, видимость которых зависит от операции
+        """
+        with self.lock:
+            self.pending += 1
+            self.pending_keys.update(keys)
+        self.queue.put((sql, params, keys))
+
+    def is_pending(self, key) -> bool:
+        """
+        Проверка наличия незаписанных операций по ключу.
+
+        Args:
+            key: Ключ данных (см. put)
+
+        Returns:
+            bool: True, если есть операции, еще не записанные в базу
+        """
+        with self.lock:
+            return self.pending_keys[key] > 0
+
+    def flush(self, timeout: float = None, key=None) -> bool:
+        """
+        Ожидание записи всех поставленных ранее операций.
+
+        Args:
+            timeout (float): Максимальное время ожидания в секундах
+            key: Ожидать только при незаписанных операциях по этому ключу
+                 (None - при любых незаписанных операциях)
+
+        Returns:
+            bool: True, если все операции записаны
+        """
+        if key is not None and not self.is_pending(key):
+            return True
+        if not self.pending or not self.thread.is_alive():
+            return not self.pending
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10):
+        """
+        Запись оставшихся операций и остановка фонового потока.
+
+        Args:
+            timeout (float): Максимальное время ожидания в секундах
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(self._STOP)
+        self.thread.join(timeout)
+
+    def _run(self):
+        """
+        Цикл фонового потока: сбор пачек из очереди и их запись.
+        """
+        conn = self.connect()
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            batch = []
+            markers = []
+            deadline = time.monotonic() + self.flush_interval
+
+            # Сбор пачки до лимита, таймаута, маркера flush или остановки
+            while True:
+                if item is self._STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(conn, batch)
+            for marker in markers:
+                marker.set()
+
+        # Перенос WAL в основной файл базы с синхронизацией на диск
+        try:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        """
+        Запись пачки операций в одной транзакции.
+
+        При ошибке транзакция откатывается и операции записываются
+        по одной, чтобы одна некорректная запись не теряла всю пачку.
+        """
+        try:
+            conn.execute('BEGIN')
+            for sql, group in groupby(batch, key=lambda op: op[0]):
+                conn.executemany(sql, [op[1] for op in group])
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.logger.error(f"Batch write of {len(batch)} rows failed: {e}")
+            for sql, params, _ in batch:
+                try:
+                    conn.execute(sql, params)
+                    conn.commit()
+                except sqlite3.Error as row_error:
+                    conn.rollback()
+                    self.logger.error(f"Write failed: {row_error}")
+        finally:
+            with self.lock:
+                self.pending -= len(batch)
+                for _, _, keys in batch:
+                    self.pending_keys.subtract(keys)
+                self.pending_keys += Counter()  # Удаление нулевых счетчиков
+
 
 class ChatCache:
     """
@@ -15,7 +201,7 @@ class ChatCache:
     - Очистку истории
     """
     
-    def __init__(self):
+    def __init__(self, write_behind: bool = True):
         """
         Инициализация системы кэширования.
         
@@ -23,6 +209,11 @@ class ChatCache:
         - Файл базы данных SQLite
         - Потокобезопасное хранилище соединений
         - Необходимые таблицы в базе данных
+        - Фоновую очередь отложенной записи
+
+        Args:
+            write_behind (bool): Записывать вставки пачками в фоновом потоке
+                                 (False - синхронная запись с commit на каждую вставку)
         """
         # Имя файла SQLite базы данных
         self.db_name = 'chat_cache.db'
@@ -34,6 +225,52 @@ class ChatCache:
         # Создание необходимых таблиц при инициализации
         self.create_tables()
 
+        # Очередь отложенной записи; сбрасывается на диск при завершении процесса
+        self.writer = WriteBehindQueue(self._connect) if write_behind else None
+        if self.writer:
+            atexit.register(self.close)
+
+    def _execute_write(self, sql, params, keys=()):
+        """
+        Выполнение вставки или обновления через очередь отложенной записи.
+
+        Args:
+            sql (str): SQL-запрос
+            params (tuple): Параметры запроса
+            keys (tuple): Ключи данных для ожидания записи при чтении (см. flush)
+        """
+        if self.writer:
+            self.writer.put(sql, params, keys)
+            return
+        conn = self.get_connection()
+        conn.execute(sql, params)
+        conn.commit()
+
+    @tracer.traced("cache.flush")
+    def flush(self, timeout: float = None, key=None) -> bool:
+        """
+        Ожидание видимости отложенных записей в базе.
+
+        Без ключа ожидает записи всей очереди (завершение работы, экспорт).
+        С ключом возвращается сразу, если по нему нет незаписанных операций,
+        поэтому чтения из асинхронного пути отправки не ждут чужих записей.
+
+        Args:
+            timeout (float): Максимальное время ожидания в секундах
+            key: Ключ данных: имя таблицы, ('session', id) или ('response', key)
+
+        Returns:
+            bool: True, если отложенные записи сохранены
+        """
+        return self.writer.flush(timeout, key) if self.writer else True
+
+    def close(self):
+        """
+        Запись оставшихся данных и остановка фонового потока записи.
+        """
+        if self.writer:
+            self.writer.close()
+
     def get_connection(self):
         """
         Получение соединения с базой данных для текущего потока.
@@ -48,12 +285,69 @@ class ChatCache:
         # Проверяем, есть ли уже соединение в текущем потоке
         if not hasattr(self.local, 'connection'):
             # Если соединения нет - создаем новое
-            self.local.connection = sqlite3.connect(self.db_name)
+            self.local.connection = self._connect()
         return self.local.connection
 
+    def _connect(self):
+        """
+        Открытие соединения с настроенным профилем хранения.
+
+        Настраивает:
+        - Журнал WAL: чтение не блокируется записью, commit без перезаписи базы
+        - synchronous=NORMAL: fsync только при контрольных точках WAL
+        - Кэш страниц и отображение файла в память для быстрых чтений
+        - Ожидание блокировки вместо немедленной ошибки "database is locked"
+
+        Returns:
+            sqlite3.Connection: Объект соединения с базой данных
+        """
+        conn = sqlite3.connect(self.db_name)
+        conn.execute('PRAGMA journal_mode=WAL')        # Журнал с упреждающей записью
+        conn.execute('PRAGMA synchronous=NORMAL')      # Безопасно в режиме WAL
+        conn.execute('PRAGMA cache_size=-20000')       # Кэш страниц ~20 МБ
+        conn.execute('PRAGMA mmap_size=268435456')     # Отображение до 256 МБ файла в память
+        conn.execute('PRAGMA temp_store=MEMORY')       # Временные структуры сортировки в памяти
+        conn.execute('PRAGMA busy_timeout=5000')       # Ожидание блокировки до 5 секунд
+        return conn
+
     def create_tables(self):
         """
-        Создание необходимых таблиц в базе данных.
+        Создание и обновление схемы базы данных.
+
+        Версия схемы хранится в PRAGMA user_version. При запуске
+        последовательно применяются миграции, которых еще нет в базе,
+        поэтому существующие базы обновляются на месте. Каждая миграция
+        выполняется в отдельной транзакции вместе с записью номера версии.
+        """
+        # Создаем новое соединение с базой
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # Миграции схемы по порядку: позиция в списке + 1 = номер версии
+        migrations = [
+            self._migrate_v1_base_tables,
+            self._migrate_v2_sessions_and_response_cache,
+            self._migrate_v3_indexes,
+            self._migrate_v4_full_text_search,
+            self._migrate_v5_analytics_rollups,
+            self._migrate_v6_latency_histograms,
+            self._migrate_v7_trace_spans,
+            self._migrate_v8_cancelled_requests,
+            self._migrate_v9_message_row_keys,
+        ]
+
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(migrations[version:], start=version + 1):
+            cursor.execute('BEGIN')
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {number}')
+            conn.commit()  # Сохранение изменений в базе
+
+        conn.close()   # Закрытие соединения
+
+    def _migrate_v1_base_tables(self, cursor):
+        """
+        Миграция 1: исходные таблицы истории и аналитики.
         
         Создает таблицу messages со следующими полями:
         - id: уникальный идентификатор сообщения
@@ -63,10 +357,6 @@ class ChatCache:
         - timestamp: время создания сообщения
         - tokens_used: количество использованных токенов
         """
-        # Создаем новое соединение с базой
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
         # SQL запросы для создания таблиц
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS messages (
@@ -90,10 +380,267 @@ class ChatCache:
             )
         ''')
 
-        conn.commit()  # Сохранение изменений в базе
-        conn.close()   # Закрытие соединения
+    def _migrate_v2_sessions_and_response_cache(self, cursor):
+        """
+        Миграция 2: сессии диалога, размер контекста, кэш ответов.
+
+        Колонки добавляются только при отсутствии, так как базы, созданные
+        до появления версий схемы, могут уже их содержать.
+        """
+        # Кэш ответов API по ключу (модель, нормализованные сообщения, параметры)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,   -- SHA-256 ключа запроса
+                model TEXT,             -- Идентификатор модели
+                response TEXT,          -- Ответ API в формате JSON
+                tokens_used INTEGER,    -- Токены, потраченные на исходный запрос
+                size INTEGER,           -- Размер ответа в байтах
+                created_at REAL,        -- Время сохранения (epoch, сек)
+                last_access REAL        -- Время последнего обращения (epoch, сек)
+            )
+        ''')
+
+        # Добавление новых колонок в таблицы, созданные прежними версиями
+        self._ensure_column(cursor, 'messages', 'session_id', 'TEXT')  # ID сессии диалога
+        self._ensure_column(cursor, 'analytics_messages', 'context_tokens', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'analytics_messages', 'cache_hit', 'INTEGER DEFAULT 0')
+
+    def _migrate_v3_indexes(self, cursor):
+        """
+        Миграция 3: индексы для сортировок и выборок истории.
+
+        Запросы истории и аналитики сортируют по timestamp; без индексов
+        каждый такой запрос выполнял полную сортировку таблицы.
+        """
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_model_timestamp ON messages(model, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_timestamp ON analytics_messages(timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)')
+
+    def _migrate_v4_full_text_search(self, cursor):
+        """
+        Миграция 4: полнотекстовый индекс FTS5 по истории сообщений.
+
+        Индекс хранит только токены (content='messages'), тексты берутся
+        из самой таблицы messages. Синхронизация выполняется триггерами
+        на вставку, удаление и изменение; существующие сообщения
+        индексируются командой rebuild.
+        """
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                user_message,
+                ai_response,
+                content='messages',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, user_message, ai_response)
+                VALUES (new.id, new.user_message, new.ai_response);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, user_message, ai_response)
+                VALUES ('delete', old.id, old.user_message, old.ai_response);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, user_message, ai_response)
+                VALUES ('delete', old.id, old.user_message, old.ai_response);
+                INSERT INTO messages_fts(rowid, user_message, ai_response)
+                VALUES (new.id, new.user_message, new.ai_response);
+            END
+        ''')
+        cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+    def _migrate_v5_analytics_rollups(self, cursor):
+        """
+        Миграция 5: агрегаты аналитики по часам и дням.
+
+        Таблица analytics_rollup хранит для каждой пары (период, модель)
+        количество сообщений, токены и сумму/минимум/максимум времени ответа.
+        Агрегаты обновляются триггером при каждой вставке в analytics_messages,
+        поэтому статистика при запуске читается без обхода всех записей.
+        Существующие записи агрегируются при миграции.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_rollup (
+                period TEXT,                     -- Гранулярность: 'hour' или 'day'
+                bucket TEXT,                     -- Начало периода ('YYYY-MM-DD HH:00' или 'YYYY-MM-DD')
+                model TEXT,                      -- Идентификатор модели
+                count INTEGER,                   -- Количество сообщений
+                tokens INTEGER,                  -- Токены ответов API (без ответов из кэша)
+                context_tokens INTEGER,          -- Суммарный размер контекста запросов
+                latency_sum REAL,                -- Суммарное время ответа
+                latency_min REAL,                -- Минимальное время ответа
+                latency_max REAL,                -- Максимальное время ответа
+                cache_hits INTEGER,              -- Ответов из кэша
+                cache_tokens INTEGER,            -- Токены, сэкономленные кэшем
+                cache_latency_sum REAL,          -- Суммарное время ответов из кэша
+                PRIMARY KEY (period, bucket, model)
+            ) WITHOUT ROWID
+        ''')
+
+        # Один и тот же UPSERT для часовых и дневных агрегатов
+        for period, bucket in (('hour', "strftime('%Y-%m-%d %H:00', {t})"),
+                               ('day', "date({t})")):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS analytics_rollup_{period} AFTER INSERT ON analytics_messages
+                BEGIN
+                    INSERT INTO analytics_rollup VALUES (
+                        '{period}', {bucket.format(t='new.timestamp')}, new.model, 1,
+                        CASE WHEN new.cache_hit THEN 0 ELSE new.tokens_used END,
+                        coalesce(new.context_tokens, 0),
+                        new.response_time, new.response_time, new.response_time,
+                        CASE WHEN new.cache_hit THEN 1 ELSE 0 END,
+                        CASE WHEN new.cache_hit THEN new.tokens_used ELSE 0 END,
+                        CASE WHEN new.cache_hit THEN new.response_time ELSE 0 END
+                    )
+                    ON CONFLICT (period, bucket, model) DO UPDATE SET
+                        count = count + 1,
+                        tokens = tokens + excluded.tokens,
+                        context_tokens = context_tokens + excluded.context_tokens,
+                        latency_sum = latency_sum + excluded.latency_sum,
+                        latency_min = min(latency_min, excluded.latency_min),
+                        latency_max = max(latency_max, excluded.latency_max),
+                        cache_hits = cache_hits + excluded.cache_hits,
+                        cache_tokens = cache_tokens + excluded.cache_tokens,
+                        cache_latency_sum = cache_latency_sum + excluded.cache_latency_sum;
+                END
+            ''')
 
-    def save_message(self, model, user_message, ai_response, tokens_used):
+            # Агрегация записей, сохраненных до появления триггеров
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO analytics_rollup
+                SELECT '{period}', {bucket.format(t='timestamp')}, model, count(*),
+                       sum(CASE WHEN cache_hit THEN 0 ELSE tokens_used END),
+                       sum(coalesce(context_tokens, 0)),
+                       sum(response_time), min(response_time), max(response_time),
+                       sum(CASE WHEN cache_hit THEN 1 ELSE 0 END),
+                       sum(CASE WHEN cache_hit THEN tokens_used ELSE 0 END),
+                       sum(CASE WHEN cache_hit THEN response_time ELSE 0 END)
+                FROM analytics_messages
+                GROUP BY 2, model
+            ''')
+
+    def _migrate_v6_latency_histograms(self, cursor):
+        """
+        Миграция 6: гистограммы задержек по моделям.
+
+        Хранит сериализованные LatencyHistogram (время ответа, время
+        до первого токена, скорость генерации), которые объединяются
+        между сессиями для расчета перцентилей.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS latency_histograms (
+                model TEXT,       -- Идентификатор модели
+                metric TEXT,      -- Метрика: response_time, ttft, tokens_per_sec
+                data TEXT,        -- Гистограмма в формате JSON
+                PRIMARY KEY (model, metric)
+            ) WITHOUT ROWID
+        ''')
+
+    def _migrate_v7_trace_spans(self, cursor):
+        """
+        Миграция 7: спаны трассировки этапов обработки запросов.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS trace_spans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                trace_id TEXT,          -- Идентификатор трассы (один запрос пользователя)
+                name TEXT,              -- Название этапа
+                start_us INTEGER,       -- Время начала, микросекунды epoch
+                duration_us INTEGER,    -- Длительность в микросекундах
+                thread_id INTEGER,      -- Идентификатор потока
+                args TEXT               -- Атрибуты спана в формате JSON
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_trace_spans_trace ON trace_spans(trace_id)')
+
+    def _migrate_v8_cancelled_requests(self, cursor):
+        """
+        Миграция 8: учет отмененных запросов в аналитике.
+
+        Отмененный пользователем запрос сохраняется с частичным временем
+        ответа и токенами и флагом cancelled. Агрегаты дополнительно
+        считают отмененные запросы и их время, чтобы их можно было
+        исключить из средних по завершенным ответам. Триггеры агрегатов
+        пересоздаются с новыми колонками.
+        """
+        self._ensure_column(cursor, 'analytics_messages', 'cancelled', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'analytics_rollup', 'cancelled', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'analytics_rollup', 'cancelled_latency_sum', 'REAL DEFAULT 0')
+
+        for period, bucket in (('hour', "strftime('%Y-%m-%d %H:00', new.timestamp)"),
+                               ('day', "date(new.timestamp)")):
+            cursor.execute(f'DROP TRIGGER IF EXISTS analytics_rollup_{period}')
+            cursor.execute(f'''
+                CREATE TRIGGER analytics_rollup_{period} AFTER INSERT ON analytics_messages
+                BEGIN
+                    INSERT INTO analytics_rollup (
+                        period, bucket, model, count, tokens, context_tokens,
+                        latency_sum, latency_min, latency_max,
+                        cache_hits, cache_tokens, cache_latency_sum,
+                        cancelled, cancelled_latency_sum
+                    ) VALUES (
+                        '{period}', {bucket}, new.model, 1,
+                        CASE WHEN new.cache_hit THEN 0 ELSE new.tokens_used END,
+                        coalesce(new.context_tokens, 0),
+                        new.response_time, new.response_time, new.response_time,
+                        CASE WHEN new.cache_hit THEN 1 ELSE 0 END,
+                        CASE WHEN new.cache_hit THEN new.tokens_used ELSE 0 END,
+                        CASE WHEN new.cache_hit THEN new.response_time ELSE 0 END,
+                        CASE WHEN new.cancelled THEN 1 ELSE 0 END,
+                        CASE WHEN new.cancelled THEN new.response_time ELSE 0 END
+                    )
+                    ON CONFLICT (period, bucket, model) DO UPDATE SET
+                        count = count + 1,
+                        tokens = tokens + excluded.tokens,
+                        context_tokens = context_tokens + excluded.context_tokens,
+                        latency_sum = latency_sum + excluded.latency_sum,
+                        latency_min = min(latency_min, excluded.latency_min),
+                        latency_max = max(latency_max, excluded.latency_max),
+                        cache_hits = cache_hits + excluded.cache_hits,
+                        cache_tokens = cache_tokens + excluded.cache_tokens,
+                        cache_latency_sum = cache_latency_sum + excluded.cache_latency_sum,
+                        cancelled = cancelled + excluded.cancelled,
+                        cancelled_latency_sum = cancelled_latency_sum + excluded.cancelled_latency_sum;
+                END
+            ''')
+
+    def _migrate_v9_message_row_keys(self, cursor):
+        """
+        Миграция 9: ключ записи сообщения, известный до ее сохранения.
+
+        save_message генерирует ключ при постановке вставки в очередь,
+        поэтому интерфейс находит ID своей записи по ключу, а не по тексту
+        сообщения. У записей, сохраненных до миграции, ключ пустой.
+        """
+        self._ensure_column(cursor, 'messages', 'row_key', 'TEXT')
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_row_key ON messages(row_key)')
+
+    @staticmethod
+    def _ensure_column(cursor, table, column, definition):
+        """
+        Добавление колонки в существующую таблицу, если ее еще нет.
+
+        Args:
+            cursor (sqlite3.Cursor): Курсор открытого соединения
+            table (str): Имя таблицы
+            column (str): Имя колонки
+            definition (str): SQL-описание типа колонки
+        """
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    @tracer.traced("cache.save_message")
+    def save_message(self, model, user_message, ai_response, tokens_used, session_id=None):
         """
         Сохранение нового сообщения в базу данных.
         
@@ -102,16 +649,64 @@ class ChatCache:
             user_message (str): Текст сообщения пользователя
             ai_response (str): Ответ AI модели
             tokens_used (int): Количество использованных токенов
+            session_id (str): Идентификатор сессии диалога
+
+        Returns:
+            str: Ключ записи для поиска ее ID (get_message_ids)
         """
-        conn = self.get_connection()  # Получение соединения для текущего потока
+        row_key = uuid.uuid4().hex
+        # Вставка новой записи в таблицу messages (через очередь отложенной записи)
+        self._execute_write('''
+            INSERT INTO messages (model, user_message, ai_response, timestamp, tokens_used, session_id,
+                                  row_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (model, user_message, ai_response, datetime.now(), tokens_used, session_id, row_key),
+            ('messages', ('session', session_id)))
+        return row_key
+
+    @tracer.traced("cache.get_session_messages")
+    def get_session_messages(self, session_id, limit=100):
+        """
+        Получение последних реплик сессии диалога.
+
+        Args:
+            session_id (str): Идентификатор сессии диалога
+            limit (int): Максимальное количество возвращаемых пар реплик
+
+        Returns:
+            list: Кортежи (user_message, ai_response), новые сначала
+        """
+        self.flush(key=('session', session_id))  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
         cursor = conn.cursor()
-        
-        # Вставка новой записи в таблицу messages
+
         cursor.execute('''
-            INSERT INTO messages (model, user_message, ai_response, timestamp, tokens_used)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (model, user_message, ai_response, datetime.now(), tokens_used))
-        conn.commit()  # Сохранение изменений
+            SELECT user_message, ai_response FROM messages
+            WHERE session_id = ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (session_id, limit))
+        return cursor.fetchall()
+
+    def get_last_session_id(self):
+        """
+        Получение идентификатора последней сессии диалога.
+
+        Returns:
+            str | None: ID сессии последнего сохраненного сообщения или None
+        """
+        self.flush(key='messages')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT session_id FROM messages
+            WHERE session_id IS NOT NULL
+            ORDER BY id DESC
+            LIMIT 1
+        ''')
+        row = cursor.fetchone()
+        return row[0] if row else None
 
     def get_chat_history(self, limit=50):
         """
@@ -124,18 +719,217 @@ class ChatCache:
             list: Список кортежей с данными сообщений, отсортированных
                  по времени в обратном порядке (новые сначала)
         """
+        self.flush(key='messages')  # Ожидание только своих незаписанных вставок
         conn = self.get_connection()  # Получение соединения для текущего потока
         cursor = conn.cursor()
         
         # Получение последних сообщений с ограничением по количеству
         cursor.execute('''
-            SELECT * FROM messages 
+            SELECT id, model, user_message, ai_response, timestamp, tokens_used
+            FROM messages 
             ORDER BY timestamp DESC 
             LIMIT ?
         ''', (limit,))
         return cursor.fetchall()  # Возврат всех найденных записей
 
-    def save_analytics(self, timestamp, model, message_length, response_time, tokens_used):
+    @tracer.traced("cache.get_history_page")
+    def get_history_page(self, before_id=None, limit=20):
+        """
+        Получение страницы истории чата по ключу (keyset-пагинация).
+
+        В отличие от OFFSET, выборка по условию id < before_id использует
+        первичный ключ и не перебирает пропущенные строки, поэтому стоимость
+        страницы не зависит от глубины прокрутки.
+
+        Args:
+            before_id (int): ID самого старого уже загруженного сообщения
+                             (None - начать с последних сообщений)
+            limit (int): Размер страницы
+
+        Returns:
+            list: Кортежи (id, model, user_message, ai_response, timestamp, tokens_used),
+                  новые сначала
+        """
+        self.flush(key='messages')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        if before_id is None:
+            cursor.execute('''
+                SELECT id, model, user_message, ai_response, timestamp, tokens_used
+                FROM messages
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (limit,))
+        else:
+            cursor.execute('''
+                SELECT id, model, user_message, ai_response, timestamp, tokens_used
+                FROM messages
+                WHERE id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (before_id, limit))
+        return cursor.fetchall()
+
+    @tracer.traced("cache.get_history_after")
+    def get_history_after(self, after_id, limit=20):
+        """
+        Получение страницы более новых сообщений после указанного ID.
+
+        Args:
+            after_id (int): ID самого нового уже загруженного сообщения
+            limit (int): Размер страницы
+
+        Returns:
+            list: Кортежи (id, model, user_message, ai_response, timestamp, tokens_used),
+                  старые сначала
+        """
+        self.flush(key='messages')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, model, user_message, ai_response, timestamp, tokens_used
+            FROM messages
+            WHERE id > ?
+            ORDER BY id ASC
+            LIMIT ?
+        ''', (after_id, limit))
+        return cursor.fetchall()
+
+    @tracer.traced("cache.get_message_ids")
+    def get_message_ids(self, row_keys):
+        """
+        Получение ID записей по ключам, выданным save_message.
+
+        Отложенная запись не возвращает ID вставленных строк, поэтому
+        сообщения, отправленные в текущей сессии, находятся по ключу записи.
+        Чтение не ожидает очередь записи: записи, которые еще не сохранены,
+        в результат не попадают и запрашиваются повторно позже.
+
+        Args:
+            row_keys (list): Ключи записей
+
+        Returns:
+            dict: Ключ записи -> ID для уже сохраненных записей
+        """
+        if not row_keys:
+            return {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        placeholders = ', '.join('?' * len(row_keys))
+        cursor.execute(f'''
+            SELECT row_key, id FROM messages WHERE row_key IN ({placeholders})
+        ''', list(row_keys))
+        return dict(cursor.fetchall())
+
+    @staticmethod
+    def _fts_query(query):
+        """
+        Преобразование пользовательского запроса в безопасный запрос FTS5.
+
+        Каждое слово берется в кавычки (спецсимволы FTS5 не интерпретируются),
+        последнее слово ищется по префиксу, чтобы поиск работал при наборе.
+
+        Args:
+            query (str): Текст запроса пользователя
+
+        Returns:
+            str: Выражение для MATCH или пустая строка
+        """
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if not terms:
+            return ''
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    @tracer.traced("cache.search")
+    def search(self, query, model=None, limit=20, cursor=None):
+        """
+        Полнотекстовый поиск по истории чата.
+
+        Результаты упорядочены по релевантности (BM25, меньше - лучше). Постраничная выдача
+        выполняется по ключу (rank, id) последнего результата, а фрагменты
+        с подсветкой строятся только для строк текущей страницы.
+
+        Args:
+            query (str): Текст запроса
+            model (str): Ограничить поиск сообщениями указанной модели
+            limit (int): Размер страницы результатов
+            cursor (tuple): Ключ продолжения из предыдущего вызова (next_cursor)
+
+        Returns:
+            dict: {
+                "results": [{"id", "model", "timestamp", "rank",
+                             "user_snippet", "ai_snippet"}, ...],
+                "next_cursor": tuple | None   # None, если результатов больше нет
+            }
+        """
+        match = self._fts_query(query)
+        if not match:
+            return {"results": [], "next_cursor": None}
+
+        self.flush(key='messages')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+
+        # Шаг 1: отбор страницы по индексу без построения фрагментов
+        after_score, after_id = cursor if cursor else (float('-inf'), 0)
+        if model is None:
+            db_cursor.execute('''
+                SELECT rowid, bm25(messages_fts) AS score
+                FROM messages_fts
+                WHERE messages_fts MATCH ?
+                  AND (score > ? OR (score = ? AND rowid > ?))
+                ORDER BY score, rowid
+                LIMIT ?
+            ''', (match, after_score, after_score, after_id, limit))
+        else:
+            db_cursor.execute('''
+                SELECT messages_fts.rowid, bm25(messages_fts) AS score
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND m.model = ?
+                  AND (score > ? OR (score = ? AND messages_fts.rowid > ?))
+                ORDER BY score, messages_fts.rowid
+                LIMIT ?
+            ''', (match, model, after_score, after_score, after_id, limit))
+        rows = db_cursor.fetchall()
+        if not rows:
+            return {"results": [], "next_cursor": None}
+
+        # Шаг 2: фрагменты с подсветкой и метаданные только для найденной страницы
+        placeholders = ','.join('?' * len(rows))
+        db_cursor.execute(f'''
+            SELECT messages_fts.rowid, m.model, m.timestamp,
+                   snippet(messages_fts, 0, '[', ']', '…', 12),
+                   snippet(messages_fts, 1, '[', ']', '…', 12)
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            WHERE messages_fts MATCH ? AND messages_fts.rowid IN ({placeholders})
+        ''', (match, *[row[0] for row in rows]))
+        details = {row[0]: row[1:] for row in db_cursor.fetchall()}
+
+        results = []
+        for message_id, score in rows:
+            message_model, timestamp, user_snippet, ai_snippet = details.get(
+                message_id, (None, None, '', ''))
+            results.append({
+                "id": message_id,
+                "model": message_model,
+                "timestamp": timestamp,
+                "rank": score,
+                "user_snippet": user_snippet,
+                "ai_snippet": ai_snippet
+            })
+
+        next_cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+        return {"results": results, "next_cursor": next_cursor}
+
+    @tracer.traced("cache.save_analytics")
+    def save_analytics(self, timestamp, model, message_length, response_time, tokens_used,
+                       context_tokens=0, cache_hit=False, cancelled=False):
         """
         Сохранение данных аналитики в базу данных.
         
@@ -145,34 +939,252 @@ class ChatCache:
             message_length (int): Длина сообщения
             response_time (float): Время ответа
             tokens_used (int): Количество использованных токенов
+            context_tokens (int): Оценка размера контекста запроса в токенах
+            cache_hit (bool): Ответ получен из кэша ответов без обращения к API
+            cancelled (bool): Запрос отменен пользователем (время и токены частичные)
         """
+        self._execute_write('''
+            INSERT INTO analytics_messages 
+            (timestamp, model, message_length, response_time, tokens_used, context_tokens, cache_hit,
+             cancelled)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (timestamp, model, message_length, response_time, tokens_used, context_tokens,
+              int(cache_hit), int(cancelled)), ('analytics_messages',))
+
+    def get_analytics_history(self, model=None, since=None, limit=None):
+        """
+        Получение записей аналитики по отдельным сообщениям.
+
+        Используется только для детализации и экспорта: общая статистика
+        читается из агрегатов (get_analytics_totals).
+
+        Args:
+            model (str): Только записи указанной модели
+            since (datetime): Только записи начиная с указанного времени
+            limit (int): Максимальное количество последних записей
+
+        Returns:
+            list: Список записей аналитики в хронологическом порядке
+        """
+        self.flush(key='analytics_messages')  # Ожидание только своих незаписанных вставок
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO analytics_messages 
-            (timestamp, model, message_length, response_time, tokens_used)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (timestamp, model, message_length, response_time, tokens_used))
-        conn.commit()
 
-    def get_analytics_history(self):
+        conditions, params = [], []
+        if model is not None:
+            conditions.append('model = ?')
+            params.append(model)
+        if since is not None:
+            conditions.append('timestamp >= ?')
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        # Последние limit записей выбираются по индексу, затем разворачиваются
+        cursor.execute(f'''
+            SELECT timestamp, model, message_length, response_time, tokens_used, context_tokens,
+                   cache_hit, cancelled
+            FROM analytics_messages
+            {where}
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (*params, limit if limit is not None else -1))
+        return cursor.fetchall()[::-1]
+
+    def get_analytics_totals(self):
         """
-        Получение всей истории аналитики.
-        
+        Получение итоговой статистики по моделям из дневных агрегатов.
+
         Returns:
-            list: Список записей аналитики
+            list: Строки (model, count, tokens, context_tokens, latency_sum,
+                  latency_min, latency_max, cache_hits, cache_tokens, cache_latency_sum,
+                  cancelled, cancelled_latency_sum)
         """
+        self.flush(key='analytics_messages')  # Ожидание только своих незаписанных вставок
         conn = self.get_connection()
         cursor = conn.cursor()
-        
+
         cursor.execute('''
-            SELECT timestamp, model, message_length, response_time, tokens_used
-            FROM analytics_messages
-            ORDER BY timestamp ASC
+            SELECT model, sum(count), sum(tokens), sum(context_tokens), sum(latency_sum),
+                   min(latency_min), max(latency_max), sum(cache_hits), sum(cache_tokens),
+                   sum(cache_latency_sum), sum(cancelled), sum(cancelled_latency_sum)
+            FROM analytics_rollup
+            WHERE period = 'day'
+            GROUP BY model
         ''')
         return cursor.fetchall()
 
+    def get_analytics_rollups(self, period='day', model=None, since=None):
+        """
+        Получение агрегатов аналитики по периодам.
+
+        Args:
+            period (str): Гранулярность: 'hour' или 'day'
+            model (str): Только агрегаты указанной модели
+            since (str): Начало первого периода ('YYYY-MM-DD' или 'YYYY-MM-DD HH:00')
+
+        Returns:
+            list: Строки (bucket, model, count, tokens, context_tokens, latency_sum,
+                  latency_min, latency_max, cache_hits, cache_tokens, cache_latency_sum)
+                  в хронологическом порядке
+        """
+        self.flush(key='analytics_messages')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        conditions, params = ['period = ?'], [period]
+        if model is not None:
+            conditions.append('model = ?')
+            params.append(model)
+        if since is not None:
+            conditions.append('bucket >= ?')
+            params.append(since)
+
+        cursor.execute(f'''
+            SELECT bucket, model, count, tokens, context_tokens, latency_sum, latency_min,
+                   latency_max, cache_hits, cache_tokens, cache_latency_sum
+            FROM analytics_rollup
+            WHERE {' AND '.join(conditions)}
+            ORDER BY bucket, model
+        ''', params)
+        return cursor.fetchall()
+
+    def get_latency_histograms(self):
+        """
+        Получение сохраненных гистограмм задержек.
+
+        Returns:
+            list: Строки (model, metric, data_json)
+        """
+        self.flush(key='latency_histograms')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT model, metric, data FROM latency_histograms')
+        return cursor.fetchall()
+
+    def save_latency_histogram(self, model, metric, data):
+        """
+        Сохранение гистограммы задержек модели.
+
+        Args:
+            model (str): Идентификатор модели
+            metric (str): Название метрики
+            data (str): Гистограмма в формате JSON
+        """
+        self._execute_write('''
+            INSERT OR REPLACE INTO latency_histograms (model, metric, data) VALUES (?, ?, ?)
+        ''', (model, metric, data), ('latency_histograms',))
+
+    def save_span(self, record):
+        """
+        Сохранение завершенного спана трассировки (sink для Tracer).
+
+        Args:
+            record (dict): Спан {trace_id, name, start_us, duration_us, thread_id, args}
+        """
+        self._execute_write('''
+            INSERT INTO trace_spans (trace_id, name, start_us, duration_us, thread_id, args)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (record['trace_id'], record['name'], record['start_us'], record['duration_us'],
+              record['thread_id'], json.dumps(record['args'], ensure_ascii=False, default=str)),
+            ('trace_spans',))
+
+    def get_trace_spans(self, trace_id=None, limit=10000):
+        """
+        Получение сохраненных спанов трассировки.
+
+        Args:
+            trace_id (str): Только спаны указанной трассы
+            limit (int): Максимальное количество последних спанов
+
+        Returns:
+            list: Спаны в формате Tracer в хронологическом порядке
+        """
+        self.flush(key='trace_spans')  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        where, params = ('WHERE trace_id = ?', [trace_id]) if trace_id else ('', [])
+        cursor.execute(f'''
+            SELECT trace_id, name, start_us, duration_us, thread_id, args
+            FROM trace_spans
+            {where}
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (*params, limit))
+        return [
+            {'trace_id': row[0], 'name': row[1], 'start_us': row[2], 'duration_us': row[3],
+             'thread_id': row[4], 'args': json.loads(row[5]) if row[5] else {}}
+            for row in reversed(cursor.fetchall())
+        ]
+
+    def get_cached_response(self, key):
+        """
+        Получение ответа из кэша ответов API.
+
+        Args:
+            key (str): Ключ запроса
+
+        Returns:
+            tuple | None: (response_json, tokens_used, created_at) или None при промахе
+        """
+        self.flush(key=('response', key))  # Ожидание только своих незаписанных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT response, tokens_used, created_at FROM response_cache WHERE key = ?
+        ''', (key,))
+        row = cursor.fetchone()
+        if row:
+            # Обновление времени обращения для вытеснения по давности использования
+            self._execute_write('''
+                UPDATE response_cache SET last_access = ? WHERE key = ?
+            ''', (time.time(), key))
+        return row
+
+    def save_cached_response(self, key, model, response_json, tokens_used):
+        """
+        Сохранение ответа API в кэш ответов.
+
+        Args:
+            key (str): Ключ запроса
+            model (str): Идентификатор модели
+            response_json (str): Ответ API в формате JSON
+            tokens_used (int): Токены, потраченные на запрос
+        """
+        now = time.time()
+        self._execute_write('''
+            INSERT OR REPLACE INTO response_cache
+            (key, model, response, tokens_used, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (key, model, response_json, tokens_used, len(response_json.encode('utf-8')), now, now),
+            (('response', key),))
+
+    def evict_cached_responses(self, max_entries, max_age):
+        """
+        Вытеснение устаревших и редко используемых ответов из кэша.
+
+        Удаление ставится в очередь отложенной записи после ранее
+        сохраненных ответов, поэтому вызов не ожидает записи на диск.
+
+        Args:
+            max_entries (int): Максимальное количество хранимых ответов
+            max_age (float): Максимальный возраст ответа в секундах
+        """
+        # Удаление ответов старше max_age
+        self._execute_write('''
+            DELETE FROM response_cache WHERE created_at < ?
+        ''', (time.time() - max_age,))
+
+        # Удаление самых давно использованных ответов сверх лимита
+        self._execute_write('''
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache
+                ORDER BY last_access DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
+
     def __del__(self):
         """
         Деструктор класса.
@@ -191,11 +1203,27 @@ class ChatCache:
         Удаляет все записи из таблицы messages,
         эффективно очищая всю историю чата.
         """
+        self.flush()  # Ожидание записи отложенных вставок
         conn = self.get_connection()  # Получение соединения
         cursor = conn.cursor()
         cursor.execute('DELETE FROM messages')  # Удаление всех записей
         conn.commit()  # Сохранение изменений
 
+    def clear_analytics(self):
+        """
+        Очистка сохраненной аналитики.
+
+        Удаляет записи по сообщениям, агрегаты по периодам и гистограммы
+        задержек, чтобы после перезапуска статистика не возвращалась.
+        """
+        self.flush()  # Ожидание записи отложенных вставок
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM analytics_messages')
+        cursor.execute('DELETE FROM analytics_rollup')
+        cursor.execute('DELETE FROM latency_histograms')
+        conn.commit()
+
     def get_formatted_history(self):
         """
         Получение отформатированной истории диалога.
@@ -211,6 +1239,7 @@ class ChatCache:
                     "tokens_used": int      # Использовано токенов
                 }
         """
+        self.flush()  # Ожидание записи отложенных вставок
         conn = self.get_connection()  # Получение соединения
         cursor = conn.cursor()
         
@@ -0,0 +1,108 @@
+# Импорт необходимых библиотек
+import os    # Библиотека для работы с переменными окружения
+import uuid  # Библиотека для генерации идентификаторов сессий
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
+
+# Контекстное окно по умолчанию для моделей без данных в каталоге
+DEFAULT_CONTEXT_LIMIT = int(os.getenv("DEFAULT_CONTEXT_LIMIT", "8192"))
+
+# Резерв токенов под ответ модели
+MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
+
+# Служебные токены, которые API добавляет к каждому сообщению (роль, разделители)
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Быстрая приблизительная оценка количества токенов в тексте.
+
+    BPE-токенизаторы в среднем кодируют около 4 байт UTF-8 в один токен:
+    для латиницы это ~4 символа, для кириллицы (2 байта на символ) ~2 символа.
+    Оценка не требует загрузки словаря и работает за один проход по строке.
+
+    Args:
+        text (str): Текст для оценки
+
+    Returns:
+        int: Приблизительное количество токенов
+    """
+    if not text:
+        return 0
+    return (len(text.encode('utf-8')) + 3) // 4
+
+
+class ConversationSession:
+    """
+    Класс сессии диалога с моделью.
+
+    Собирает предыдущие реплики сессии из ChatCache в массив messages
+    для API, ограничивая их бюджетом токенов контекстного окна модели:
+    системный промпт и новое сообщение включаются всегда, а прошлые реплики
+    добавляются от самых свежих к старым, пока хватает бюджета.
+    """
+
+    def __init__(self, cache, session_id: str = None, system_prompt: str = None,
+                 max_history: int = 100):
+        """
+        Инициализация сессии диалога.
+
+        Args:
+            cache (ChatCache): Экземпляр класса для работы с базой данных
+            session_id (str): ID продолжаемой сессии (по умолчанию создается новая)
+            system_prompt (str): Системный промпт (по умолчанию SYSTEM_PROMPT из .env)
+            max_history (int): Максимальное количество пар реплик, читаемых из базы
+        """
+        self.cache = cache
+        self.session_id = session_id or uuid.uuid4().hex
+        self.system_prompt = system_prompt if system_prompt is not None else os.getenv("SYSTEM_PROMPT", "")
+        self.max_history = max_history
+
+    def reset(self):
+        """
+        Начало новой сессии диалога без прошлого контекста.
+        """
+        self.session_id = uuid.uuid4().hex
+
+    @tracer.traced("conversation.build_history")
+    def build_history(self, user_message: str, context_limit: int = None,
+                      reserve_tokens: int = MAX_TOKENS):
+        """
+        Сборка предыдущих сообщений для запроса с учетом бюджета токенов.
+
+        Args:
+            user_message (str): Новое сообщение пользователя
+            context_limit (int): Размер контекстного окна модели в токенах
+            reserve_tokens (int): Токены, зарезервированные под ответ модели
+
+        Returns:
+            tuple: (history, context_tokens), где history - список сообщений
+                   {"role", "content"} перед новым сообщением в хронологическом
+                   порядке, а context_tokens - оценка размера всего запроса
+        """
+        budget = (context_limit or DEFAULT_CONTEXT_LIMIT) - reserve_tokens
+
+        # Обязательная часть запроса: системный промпт и новое сообщение
+        system = []
+        used = estimate_tokens(user_message) + MESSAGE_OVERHEAD
+        if self.system_prompt:
+            system = [{"role": "system", "content": self.system_prompt}]
+            used += estimate_tokens(self.system_prompt) + MESSAGE_OVERHEAD
+
+        # Добавление прошлых реплик от новых к старым, пока есть бюджет
+        turns = []
+        for user_text, ai_text in self.cache.get_session_messages(self.session_id, self.max_history):
+            cost = (estimate_tokens(user_text) + estimate_tokens(ai_text)
+                    + 2 * MESSAGE_OVERHEAD)
+            if used + cost > budget:
+                break
+            used += cost
+            turns.append((user_text, ai_text))
+
+        # Восстановление хронологического порядка
+        history = list(system)
+        for user_text, ai_text in reversed(turns):
+            history.append({"role": "user", "content": user_text})
+            history.append({"role": "assistant", "content": ai_text})
+
+        return history, used
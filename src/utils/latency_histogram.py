@@ -0,0 +1,143 @@
+# Импорт необходимых библиотек
+import json  # Библиотека для сериализации гистограммы
+import math  # Логарифмы для вычисления номера корзины
+
+
+class LatencyHistogram:
+    """
+    Гистограмма с логарифмическими корзинами для оценки перцентилей.
+
+    Значение v попадает в корзину ceil(log_gamma(v)), где
+    gamma = (1 + accuracy) / (1 - accuracy), поэтому оценка любого
+    перцентиля отличается от точного значения не более чем на accuracy
+    относительно. Память зависит только от диапазона значений (сотни
+    корзин для диапазона от миллисекунд до минут), а не от их количества.
+    Гистограммы с одинаковой точностью складываются (merge) без потерь,
+    что позволяет объединять данные разных сессий.
+    """
+
+    # Значения не больше MIN_VALUE учитываются в отдельном счетчике нулей
+    MIN_VALUE = 1e-6
+
+    def __init__(self, accuracy: float = 0.01):
+        """
+        Инициализация пустой гистограммы.
+
+        Args:
+            accuracy (float): Относительная точность оценки перцентилей
+        """
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}      # Номер корзины -> количество значений
+        self.zero_count = 0  # Количество значений около нуля
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value: float):
+        """
+        Добавление значения.
+
+        Args:
+            value (float): Измеренное значение (секунды, токены/с и т.п.)
+        """
+        if value is None or value < 0 or math.isnan(value):
+            return
+        if value <= self.MIN_VALUE:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram'):
+        """
+        Добавление значений другой гистограммы.
+
+        Args:
+            other (LatencyHistogram): Гистограмма с той же точностью
+
+        Raises:
+            ValueError: Если точность гистограмм различается
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("Cannot merge histograms with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценка перцентиля.
+
+        Args:
+            q (float): Доля от 0 до 1 (0.5 - медиана, 0.99 - p99)
+
+        Returns:
+            float: Оценка значения или 0.0 для пустой гистограммы
+        """
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Середина корзины (gamma^(i-1), gamma^i] с относительной ошибкой accuracy
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        """Среднее значение."""
+        return self.total / self.count if self.count else 0.0
+
+    def to_json(self) -> str:
+        """
+        Сериализация гистограммы для сохранения в базе.
+
+        Returns:
+            str: JSON-представление
+        """
+        return json.dumps({
+            "accuracy": self.accuracy,
+            "bins": self.bins,
+            "zero": self.zero_count,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data: str) -> 'LatencyHistogram':
+        """
+        Восстановление гистограммы из JSON.
+
+        Args:
+            data (str): Результат to_json
+
+        Returns:
+            LatencyHistogram: Восстановленная гистограмма
+        """
+        raw = json.loads(data)
+        histogram = cls(raw["accuracy"])
+        histogram.bins = {int(index): count for index, count in raw["bins"].items()}
+        histogram.zero_count = raw["zero"]
+        histogram.count = raw["count"]
+        histogram.total = raw["total"]
+        histogram.min = raw["min"] if raw["min"] is not None else math.inf
+        histogram.max = raw["max"]
+        return histogram
@@ -1,64 +1,246 @@
 # Импорт необходимых библиотек
+import atexit      # Остановка фонового потока логирования при завершении процесса
+import contextvars  # Идентификатор текущего запроса для записей лога
+import copy        # Копирование записи перед передачей в очередь
+import itertools   # Счетчики событий для выборочного логирования
+import json        # Вывод записей в формате JSON lines
 import logging     # Стандартная библиотека Python для логирования
+import logging.handlers  # Обработчики очереди и ротации файлов
 import os         # Библиотека для работы с операционной системой и файлами
-from datetime import datetime  # Библиотека для работы с датой и временем
+import queue      # Очередь записей лога между потоками
+import threading  # Однократная настройка логирования из разных потоков
+import uuid       # Генерация идентификаторов запросов
+
+# Имя общего логгера приложения
+LOGGER_NAME = 'ChatApp'
+
+# Фоновый поток записи логов (создается один раз на процесс)
+_listener = None
+_setup_lock = threading.Lock()
+
+# Идентификатор запроса пользователя, добавляемый ко всем записям лога
+_request_id = contextvars.ContextVar('request_id', default=None)
+
+# Частые события, которые записываются выборочно (LOG_SAMPLED_EVENTS, LOG_SAMPLE_RATE):
+# сохраняется каждое N-е событие, где N = 1 / LOG_SAMPLE_RATE
+_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+_SAMPLED_EVENTS = {
+    event.strip() for event in
+    os.getenv("LOG_SAMPLED_EVENTS", "api.request,performance.metrics").split(",") if event.strip()
+}
+_SAMPLE_EVERY = max(1, round(1 / _SAMPLE_RATE)) if _SAMPLE_RATE > 0 else 0
+_sample_counters = {}
+
+
+def new_request_id() -> str:
+    """
+    Создание идентификатора запроса для текущего контекста.
+
+    Все записи лога, сделанные далее в этом потоке или задаче asyncio,
+    получают поле request_id.
+
+    Returns:
+        str: Новый идентификатор запроса
+    """
+    request_id = uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+class _RequestIdFilter(logging.Filter):
+    """
+    Добавление request_id к записи в потоке, где она создана.
+    """
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик очереди, сохраняющий структуру записи.
+
+    Стандартный QueueHandler склеивает сообщение и стек исключения
+    в одну строку; здесь подставляются только аргументы сообщения,
+    а стек передается отдельно в exc_text.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # Объект traceback не передается между потоками
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Текстовый формат: строка сообщения и структурированные поля key=value.
+    """
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Формат JSON lines: одна запись - один JSON-объект в строке.
+
+    Поля: ts, level, event, message, request_id и структурированные поля
+    события (model, latency_ms, tokens и т.п.).
+    """
+
+    def format(self, record):
+        data = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _create_file_handler(log_file: str) -> logging.Handler:
+    """
+    Создание файлового обработчика с ротацией.
+
+    По умолчанию файл ротируется по размеру (LOG_MAX_BYTES, LOG_BACKUP_COUNT).
+    Если задан LOG_ROTATE_WHEN (например, "midnight" или "H"), файл
+    ротируется по времени.
+
+    Args:
+        log_file (str): Путь к файлу лога
+
+    Returns:
+        logging.Handler: Обработчик записи в файл
+    """
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    when = os.getenv("LOG_ROTATE_WHEN")
+    if when:
+        return logging.handlers.TimedRotatingFileHandler(
+            log_file, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        log_file,
+        maxBytes=int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024))),
+        backupCount=backup_count,
+        encoding='utf-8'
+    )
+
+
+def setup_logging(logs_dir: str = "logs") -> logging.Logger:
+    """
+    Однократная настройка логирования для всего процесса.
+
+    Логгер приложения получает единственный QueueHandler: вызывающий поток
+    только помещает запись в очередь, а запись в файл и консоль выполняет
+    фоновый QueueListener. Повторные вызовы возвращают уже настроенный логгер.
+
+    Args:
+        logs_dir (str): Директория для файлов логов
+
+    Returns:
+        logging.Logger: Логгер приложения
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is not None:
+            return logger
+
+        # Создание директории для хранения файлов логов
+        os.makedirs(logs_dir, exist_ok=True)
+
+        # Настройка формата сообщений лога (LOG_FORMAT=text или json)
+        # Текст: YYYY-MM-DD HH:MM:SS - LEVEL - Message key=value ...
+        if os.getenv("LOG_FORMAT", "text").lower() == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = TextFormatter(
+                '%(asctime)s - %(levelname)s - %(message)s',  # Шаблон сообщения
+                datefmt='%Y-%m-%d %H:%M:%S'                   # Формат даты и времени
+            )
+
+        # Обработчики для файла с ротацией и для консоли
+        file_handler = _create_file_handler(os.path.join(logs_dir, "chat_app.log"))
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        # Фоновый поток, выполняющий запись из очереди
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+        # Уровень логирования из LOG_LEVEL (DEBUG, INFO, WARNING, ERROR);
+        # опечатка в .env не должна мешать запуску приложения
+        level = os.getenv("LOG_LEVEL", "INFO").upper()
+        invalid_level = not isinstance(logging.getLevelName(level), int)
+        logger.setLevel(logging.INFO if invalid_level else level)
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(_RequestIdFilter())  # request_id берется в потоке вызова
+        logger.handlers[:] = [queue_handler]
+        logger.propagate = False  # Без повторной записи корневым логгером
+        if invalid_level:
+            logger.warning("Unknown LOG_LEVEL %r, using INFO", level)
+    return logger
+
+
+def shutdown_logging():
+    """
+    Запись оставшихся в очереди сообщений и остановка фонового потока.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
 
 class AppLogger:
     """
     Класс для логирования работы приложения.
     
     Обеспечивает:
-    - Сохранение логов в файлы с датой в имени
+    - Сохранение логов в файл с ротацией по размеру или времени
     - Вывод логов в консоль
     - Различные уровни логирования (debug, info, warning, error)
     - Форматирование сообщений с временными метками
+    - Структурированные события (event) в текстовом формате или JSON lines
+
+    Сообщения можно передавать с аргументами в стиле logging ("%s"):
+    строка форматируется только если уровень включен. Все экземпляры
+    используют один логгер и одну очередь, поэтому каждая строка
+    записывается ровно один раз, а файловый ввод-вывод выполняется
+    вне потока интерфейса.
     """
     
     def __init__(self):
         """
         Инициализация системы логирования.
         
-        Настраивает:
-        - Директорию для хранения логов
-        - Форматирование сообщений
-        - Обработчики для файла и консоли
-        - Уровни логирования
+        При первом создании в процессе настраивает очередь, обработчики
+        файла и консоли и уровень логирования; последующие экземпляры
+        используют готовую настройку.
         """
-        # Создание директории для хранения файлов логов
         self.logs_dir = "logs"
-        if not os.path.exists(self.logs_dir):
-            os.makedirs(self.logs_dir)
-            
-        # Формирование имени файла лога с текущей датой
-        # Формат: chat_app_YYYY-MM-DD.log
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        log_file = os.path.join(self.logs_dir, f"chat_app_{current_date}.log")
-        
-        # Настройка формата сообщений лога
-        # Формат: YYYY-MM-DD HH:MM:SS - LEVEL - Message
-        formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s',  # Шаблон сообщения
-            datefmt='%Y-%m-%d %H:%M:%S'                   # Формат даты и времени
-        )
-        
-        # Создание и настройка обработчика для записи в файл
-        file_handler = logging.FileHandler(
-            log_file,           # Путь к файлу лога
-            encoding='utf-8'    # Кодировка для поддержки Unicode
-        )
-        file_handler.setFormatter(formatter)  # Установка форматирования
-        
-        # Создание и настройка обработчика для вывода в консоль
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)  # Установка того же форматирования
-        
-        # Настройка основного логгера приложения
-        self.logger = logging.getLogger('ChatApp')  # Создание логгера с именем
-        self.logger.setLevel(logging.DEBUG)         # Установка уровня логирования
-        self.logger.addHandler(file_handler)        # Добавление файлового обработчика
-        self.logger.addHandler(console_handler)     # Добавление консольного обработчика
+        self.logger = setup_logging(self.logs_dir)
     
-    def info(self, message: str):
+    def info(self, message: str, *args, **fields):
         """
         Логирование информационного сообщения.
         
@@ -68,11 +250,13 @@ class AppLogger:
         - Информация о состоянии
         
         Args:
-            message (str): Текст информационного сообщения
+            message (str): Текст информационного сообщения (может содержать %s)
+            *args: Аргументы, подставляемые в сообщение только при записи
+            **fields: Структурированные поля записи
         """
-        self.logger.info(message)
+        self.logger.info(message, *args, extra={'fields': fields})
     
-    def error(self, message: str, exc_info=None):
+    def error(self, message: str, *args, exc_info=None, **fields):
         """
         Логирование ошибки.
         
@@ -82,13 +266,15 @@ class AppLogger:
         - Критические ошибки
         
         Args:
-            message (str): Текст сообщения об ошибке
+            message (str): Текст сообщения об ошибке (может содержать %s)
+            *args: Аргументы, подставляемые в сообщение только при записи
             exc_info: Информация об исключении (по умолчанию None)
                      Если передано True, автоматически добавляет стек вызовов
+            **fields: Структурированные поля записи
         """
-        self.logger.error(message, exc_info=exc_info)
+        self.logger.error(message, *args, exc_info=exc_info, extra={'fields': fields})
     
-    def debug(self, message: str):
+    def debug(self, message: str, *args, **fields):
         """
         Логирование отладочной информации.
         
@@ -98,11 +284,14 @@ class AppLogger:
         - Детали выполнения
         
         Args:
-            message (str): Текст отладочного сообщения
+            message (str): Текст отладочного сообщения (может содержать %s)
+            *args: Аргументы, подставляемые в сообщение только при записи
+            **fields: Структурированные поля записи
         """
-        self.logger.debug(message)
+        if self.logger.isEnabledFor(logging.DEBUG):  # Отладка обычно выключена: выход без затрат
+            self.logger.debug(message, *args, extra={'fields': fields})
     
-    def warning(self, message: str):
+    def warning(self, message: str, *args, **fields):
         """
         Логирование предупреждения.
         
@@ -112,6 +301,46 @@ class AppLogger:
         - Предупреждения о состоянии
         
         Args:
-            message (str): Текст предупреждения
+            message (str): Текст предупреждения (может содержать %s)
+            *args: Аргументы, подставляемые в сообщение только при записи
+            **fields: Структурированные поля записи
+        """
+        self.logger.warning(message, *args, extra={'fields': fields})
+
+    def is_enabled(self, level: int) -> bool:
+        """
+        Проверка, будет ли записано сообщение указанного уровня.
+
+        Args:
+            level (int): Уровень logging (logging.DEBUG и т.п.)
+
+        Returns:
+            bool: True, если уровень включен
+        """
+        return self.logger.isEnabledFor(level)
+
+    def event(self, event: str, message: str = None, level: int = logging.INFO, **fields):
+        """
+        Логирование структурированного события.
+
+        Частые события из LOG_SAMPLED_EVENTS записываются выборочно
+        (каждое N-е), запись получает поле sample_rate для пересчета.
+        При отключенном уровне событие отбрасывается до какого-либо
+        форматирования.
+
+        Args:
+            event (str): Имя события, например "api.request" или "chat.response"
+            message (str): Текст сообщения (по умолчанию имя события)
+            level (int): Уровень logging
+            **fields: Поля события (model, latency_ms, tokens и т.п.)
         """
-        self.logger.warning(message)
+        if not self.logger.isEnabledFor(level):
+            return
+        if event in _SAMPLED_EVENTS:
+            if not _SAMPLE_EVERY:
+                return
+            counter = _sample_counters.setdefault(event, itertools.count())
+            if next(counter) % _SAMPLE_EVERY:
+                return
+            fields['sample_rate'] = 1 / _SAMPLE_EVERY
+        self.logger.log(level, message or event, extra={'event': event, 'fields': fields})
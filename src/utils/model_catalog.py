@@ -0,0 +1,131 @@
+# Импорт необходимых библиотек
+import json        # Библиотека для работы с JSON форматом
+import os          # Библиотека для работы с файлами и переменными окружения
+import time        # Библиотека для работы с временными метками
+import threading   # Библиотека для обеспечения потокобезопасности
+
+
+class ModelCatalog:
+    """
+    Класс для локального хранения каталога моделей OpenRouter.
+
+    Обеспечивает:
+    - Мгновенную выдачу списка моделей при старте приложения без запроса к API
+    - Хранение валидаторов HTTP-кэша (ETag, Last-Modified) для условных запросов
+    - Определение устаревания каталога по TTL
+    """
+
+    def __init__(self, path: str = 'models_cache.json', ttl: float = None):
+        """
+        Инициализация каталога моделей.
+
+        Args:
+            path (str): Путь к JSON-файлу каталога
+            ttl (float): Время жизни каталога в секундах
+                         (по умолчанию MODELS_CACHE_TTL из .env или сутки)
+        """
+        self.path = path
+        self.ttl = ttl if ttl is not None else float(os.getenv("MODELS_CACHE_TTL", "86400"))
+
+        # Блокировка для записи из фонового потока обновления
+        self.lock = threading.Lock()
+
+        # Содержимое каталога, загруженное с диска
+        self.data = self._read()
+
+    def _read(self) -> dict:
+        """
+        Чтение каталога с диска.
+
+        Returns:
+            dict: Содержимое файла или пустой словарь, если файла нет или он поврежден
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data.get("models"), list) else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _write(self):
+        """
+        Атомарная запись каталога на диск через временный файл.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def models(self) -> list:
+        """
+        Список моделей из каталога.
+
+        Returns:
+            list: [{"id", "name", "context_length", "pricing"}, ...] или пустой список
+        """
+        return self.data.get("models", [])
+
+    @property
+    def etag(self):
+        """ETag последнего успешного ответа /models."""
+        return self.data.get("etag")
+
+    @property
+    def last_modified(self):
+        """Last-Modified последнего успешного ответа /models."""
+        return self.data.get("last_modified")
+
+    def is_stale(self) -> bool:
+        """
+        Проверка необходимости обновления каталога.
+
+        Returns:
+            bool: True, если каталог пуст или старше TTL
+        """
+        if not self.models:
+            return True
+        return time.time() - self.data.get("fetched_at", 0) > self.ttl
+
+    def save(self, models: list, etag: str = None, last_modified: str = None):
+        """
+        Сохранение нового списка моделей.
+
+        Args:
+            models (list): Список моделей
+            etag (str): Значение заголовка ETag ответа
+            last_modified (str): Значение заголовка Last-Modified ответа
+        """
+        with self.lock:
+            self.data = {
+                "models": models,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time()
+            }
+            self._write()
+
+    def touch(self):
+        """
+        Продление срока жизни каталога без изменения содержимого.
+
+        Используется, когда сервер ответил 304 Not Modified.
+        """
+        with self.lock:
+            self.data["fetched_at"] = time.time()
+            self._write()
+
+    def get_model(self, model_id: str):
+        """
+        Поиск модели в каталоге по идентификатору.
+
+        Args:
+            model_id (str): Идентификатор модели
+
+        Returns:
+            dict | None: Данные модели или None, если модель не найдена
+        """
+        for model in self.models:
+            if model["id"] == model_id:
+                return model
+        return None
@@ -1,8 +1,14 @@
 # Импорт необходимых библиотек
+import os          # Библиотека для работы с переменными окружения
 import psutil      # Библиотека для мониторинга системных ресурсов (CPU, память, потоки)
 import time        # Библиотека для работы с временными метками и измерения интервалов
+from collections import deque  # Кольцевой буфер истории метрик
 from datetime import datetime  # Библиотека для работы с датой и временем
 import threading   # Библиотека для работы с потоками
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
+
+# Метрики, для которых ведутся скользящие среднее и максимум
+WINDOW_METRICS = ('cpu_percent', 'memory_percent', 'thread_count')
 
 class PerformanceMonitor:
     """
@@ -16,7 +22,7 @@ class PerformanceMonitor:
     - Общее состояние системы
     """
     
-    def __init__(self):
+    def __init__(self, history_size: int = None, sample_interval: float = None):
         """
         Инициализация системы мониторинга производительности.
         
@@ -25,10 +31,33 @@ class PerformanceMonitor:
         - Хранилище истории метрик
         - Отслеживание текущего процесса
         - Пороговые значения для метрик
+
+        Args:
+            history_size (int): Размер кольцевого буфера истории
+                                (по умолчанию MONITOR_HISTORY_SIZE из .env или 1000)
+            sample_interval (float): Интервал фонового замера в секундах; 0 - замеры
+                                     только по запросу (по умолчанию MONITOR_SAMPLE_INTERVAL)
         """
         self.start_time = time.time()  # Сохранение времени запуска для расчета uptime
-        self.metrics_history = []      # Список для хранения истории метрик
+        self.history_size = history_size or int(os.getenv("MONITOR_HISTORY_SIZE", "1000"))
+        self.sample_interval = sample_interval if sample_interval is not None else float(
+            os.getenv("MONITOR_SAMPLE_INTERVAL", "0"))
+
+        # Кольцевой буфер истории: самая старая запись вытесняется за O(1)
+        self.metrics_history = deque(maxlen=self.history_size)
         self.process = psutil.Process()  # Получение объекта текущего процесса
+
+        # Скользящие суммы для средних и монотонные очереди (номер, значение)
+        # для максимумов по окну истории
+        self.window_sums = dict.fromkeys(WINDOW_METRICS, 0.0)
+        self.window_max = {metric: deque() for metric in WINDOW_METRICS}
+        self.sample_count = 0  # Номер следующего замера
+        self.latest = None     # Последний успешный замер
+
+        # Фоновый замер метрик
+        self.lock = threading.Lock()
+        self.sampler = None
+        self.stop_event = threading.Event()
         
         # Пороговые значения для определения проблем с производительностью
         self.thresholds = {
@@ -58,16 +87,12 @@ class PerformanceMonitor:
                 'timestamp': datetime.now(),              # Время замера
                 'cpu_percent': self.process.cpu_percent(),    # Загрузка CPU
                 'memory_percent': self.process.memory_percent(),  # Использование памяти
-                'thread_count': len(self.process.threads()),  # Количество потоков
+                'thread_count': self.process.num_threads(),  # Количество потоков
                 'uptime': time.time() - self.start_time      # Время работы
             }
             
             # Сохранение метрик в историю
-            self.metrics_history.append(metrics)
-            
-            # Ограничение размера истории последними 1000 записями
-            if len(self.metrics_history) > 1000:
-                self.metrics_history.pop(0)  # Удаление самой старой записи
+            self._record(metrics)
                 
             return metrics
             
@@ -78,20 +103,94 @@ class PerformanceMonitor:
                 'timestamp': datetime.now()
             }
 
-    def check_health(self) -> dict:
+    def _record(self, metrics: dict):
+        """
+        Добавление замера в кольцевой буфер с обновлением оконных агрегатов.
+
+        Сумма корректируется на вытесняемую запись, а максимум хранится
+        в монотонно убывающей очереди, поэтому обновление амортизированно O(1).
+
+        Args:
+            metrics (dict): Успешный замер метрик
+        """
+        with self.lock:
+            if len(self.metrics_history) == self.history_size:
+                evicted = self.metrics_history[0]
+                for metric in WINDOW_METRICS:
+                    self.window_sums[metric] -= evicted[metric]
+            self.metrics_history.append(metrics)  # Самая старая запись вытесняется deque
+
+            number = self.sample_count
+            self.sample_count += 1
+            for metric in WINDOW_METRICS:
+                value = metrics[metric]
+                self.window_sums[metric] += value
+
+                # Значения, не превышающие новое, больше не могут стать максимумом
+                queue = self.window_max[metric]
+                while queue and queue[-1][1] <= value:
+                    queue.pop()
+                queue.append((number, value))
+                # Удаление максимума, вышедшего за пределы окна
+                if queue[0][0] <= number - self.history_size:
+                    queue.popleft()
+
+            self.latest = metrics
+
+    def start_sampling(self, interval: float = None) -> bool:
+        """
+        Запуск фонового замера метрик с заданным интервалом.
+
+        Args:
+            interval (float): Интервал в секундах (по умолчанию sample_interval)
+
+        Returns:
+            bool: True, если поток замеров запущен
+        """
+        interval = interval if interval is not None else self.sample_interval
+        if interval <= 0 or (self.sampler is not None and self.sampler.is_alive()):
+            return False
+        self.sample_interval = interval
+        self.stop_event.clear()
+        self.sampler = threading.Thread(target=self._sample_loop, name="monitor-sampler",
+                                        daemon=True)
+        self.sampler.start()
+        return True
+
+    def stop_sampling(self):
+        """
+        Остановка фонового замера метрик.
+        """
+        self.stop_event.set()
+        if self.sampler is not None:
+            self.sampler.join(timeout=self.sample_interval + 1)
+            self.sampler = None
+
+    def _sample_loop(self):
+        """
+        Цикл фонового потока: замер метрик до вызова stop_sampling.
+        """
+        while not self.stop_event.wait(self.sample_interval):
+            self.get_metrics()
+
+    def check_health(self, metrics: dict = None) -> dict:
         """
         Проверка состояния системы на основе пороговых значений.
         
         Анализирует текущие метрики и сравнивает их с пороговыми значениями
         для определения потенциальных проблем с производительностью.
         
+        Args:
+            metrics (dict): Уже полученный замер (по умолчанию выполняется новый)
+
         Returns:
             dict: Словарь с информацией о состоянии системы:
                 - status: 'healthy', 'warning' или 'error'
                 - warnings: список предупреждений (если есть)
                 - timestamp: время проверки
         """
-        metrics = self.get_metrics()  # Получение текущих метрик
+        if metrics is None:
+            metrics = self.get_metrics()  # Получение текущих метрик
         
         # Проверка на наличие ошибок при сборе метрик
         if 'error' in metrics:
@@ -129,30 +228,37 @@ class PerformanceMonitor:
 
     def get_average_metrics(self) -> dict:
         """
-        Расчет средних показателей за всю историю наблюдений.
+        Расчет средних и максимальных показателей по окну истории.
         
-        Вычисляет средние значения для:
+        Вычисляет средние и максимальные значения для:
         - Использования CPU
         - Использования памяти
         - Количества потоков
+
+        Значения берутся из агрегатов, обновляемых при каждом замере,
+        поэтому расчет выполняется за O(1).
         
         Returns:
             dict: Словарь со средними значениями метрик или сообщением об ошибке
         """
-        # Проверка наличия данных для анализа
-        if not self.metrics_history:
-            return {"error": "No metrics available"}
-            
-        # Расчет средних значений по всей истории метрик
-        avg_metrics = {
-            'avg_cpu': sum(m['cpu_percent'] for m in self.metrics_history) / len(self.metrics_history),
-            'avg_memory': sum(m['memory_percent'] for m in self.metrics_history) / len(self.metrics_history),
-            'avg_threads': sum(m['thread_count'] for m in self.metrics_history) / len(self.metrics_history),
-            'samples_count': len(self.metrics_history)  # Количество проанализированных замеров
-        }
-        
-        return avg_metrics
+        with self.lock:
+            count = len(self.metrics_history)
+
+            # Проверка наличия данных для анализа
+            if not count:
+                return {"error": "No metrics available"}
+
+            return {
+                'avg_cpu': self.window_sums['cpu_percent'] / count,
+                'avg_memory': self.window_sums['memory_percent'] / count,
+                'avg_threads': self.window_sums['thread_count'] / count,
+                'max_cpu': self.window_max['cpu_percent'][0][1],
+                'max_memory': self.window_max['memory_percent'][0][1],
+                'max_threads': self.window_max['thread_count'][0][1],
+                'samples_count': count  # Количество проанализированных замеров
+            }
 
+    @tracer.traced("monitor.log_metrics")
     def log_metrics(self, logger) -> None:
         """
         Логирование текущих метрик и состояния системы.
@@ -162,22 +268,23 @@ class PerformanceMonitor:
         - Предупреждения о превышении пороговых значений
         
         Args:
-            logger: Объект логгера для записи информации
+            logger (AppLogger): Объект логгера для записи информации
         """
-        metrics = self.get_metrics()   # Получение текущих метрик
-        health = self.check_health()   # Проверка состояния системы
+        # При фоновом замере используется последний замер, иначе выполняется один новый
+        metrics = self.latest if self.sampler is not None and self.latest else self.get_metrics()
+        health = self.check_health(metrics)   # Проверка состояния системы по тому же замеру
         
-        # Логирование текущих метрик производительности
+        # Логирование текущих метрик производительности (частое событие, пишется выборочно)
         if 'error' not in metrics:
-            logger.info(
-                f"Performance metrics - "
-                f"CPU: {metrics['cpu_percent']:.1f}%, "
-                f"Memory: {metrics['memory_percent']:.1f}%, "
-                f"Threads: {metrics['thread_count']}, "
-                f"Uptime: {metrics['uptime']:.0f}s"
+            logger.event(
+                "performance.metrics", "Performance metrics",
+                cpu_percent=round(metrics['cpu_percent'], 1),
+                memory_percent=round(metrics['memory_percent'], 1),
+                thread_count=metrics['thread_count'],
+                uptime_s=round(metrics['uptime'])
             )
             
         # Логирование предупреждений при проблемах с производительностью
         if health['status'] == 'warning':
             for warning in health['warnings']:
-                logger.warning(f"Performance warning: {warning}")
+                logger.warning("Performance warning: %s", warning)
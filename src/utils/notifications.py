@@ -1,43 +1,200 @@
 import os
 import logging
+import threading
+import time
+import atexit
 from pathlib import Path
 from dotenv import load_dotenv
 from aiogram import Bot
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.utils.token import TokenValidationError, validate_token
 import asyncio
 
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Окно, в течение которого повторные уведомления с тем же ключом объединяются, сек
+DEDUP_WINDOW = float(os.getenv("TELEGRAM_DEDUP_WINDOW", "3600"))
+
+# Минимальный интервал между сообщениями в один чат (лимит Telegram ~1 сообщение/с)
+MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1.0"))
+
+
+class TelegramNotifier:
+    """
+    Долгоживущий отправитель уведомлений в Telegram.
+
+    Сообщения отправляются из отдельного потока со своим циклом событий
+    через один Bot и одну HTTP-сессию. notify() только ставит сообщение
+    в очередь и не блокирует вызывающий поток. Повторы с тем же ключом
+    в пределах DEDUP_WINDOW объединяются, интервал между отправками
+    не меньше MIN_INTERVAL, а ответ 429 (retry_after) выдерживается.
+    """
+
+    _STOP = object()  # Маркер остановки фонового потока
+
+    def __init__(self, bot_token: str = None, chat_id: str = None,
+                 dedup_window: float = DEDUP_WINDOW, min_interval: float = MIN_INTERVAL):
+        self.bot_token = bot_token or os.getenv("TELEGRAM_BOT_TOKEN")
+        self.chat_id = chat_id or os.getenv("TELEGRAM_CHAT_ID")
+
+        # Некорректный токен отклоняется сразу: иначе Bot() завершил бы фоновый поток
+        if self.bot_token:
+            try:
+                validate_token(self.bot_token)
+            except TokenValidationError:
+                logging.error("Invalid TELEGRAM_BOT_TOKEN, Telegram notifications disabled")
+                self.bot_token = None
+        self.dedup_window = dedup_window
+        self.min_interval = min_interval
+
+        self.lock = threading.Lock()
+        self.recent = {}        # Ключ -> время последней поставленной в очередь отправки
+        self.suppressed = {}    # Ключ -> количество объединенных повторов
+        self.loop = None
+        self.queue = None
+        self.thread = None
+
+    @property
+    def configured(self) -> bool:
+        """Заданы ли токен бота и ID чата."""
+        return bool(self.bot_token and self.chat_id)
+
+    def _ensure_started(self):
+        """Запуск фонового потока с циклом событий при первом уведомлении."""
+        if self.thread is not None:
+            return
+        ready = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            self.queue = asyncio.Queue()
+            ready.set()
+            self.loop.run_until_complete(self._sender())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="telegram-notifier", daemon=True)
+        self.thread.start()
+        ready.wait()
+        atexit.register(self.stop)
+
+    def notify(self, text: str, key: str = None, disable_notification: bool = False,
+               parse_mode: str = ParseMode.HTML) -> bool:
+        """
+        Постановка уведомления в очередь отправки.
+
+        Args:
+            text (str): Текст сообщения
+            key (str): Ключ для объединения повторов (по умолчанию сам текст)
+            disable_notification (bool): Отправить без звука
+            parse_mode (str): Режим разметки сообщения
+
+        Returns:
+            bool: True, если сообщение поставлено в очередь; False, если оно
+                  объединено с недавним или Telegram не настроен
+        """
+        if not self.configured:
+            logging.error("Telegram credentials not configured!")
+            return False
+
+        key = key or text
+        now = time.monotonic()
+        with self.lock:
+            last = self.recent.get(key)
+            if last is not None and now - last < self.dedup_window:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            self._ensure_started()
+            if not self.thread.is_alive():
+                # Поток остановлен (stop) или завершился с ошибкой
+                logging.error("Telegram notifier thread is not running")
+                return False
+            self.recent[key] = now
+            repeats = self.suppressed.pop(key, 0)
+
+        if repeats:
+            text = f"{text}\n(повторов за период: {repeats})"
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (text, disable_notification, parse_mode))
+        return True
+
+    async def _sender(self):
+        """Фоновая отправка сообщений из очереди с ограничением частоты."""
+        bot = Bot(
+            token=self.bot_token,
+            default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+        )
+        last_sent = 0.0
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is self._STOP:
+                    break
+                text, disable_notification, parse_mode = item
+
+                # Соблюдение минимального интервала между сообщениями
+                delay = last_sent + self.min_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                for _ in range(2):  # Одна повторная попытка после retry_after
+                    try:
+                        await bot.send_message(
+                            chat_id=self.chat_id,
+                            text=text,
+                            parse_mode=parse_mode,
+                            disable_notification=disable_notification
+                        )
+                        break
+                    except TelegramRetryAfter as e:
+                        # Превышен лимит Telegram: ожидание указанного сервером времени
+                        logging.warning("Telegram rate limit, retry in %ss", e.retry_after)
+                        await asyncio.sleep(e.retry_after)
+                    except Exception as e:
+                        logging.error("Telegram notification error: %s", e)
+                        break
+                last_sent = time.monotonic()
+        finally:
+            await bot.session.close()
+
+    def stop(self, timeout: float = 5):
+        """
+        Отправка оставшихся сообщений и остановка фонового потока.
+        """
+        if self.thread is None or self.loop.is_closed():
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, self._STOP)
+        except RuntimeError:
+            return  # Цикл событий уже остановлен
+        self.thread.join(timeout)
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> TelegramNotifier:
+    """Общий отправитель уведомлений процесса."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = TelegramNotifier()
+        return _notifier
+
+
 async def send_telegram_message(
         text: str,
         parse_mode: str = ParseMode.HTML,
         disable_notification: bool = False
 ) -> bool:
-    """Отправка сообщения в Telegram чат."""
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+    """
+    Отправка сообщения в Telegram чат.
 
-    if not bot_token or not chat_id:
-        logging.error("Telegram credentials not configured!")
-        return False
-
-    try:
-        # Новый способ указания параметров по умолчанию
-        bot = Bot(
-            token=bot_token,
-            default=DefaultBotProperties(parse_mode=parse_mode)
-        )
-
-        await bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            disable_notification=disable_notification
-        )
-        return True
-    except Exception as e:
-        logging.error(f"Telegram notification error: {e}")
-        return False
-    finally:
-        await bot.session.close()
+    Сообщение ставится в очередь общего TelegramNotifier,
+    вызов не ждет доставки.
+    """
+    return get_notifier().notify(text, disable_notification=disable_notification,
+                                 parse_mode=parse_mode)
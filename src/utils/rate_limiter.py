@@ -0,0 +1,433 @@
+# Импорт необходимых библиотек
+import asyncio     # Ожидание разрешения в цикле событий
+import os          # Библиотека для работы с переменными окружения
+import threading   # Библиотека для обеспечения потокобезопасности
+import time        # Библиотека для измерения интервалов
+from collections import deque  # Очередь ожидающих запросов
+from utils.conversation import estimate_tokens  # Оценка количества токенов запроса
+from utils.logger import AppLogger  # Импорт собственного логгера
+
+# Ограничения частоты (0 - без ограничения)
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "0"))              # Запросов в минуту на все модели
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", "0"))              # Токенов в минуту на все модели
+RATE_LIMIT_MODEL_RPM = float(os.getenv("RATE_LIMIT_MODEL_RPM", "0"))  # Запросов в минуту на одну модель
+RATE_LIMIT_MODEL_TPM = float(os.getenv("RATE_LIMIT_MODEL_TPM", "0"))  # Токенов в минуту на одну модель
+
+# Адаптивное ограничение одновременных запросов (AIMD)
+CONCURRENCY_INITIAL = int(os.getenv("CONCURRENCY_INITIAL", "4"))   # Начальный предел
+CONCURRENCY_MAX = int(os.getenv("CONCURRENCY_MAX", "10"))          # Верхний предел (по умолчанию = HTTP_POOL_SIZE)
+CONCURRENCY_LATENCY_TARGET = float(os.getenv("CONCURRENCY_LATENCY_TARGET", "0"))  # Время до заголовков ответа, сек (0 - не учитывать)
+
+# Минимальный интервал между снижениями предела: серия 429 от одного всплеска
+# запросов уменьшает предел один раз
+DECREASE_COOLDOWN = 1.0
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты по алгоритму token bucket.
+
+    Запас из capacity единиц пополняется со скоростью rate_per_minute / 60
+    единиц в секунду. Запрос единиц сверх запаса ожидает пополнения, поэтому
+    короткие всплески до capacity проходят сразу, а средняя частота не
+    превышает заданной. Объект можно использовать из нескольких потоков.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        """
+        Инициализация ограничителя.
+
+        Args:
+            rate_per_minute (float): Допустимое количество единиц в минуту
+            capacity (float): Размер запаса (по умолчанию равен секундной норме,
+                              но не меньше одной единицы)
+        """
+        self.rate = rate_per_minute / 60  # Единиц в секунду
+        self.capacity = capacity if capacity is not None else max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """
+        Пополнение запаса за время, прошедшее с прошлого обращения.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Резервирование единиц без ожидания.
+
+        Запас может уйти в минус: следующие запросы ждут, пока он не восстановится,
+        поэтому очередность ожидающих сохраняется. Запрос больше запаса
+        списывается полностью, но ждет только полного запаса, а долг
+        оплачивают следующие запросы. Отрицательное количество возвращает
+        единицы в запас (уточнение оценки после ответа).
+
+        Args:
+            amount (float): Количество единиц (запросов или токенов)
+
+        Returns:
+            float: Время в секундах, через которое зарезервированные единицы можно использовать
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+            # Запрос больше запаса не должен ждать вечно: ожидание не дольше полного пополнения
+            level = self.tokens + max(0.0, amount - self.capacity)
+            return max(0.0, -level / self.rate) if self.rate > 0 else 0.0
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Получение единиц с ожиданием (блокирует текущий поток).
+
+        Args:
+            amount (float): Количество единиц (запросов или токенов)
+
+        Returns:
+            float: Время ожидания в секундах
+        """
+        delay = self.reserve(amount)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class _Lease:
+    """Разрешение на выполнение запроса, выданное RateLimiter."""
+
+    __slots__ = ("model", "tokens", "charged", "granted", "wake")
+
+    def __init__(self, model, tokens):
+        self.model = model
+        self.tokens = tokens    # Оценка токенов запроса
+        self.charged = []       # Пары (ограничитель TPM, списанные токены) для уточнения в release()
+        self.granted = False    # Занято место среди одновременных запросов
+        self.wake = None        # Пробуждение ожидающего потока или задачи
+
+
+def _resolve(future):
+    """Завершение ожидания задачи, если она еще не отменена."""
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """
+    Общий ограничитель запросов к API для всех клиентов процесса.
+
+    Обеспечивает:
+    - Ограничение запросов и токенов в минуту, общее и для каждой модели (token bucket)
+    - Адаптивный предел одновременных запросов (AIMD): после каждого успешного
+      ответа предел растет на 1/предел (на единицу за "окно" запросов),
+      после 429 или превышения целевой задержки - уменьшается вдвое
+    - Паузу запросов к модели на время Retry-After после ответа 429
+
+    Синхронный клиент ожидает в потоке (acquire), асинхронный - в цикле
+    событий (acquire_async); состояние общее, поэтому окна приложения,
+    пакетный запуск и оба клиента делят одни и те же лимиты.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, model_rpm: float = None,
+                 model_tpm: float = None, initial_concurrency: int = None,
+                 max_concurrency: int = None, latency_target: float = None):
+        """
+        Инициализация ограничителя.
+
+        Args:
+            rpm (float): Запросов в минуту на все модели (по умолчанию RATE_LIMIT_RPM)
+            tpm (float): Токенов в минуту на все модели (по умолчанию RATE_LIMIT_TPM)
+            model_rpm (float): Запросов в минуту на модель (по умолчанию RATE_LIMIT_MODEL_RPM)
+            model_tpm (float): Токенов в минуту на модель (по умолчанию RATE_LIMIT_MODEL_TPM)
+            initial_concurrency (int): Начальный предел одновременных запросов
+                                       (по умолчанию CONCURRENCY_INITIAL)
+            max_concurrency (int): Верхний предел одновременных запросов (по умолчанию CONCURRENCY_MAX)
+            latency_target (float): Целевое время до заголовков ответа в секундах,
+                                    при превышении предел снижается (по умолчанию
+                                    CONCURRENCY_LATENCY_TARGET, 0 - не учитывать)
+        """
+        self.logger = AppLogger()
+        self.lock = threading.Lock()
+
+        self.configure(rpm, tpm, model_rpm, model_tpm)
+
+        self.max_limit = max(1, max_concurrency if max_concurrency is not None else CONCURRENCY_MAX)
+        self.limit = float(min(self.max_limit, max(1, initial_concurrency if initial_concurrency is not None
+                                                   else CONCURRENCY_INITIAL)))
+        self.latency_target = latency_target if latency_target is not None else CONCURRENCY_LATENCY_TARGET
+
+        self.in_flight = 0        # Выполняющиеся запросы
+        self.waiters = deque()    # Разрешения, ожидающие места (в порядке очереди)
+        self.paused_until = {}    # Модель -> время (time.monotonic) окончания паузы после 429
+        self.last_decrease = 0.0  # Время последнего снижения предела
+
+        # Статистика
+        self.throttled = 0     # Получено ответов 429
+        self.decreases = 0     # Снижений предела
+        self.wait_time = 0.0   # Суммарное ожидание ограничений частоты, сек
+
+    def configure(self, rpm: float = None, tpm: float = None, model_rpm: float = None,
+                  model_tpm: float = None):
+        """
+        Установка ограничений частоты (например, из аргументов пакетного запуска).
+
+        Args:
+            rpm (float): Запросов в минуту на все модели (0 - без ограничения)
+            tpm (float): Токенов в минуту на все модели (0 - без ограничения)
+            model_rpm (float): Запросов в минуту на модель (0 - без ограничения)
+            model_tpm (float): Токенов в минуту на модель (0 - без ограничения)
+        """
+        rpm = rpm if rpm is not None else RATE_LIMIT_RPM
+        tpm = tpm if tpm is not None else RATE_LIMIT_TPM
+        with self.lock:
+            self.rpm = TokenBucket(rpm) if rpm > 0 else None
+            # Запас токенов на 10 секунд: запрос с длинным контекстом не ждет полного пополнения
+            self.tpm = TokenBucket(tpm, tpm / 6) if tpm > 0 else None
+            self.model_rpm = model_rpm if model_rpm is not None else RATE_LIMIT_MODEL_RPM
+            self.model_tpm = model_tpm if model_tpm is not None else RATE_LIMIT_MODEL_TPM
+            self.model_buckets = {}  # Модель -> (ограничитель запросов, ограничитель токенов)
+
+    @staticmethod
+    def estimate(data: dict) -> int:
+        """
+        Оценка токенов запроса /chat/completions до его отправки.
+
+        Args:
+            data (dict): Тело запроса (messages, max_tokens)
+
+        Returns:
+            int: Токены контекста и максимальная длина ответа
+        """
+        if not data:
+            return 0
+        tokens = sum(estimate_tokens(message.get("content")) for message in data.get("messages", ()))
+        return tokens + (data.get("max_tokens") or 0)
+
+    def _buckets(self, model):
+        """
+        Ограничители, через которые проходит запрос (вызывается под self.lock).
+
+        Returns:
+            tuple: (ограничители запросов, ограничители токенов)
+        """
+        request_buckets, token_buckets = [self.rpm], [self.tpm]
+        if model is not None and (self.model_rpm > 0 or self.model_tpm > 0):
+            if model not in self.model_buckets:
+                self.model_buckets[model] = (
+                    TokenBucket(self.model_rpm) if self.model_rpm > 0 else None,
+                    TokenBucket(self.model_tpm, self.model_tpm / 6) if self.model_tpm > 0 else None
+                )
+            model_rpm, model_tpm = self.model_buckets[model]
+            request_buckets.append(model_rpm)
+            token_buckets.append(model_tpm)
+        return ([bucket for bucket in request_buckets if bucket is not None],
+                [bucket for bucket in token_buckets if bucket is not None])
+
+    def _delay(self, lease: _Lease, tokens: int) -> float:
+        """
+        Резервирование частоты для очередной попытки запроса.
+
+        Args:
+            lease (_Lease): Разрешение запроса; списанные токены запоминаются в нем
+            tokens (int): Токены для списания (0 - повторная попытка)
+
+        Returns:
+            float: Необходимое ожидание в секундах
+        """
+        with self.lock:
+            now = time.monotonic()
+            model = lease.model
+            delay = max(self.paused_until.get(None, 0), self.paused_until.get(model, 0)) - now
+            request_buckets, token_buckets = self._buckets(model)
+            for bucket in request_buckets:
+                delay = max(delay, bucket.reserve(1))
+            if tokens:
+                for bucket in token_buckets:
+                    delay = max(delay, bucket.reserve(tokens))
+                    lease.charged.append((bucket, tokens))
+            delay = max(delay, 0.0)
+            self.wait_time += delay
+            return delay
+
+    def _try_grant(self, lease: _Lease) -> bool:
+        """
+        Выдача места без ожидания, если очередь пуста (вызывается под self.lock).
+        """
+        if not self.waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            lease.granted = True
+        return lease.granted
+
+    def _wake(self):
+        """
+        Выдача освободившихся мест ожидающим по очереди (вызывается под self.lock).
+        """
+        while self.waiters and self.in_flight < int(self.limit):
+            lease = self.waiters.popleft()
+            self.in_flight += 1
+            lease.granted = True
+            lease.wake()
+
+    def acquire(self, model: str = None, tokens: int = 0) -> _Lease:
+        """
+        Получение разрешения на запрос с ожиданием в текущем потоке.
+
+        Args:
+            model (str): Идентификатор модели (None - служебный запрос)
+            tokens (int): Оценка токенов запроса (RateLimiter.estimate)
+
+        Returns:
+            _Lease: Разрешение; после завершения запроса передается в release()
+        """
+        lease = _Lease(model, tokens)
+        event = None
+        with self.lock:
+            if not self._try_grant(lease):
+                event = threading.Event()
+                lease.wake = event.set
+                self.waiters.append(lease)
+        if event is not None:
+            event.wait()
+        delay = self._delay(lease, tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return lease
+
+    async def acquire_async(self, model: str = None, tokens: int = 0) -> _Lease:
+        """
+        Получение разрешения на запрос с ожиданием в цикле событий.
+
+        Args:
+            model (str): Идентификатор модели (None - служебный запрос)
+            tokens (int): Оценка токенов запроса (RateLimiter.estimate)
+
+        Returns:
+            _Lease: Разрешение; после завершения запроса передается в release()
+        """
+        loop = asyncio.get_running_loop()
+        lease = _Lease(model, tokens)
+        future = None
+        with self.lock:
+            if not self._try_grant(lease):
+                future = loop.create_future()
+                lease.wake = lambda: loop.call_soon_threadsafe(_resolve, future)
+                self.waiters.append(lease)
+        try:
+            if future is not None:
+                await future
+            delay = self._delay(lease, tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Отмена в очереди: место освобождается или запрос убирается из очереди
+            with self.lock:
+                if lease in self.waiters:
+                    self.waiters.remove(lease)
+            self.release(lease)
+            raise
+        return lease
+
+    def pace(self, lease: _Lease):
+        """
+        Ожидание частоты перед повторной попыткой того же запроса (в текущем потоке).
+        """
+        delay = self._delay(lease, 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def pace_async(self, lease: _Lease):
+        """
+        Ожидание частоты перед повторной попыткой того же запроса (в цикле событий).
+        """
+        delay = self._delay(lease, 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_response(self, lease: _Lease, status: int, latency: float, retry_after: float = None):
+        """
+        Учет ответа сервера в адаптивном пределе.
+
+        Args:
+            lease (_Lease): Разрешение запроса
+            status (int): HTTP-статус ответа (None - сетевая ошибка)
+            latency (float): Время до получения заголовков ответа в секундах
+            retry_after (float): Значение Retry-After в секундах для ответа 429
+        """
+        with self.lock:
+            now = time.monotonic()
+            if status == 429:
+                self.throttled += 1
+                if retry_after:
+                    # Остальные запросы к этой модели ждут окончания паузы, а не получают 429
+                    until = now + retry_after
+                    self.paused_until[lease.model] = max(self.paused_until.get(lease.model, 0), until)
+                self._decrease(now, "throttled")
+            elif self.latency_target and latency > self.latency_target:
+                self._decrease(now, "latency")
+            elif status is not None and status < 400:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+                self._wake()
+
+    def _decrease(self, now: float, reason: str):
+        """
+        Уменьшение предела вдвое (вызывается под self.lock).
+        """
+        if now - self.last_decrease < DECREASE_COOLDOWN:
+            return
+        self.last_decrease = now
+        self.decreases += 1
+        self.limit = max(1.0, self.limit / 2)
+        self.logger.event("rate_limiter.decrease", "Concurrency limit decreased",
+                          reason=reason, limit=int(self.limit), in_flight=self.in_flight)
+
+    def release(self, lease: _Lease, usage: dict = None):
+        """
+        Завершение запроса: освобождение места и уточнение расхода токенов.
+
+        Args:
+            lease (_Lease): Разрешение запроса
+            usage (dict): Блок usage ответа API (total_tokens)
+        """
+        with self.lock:
+            if lease.granted:
+                lease.granted = False
+                self.in_flight -= 1
+                self._wake()
+
+        # Возврат или дозаказ токенов по фактическому расходу относительно списанных
+        actual = (usage or {}).get("total_tokens")
+        if actual is not None:
+            for bucket, charged in lease.charged:
+                bucket.reserve(actual - charged)
+        lease.charged = []
+
+    def get_stats(self) -> dict:
+        """
+        Текущее состояние ограничителя.
+
+        Returns:
+            dict: Предел и количество одновременных запросов, очередь, число 429
+        """
+        with self.lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "queued": len(self.waiters),
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+                "wait_time": round(self.wait_time, 2)
+            }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Общий ограничитель запросов процесса."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
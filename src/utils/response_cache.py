@@ -0,0 +1,158 @@
+# Импорт необходимых библиотек
+import hashlib      # Библиотека для вычисления хэша ключа запроса
+import json         # Библиотека для работы с JSON форматом
+import os           # Библиотека для работы с переменными окружения
+import re           # Библиотека регулярных выражений для нормализации пробелов
+import threading    # Библиотека для обеспечения потокобезопасности
+import time         # Библиотека для работы с временными метками
+import unicodedata  # Библиотека для нормализации Unicode
+from collections import OrderedDict  # Упорядоченный словарь для LRU
+from utils.tracing import tracer  # Трассировка этапов обработки запроса
+
+# Шаблон последовательностей пробельных символов
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Нормализация текста сообщения для ключа кэша.
+
+    Приводит Unicode к форме NFC, схлопывает пробельные символы
+    и убирает их по краям, чтобы запросы, отличающиеся только
+    форматированием, попадали в одну запись кэша.
+
+    Args:
+        text (str): Исходный текст
+
+    Returns:
+        str: Нормализованный текст
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+class ResponseCache:
+    """
+    Кэш ответов API перед обращением к /chat/completions.
+
+    Обеспечивает:
+    - Поиск по ключу (модель, нормализованные сообщения, параметры генерации)
+    - Быстрый LRU-кэш в памяти перед таблицей response_cache в ChatCache
+    - Вытеснение по количеству записей и по возрасту
+    """
+
+    def __init__(self, cache, memory_entries: int = 256, max_entries: int = None,
+                 max_age: float = None):
+        """
+        Инициализация кэша ответов.
+
+        Args:
+            cache (ChatCache): Экземпляр класса для работы с базой данных
+            memory_entries (int): Размер LRU-кэша в памяти
+            max_entries (int): Максимум записей в базе (по умолчанию RESPONSE_CACHE_MAX_ENTRIES)
+            max_age (float): Максимальный возраст ответа в секундах
+                             (по умолчанию RESPONSE_CACHE_MAX_AGE)
+        """
+        self.cache = cache
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+        self.max_age = max_age if max_age is not None else float(
+            os.getenv("RESPONSE_CACHE_MAX_AGE", "604800"))
+
+        # LRU в памяти: ключ -> (ответ, время создания)
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Вытеснение из базы выполняется раз в несколько сохранений
+        self.puts_since_eviction = 0
+
+    @staticmethod
+    def make_key(model: str, messages: list, params: dict = None) -> str:
+        """
+        Построение ключа кэша для запроса.
+
+        Args:
+            model (str): Идентификатор модели
+            messages (list): Сообщения запроса [{"role", "content"}, ...]
+            params (dict): Параметры генерации (temperature, max_tokens и т.п.)
+
+        Returns:
+            str: SHA-256 канонического представления запроса
+        """
+        payload = {
+            "model": model,
+            "messages": [[m["role"], normalize_text(m["content"])] for m in messages],
+            "params": params or {}
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @tracer.traced("response_cache.get")
+    def get(self, key: str):
+        """
+        Получение сохраненного ответа.
+
+        Args:
+            key (str): Ключ запроса
+
+        Returns:
+            dict | None: Ответ API или None при промахе или устаревшей записи
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if now - created_at <= self.max_age:
+                    self.memory.move_to_end(key)  # Отметка недавнего использования
+                    return response
+                del self.memory[key]
+
+        # Поиск в базе при промахе в памяти
+        row = self.cache.get_cached_response(key)
+        if not row:
+            return None
+        response_json, _, created_at = row
+        if now - created_at > self.max_age:
+            return None
+        response = json.loads(response_json)
+        self._remember(key, response, created_at)
+        return response
+
+    @tracer.traced("response_cache.put")
+    def put(self, key: str, model: str, response: dict):
+        """
+        Сохранение успешного ответа API.
+
+        Args:
+            key (str): Ключ запроса
+            model (str): Идентификатор модели
+            response (dict): Ответ API
+        """
+        tokens_used = response.get("usage", {}).get("total_tokens", 0)
+        self.cache.save_cached_response(key, model, json.dumps(response, ensure_ascii=False),
+                                        tokens_used)
+        self._remember(key, response, time.time())
+
+        # Периодическое вытеснение старых записей из базы
+        self.puts_since_eviction += 1
+        if self.puts_since_eviction >= 100:
+            self.puts_since_eviction = 0
+            self.cache.evict_cached_responses(self.max_entries, self.max_age)
+
+    def _remember(self, key: str, response: dict, created_at: float):
+        """
+        Добавление ответа в LRU-кэш в памяти с вытеснением самого старого.
+        """
+        with self.lock:
+            self.memory[key] = (response, created_at)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def clear_memory(self):
+        """
+        Очистка LRU-кэша в памяти.
+        """
+        with self.lock:
+            self.memory.clear()
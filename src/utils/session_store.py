@@ -0,0 +1,119 @@
+# Импорт необходимых библиотек
+from array import array                  # Компактные типизированные массивы
+from collections.abc import Sequence     # Базовый класс последовательности
+from datetime import datetime            # Библиотека для работы с датой и временем
+
+
+class SessionStore(Sequence):
+    """
+    Колоночное хранилище записей аналитики по сообщениям.
+
+    Каждая метрика хранится в отдельном типизированном массиве array,
+    поэтому запись занимает десятки байт вместо сотен для словаря
+    с datetime. Модели кодируются словарем: в колонке хранится номер
+    модели в списке models. Добавление амортизированно O(1).
+
+    Для совместимости хранилище ведет себя как список словарей прежнего
+    формата session_data: словари создаются только при обращении к записи.
+    """
+
+    # Имена колонок и коды типов array
+    COLUMNS = {
+        'timestamp_ms': 'q',     # Время сообщения, миллисекунды epoch
+        'model': 'I',            # Номер модели в словаре models
+        'message_length': 'I',   # Длина сообщения в символах
+        'response_time': 'd',    # Время ответа в секундах
+        'tokens_used': 'q',      # Использовано токенов
+        'context_tokens': 'q',   # Размер контекста запроса
+        'cache_hit': 'B',        # Ответ из кэша (0/1)
+        'cancelled': 'B',        # Запрос отменен пользователем (0/1)
+    }
+
+    def __init__(self):
+        """
+        Инициализация пустого хранилища.
+        """
+        self.models = []        # Код модели -> идентификатор
+        self.model_codes = {}   # Идентификатор -> код модели
+        self.columns = {name: array(code) for name, code in self.COLUMNS.items()}
+
+    def _encode_model(self, model: str) -> int:
+        """
+        Получение кода модели с добавлением новой модели в словарь.
+        """
+        code = self.model_codes.get(model)
+        if code is None:
+            code = self.model_codes[model] = len(self.models)
+            self.models.append(model)
+        return code
+
+    def append(self, timestamp: datetime, model: str, message_length: int, response_time: float,
+               tokens_used: int, context_tokens: int = 0, cache_hit: bool = False,
+               cancelled: bool = False):
+        """
+        Добавление записи о сообщении.
+
+        Args:
+            timestamp (datetime): Время отправки сообщения
+            model (str): Идентификатор модели
+            message_length (int): Длина сообщения
+            response_time (float): Время ответа в секундах
+            tokens_used (int): Количество использованных токенов
+            context_tokens (int): Размер контекста запроса в токенах
+            cache_hit (bool): Ответ получен из кэша
+            cancelled (bool): Запрос отменен пользователем
+        """
+        columns = self.columns
+        columns['timestamp_ms'].append(int(timestamp.timestamp() * 1000))
+        columns['model'].append(self._encode_model(model))
+        columns['message_length'].append(message_length or 0)
+        columns['response_time'].append(response_time or 0.0)
+        columns['tokens_used'].append(tokens_used or 0)
+        columns['context_tokens'].append(context_tokens or 0)
+        columns['cache_hit'].append(1 if cache_hit else 0)
+        columns['cancelled'].append(1 if cancelled else 0)
+
+    def clear(self):
+        """
+        Удаление всех записей и словаря моделей.
+        """
+        self.models.clear()
+        self.model_codes.clear()
+        for name, code in self.COLUMNS.items():
+            self.columns[name] = array(code)
+
+    def __len__(self):
+        return len(self.columns['timestamp_ms'])
+
+    def __getitem__(self, index):
+        """
+        Получение записи в формате прежнего session_data.
+
+        Args:
+            index (int | slice): Номер записи или срез
+
+        Returns:
+            dict | list: Словарь записи или список словарей для среза
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        columns = self.columns
+        return {
+            'timestamp': datetime.fromtimestamp(columns['timestamp_ms'][index] / 1000),
+            'model': self.models[columns['model'][index]],
+            'message_length': columns['message_length'][index],
+            'response_time': columns['response_time'][index],
+            'tokens_used': columns['tokens_used'][index],
+            'context_tokens': columns['context_tokens'][index],
+            'cache_hit': bool(columns['cache_hit'][index]),
+            'cancelled': bool(columns['cancelled'][index])
+        }
+
+    def nbytes(self) -> int:
+        """
+        Объем памяти, занимаемый колонками.
+
+        Returns:
+            int: Размер данных колонок в байтах
+        """
+        return sum(len(data) * data.itemsize for data in self.columns.values())
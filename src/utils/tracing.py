@@ -0,0 +1,222 @@
+# Импорт необходимых библиотек
+import contextvars  # Идентификатор трассы текущего запроса (в т.ч. в asyncio)
+import functools    # Сохранение метаданных оборачиваемых функций
+import inspect      # Определение асинхронных функций для декоратора
+import json         # Библиотека для экспорта в формате JSON
+import os           # Библиотека для работы с переменными окружения
+import threading    # Идентификатор потока для трассировки
+import time         # Библиотека для измерения интервалов
+import uuid         # Генерация идентификаторов трасс
+from collections import deque  # Ограниченный буфер последних спанов
+
+# Идентификатор трассы, к которой относятся создаваемые спаны
+_current_trace = contextvars.ContextVar('trace_id', default=None)
+
+
+class _NoopSpan:
+    """
+    Пустой спан, возвращаемый при отключенной трассировке.
+
+    Один общий экземпляр без состояния: вход и выход ничего не делают.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        """Игнорирование атрибутов спана."""
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    Интервал выполнения этапа обработки запроса.
+
+    Используется как контекстный менеджер: время начала фиксируется
+    при входе, длительность - при выходе, после чего спан передается
+    трассировщику.
+    """
+
+    __slots__ = ('tracer', 'name', 'args', 'trace_id', 'token', 'start_us', 'start_ns', 'thread_id')
+
+    def __init__(self, tracer, name: str, args: dict, new_trace: bool):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.token = None
+        if new_trace:
+            self.trace_id = uuid.uuid4().hex
+            self.token = _current_trace.set(self.trace_id)
+        else:
+            self.trace_id = _current_trace.get()
+
+    def set(self, **args):
+        """
+        Добавление атрибутов спана (модель, размер ответа и т.п.).
+        """
+        self.args.update(args)
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.start_us = time.time_ns() // 1000
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_us = (time.perf_counter_ns() - self.start_ns) // 1000
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        if self.token is not None:
+            try:
+                _current_trace.reset(self.token)
+            except ValueError:
+                # Спан завершен в другом контексте (например, в другой задаче asyncio)
+                pass
+        self.tracer._finish({
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'start_us': self.start_us,
+            'duration_us': duration_us,
+            'thread_id': self.thread_id,
+            'args': self.args
+        })
+        return False
+
+
+class Tracer:
+    """
+    Легковесная трассировка этапов обработки запроса.
+
+    Обеспечивает:
+    - Контекстный менеджер span() и декоратор traced() для синхронных
+      и асинхронных функций
+    - Объединение спанов одного запроса общим trace_id
+    - Буфер последних спанов в памяти и передачу их в sink для сохранения
+    - Экспорт в формат Chrome trace event (chrome://tracing, Perfetto)
+
+    При отключенной трассировке span() возвращает общий пустой спан,
+    а декоратор сразу вызывает исходную функцию.
+    """
+
+    def __init__(self, enabled: bool = None, buffer_size: int = 10000):
+        """
+        Инициализация трассировщика.
+
+        Args:
+            enabled (bool): Включить трассировку (по умолчанию TRACING_ENABLED из .env)
+            buffer_size (int): Количество последних спанов, хранимых в памяти
+        """
+        self.enabled = enabled if enabled is not None else os.getenv("TRACING_ENABLED", "0") == "1"
+        self.spans = deque(maxlen=buffer_size)
+        self.sink = None  # Функция сохранения завершенного спана, например ChatCache.save_span
+
+    def span(self, name: str, new_trace: bool = False, **args):
+        """
+        Создание спана.
+
+        Args:
+            name (str): Название этапа, например "http.request"
+            new_trace (bool): Начать новую трассу (корневой спан запроса)
+            **args: Атрибуты спана
+
+        Returns:
+            Span | _NoopSpan: Контекстный менеджер спана
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, args, new_trace)
+
+    def traced(self, name: str = None):
+        """
+        Декоратор, оборачивающий вызов функции в спан.
+
+        Args:
+            name (str): Название спана (по умолчанию полное имя функции)
+
+        Returns:
+            callable: Декоратор
+        """
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    with Span(self, span_name, {}, False):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with Span(self, span_name, {}, False):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def _finish(self, record: dict):
+        """
+        Сохранение завершенного спана в буфер и передача в sink.
+        """
+        self.spans.append(record)
+        if self.sink is not None:
+            try:
+                self.sink(record)
+            except Exception:
+                # Ошибка сохранения не должна прерывать трассируемый код
+                pass
+
+    @staticmethod
+    def to_chrome_trace(spans) -> dict:
+        """
+        Преобразование спанов в формат Chrome trace event.
+
+        Args:
+            spans (iterable): Записи спанов (словари с полями как в буфере)
+
+        Returns:
+            dict: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        pid = os.getpid()
+        events = []
+        for record in spans:
+            events.append({
+                'name': record['name'],
+                'cat': record['name'].split('.', 1)[0],
+                'ph': 'X',  # Завершенное событие с длительностью
+                'ts': record['start_us'],
+                'dur': record['duration_us'],
+                'pid': pid,
+                'tid': record['thread_id'],
+                'args': {'trace_id': record['trace_id'], **(record['args'] or {})}
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path: str, spans=None) -> str:
+        """
+        Запись спанов в файл Chrome trace JSON.
+
+        Args:
+            path (str): Путь к файлу
+            spans (iterable): Спаны для экспорта (по умолчанию буфер в памяти)
+
+        Returns:
+            str: Путь к записанному файлу
+        """
+        trace = self.to_chrome_trace(self.spans if spans is None else spans)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False, default=str)
+        return path
+
+
+# Общий трассировщик приложения
+tracer = Tracer()
@@ -0,0 +1,11 @@
+"""
+Общая настройка тестов: модули приложения импортируются из src.
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+# Импорт необходимых библиотек
+import os   # Работа с путями
+import sys  # Настройка пути импорта
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -0,0 +1,61 @@
+"""
+Тесты учета задержек в аналитике.
+"""
+# Импорт необходимых библиотек
+import pytest  # Фикстуры
+
+from utils.analytics import Analytics  # noqa: E402
+from utils.cache import ChatCache  # noqa: E402
+
+
+@pytest.fixture
+def analytics(tmp_path, monkeypatch):
+    """Аналитика на временной базе (ChatCache создает базу в текущей директории)."""
+    monkeypatch.chdir(tmp_path)
+    cache = ChatCache(write_behind=False)
+    return Analytics(cache)
+
+
+def latency_count(analytics, model):
+    histograms = analytics._model_histograms(model)
+    return histograms['response_time'].count
+
+
+def test_successful_response_recorded(analytics):
+    analytics.track_message("m", 10, 1.5, 100, ttft=0.3, completion_tokens=50)
+    assert latency_count(analytics, "m") == 1
+
+
+@pytest.mark.parametrize("flags", [{"error": True}, {"cancelled": True}, {"cache_hit": True}])
+def test_latency_skipped_for_incomplete_responses(analytics, flags):
+    analytics.track_message("m", 10, 0.05, 0, **flags)
+    assert latency_count(analytics, "m") == 0
+    # Сообщение учитывается в общей статистике
+    assert analytics.get_statistics()['total_messages'] == 1
+
+
+def test_histograms_persisted_only_on_flush(analytics):
+    analytics.track_message("m", 10, 1.5, 100, ttft=0.3, completion_tokens=50)
+    assert analytics.cache.get_latency_histograms() == []
+
+    analytics.flush()
+    assert {(model, metric) for model, metric, _ in analytics.cache.get_latency_histograms()} == {
+        ("m", "response_time"), ("m", "ttft"), ("m", "tokens_per_sec")}
+    assert not analytics.dirty_latency
+
+
+def test_clear_data_removes_persisted_analytics(analytics):
+    analytics.track_message("m", 10, 1.5, 100, ttft=0.3)
+    analytics.track_message("other", 10, 2.0, 100)
+    analytics.flush()
+
+    analytics.clear_data()
+    analytics.track_message("m", 10, 0.5, 10)
+    analytics.flush()
+
+    # После перезапуска видны только данные, записанные после очистки
+    restored = Analytics(analytics.cache)
+    assert set(restored.model_usage) == {"m"}
+    assert restored.model_usage["m"]["count"] == 1
+    assert set(restored.latency) == {"m"}
+    assert latency_count(restored, "m") == 1
@@ -0,0 +1,100 @@
+"""
+Тесты уведомлений о низком балансе.
+"""
+# Импорт необходимых библиотек
+import asyncio  # Запуск фоновой задачи сервиса
+import pytest   # Фикстуры
+
+from utils.balance import BalanceService  # noqa: E402
+
+
+class FakeClient:
+    """Клиент API с заданным балансом."""
+
+    def __init__(self, balance):
+        self.balance = balance
+
+    async def get_balance(self):
+        return self.balance
+
+
+class FakeNotifier:
+    """Отправитель, запоминающий уведомления."""
+
+    def __init__(self):
+        self.messages = []
+
+    def notify(self, text, key=None):
+        self.messages.append((key, text))
+        return True
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "balance_cache.json")
+
+
+def start(service):
+    """Запуск service.run() до первого обновления и его остановка."""
+    async def scenario():
+        task = asyncio.create_task(service.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(scenario())
+
+
+def make_service(path, balance, notifier):
+    return BalanceService(FakeClient(balance), notifier=notifier, threshold=1.0,
+                          refresh_interval=3600, path=path)
+
+
+def test_alert_sent_once_on_crossing(path):
+    notifier = FakeNotifier()
+    service = make_service(path, 0.5, notifier)
+    start(service)
+    assert len(notifier.messages) == 1
+    asyncio.run(service.refresh())
+    assert len(notifier.messages) == 1
+
+
+def test_restart_with_low_cached_balance_sends_no_alert(path):
+    first = FakeNotifier()
+    start(make_service(path, 0.5, first))
+    assert len(first.messages) == 1
+
+    # Новый запуск с тем же файлом: баланс по-прежнему ниже порога
+    second = FakeNotifier()
+    service = make_service(path, 0.4, second)
+    assert service.below_threshold is True
+    start(service)
+    assert second.messages == []
+
+
+def test_alert_again_after_top_up(path):
+    notifier = FakeNotifier()
+    service = make_service(path, 0.5, notifier)
+    start(service)
+    service.client.balance = 5.0
+    asyncio.run(service.refresh())
+    service.client.balance = 0.5
+    asyncio.run(service.refresh())
+    assert len(notifier.messages) == 2
+
+
+def test_legacy_cache_file_seeds_state_without_alert(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"balance": 0.5, "fetched_at": 0}')
+    notifier = FakeNotifier()
+    start(make_service(path, 0.5, notifier))
+    assert notifier.messages == []
+
+
+def test_spend_estimate_crossing_is_persisted(path):
+    notifier = FakeNotifier()
+    service = make_service(path, 1.5, notifier)
+    start(service)
+    service.record_usage("m", {"cost": 1.0})
+    assert len(notifier.messages) == 1
+    assert make_service(path, 0.5, FakeNotifier()).below_threshold is True
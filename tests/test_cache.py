@@ -0,0 +1,91 @@
+"""
+Тесты очереди отложенной записи и чтения своих записей в ChatCache.
+"""
+# Импорт необходимых библиотек
+import sqlite3  # Проверка содержимого базы отдельным соединением
+import pytest   # Фикстуры
+
+from utils.cache import ChatCache, WriteBehindQueue  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """База с простой таблицей для проверки очереди записи."""
+    path = str(tmp_path / "queue.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL)')
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def writer(db_path):
+    """Очередь, которая сама не сбрасывает пачку до flush() или close()."""
+    queue = WriteBehindQueue(lambda: sqlite3.connect(db_path), batch_size=1000, flush_interval=60)
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """ChatCache с отложенной записью на временной базе (база создается в текущей директории)."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CACHE_FLUSH_INTERVAL", "60")
+    cache = ChatCache(write_behind=True)
+    yield cache
+    cache.close()
+
+
+def names(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [name for (name,) in conn.execute('SELECT name FROM items ORDER BY id')]
+    finally:
+        conn.close()
+
+
+INSERT = 'INSERT INTO items (name) VALUES (?)'
+
+
+def test_read_your_writes_after_save_message(cache):
+    row_key = cache.save_message("m", "вопрос", "ответ", 10, session_id="s1")
+    assert cache.writer.is_pending(('session', 's1'))
+
+    # Чтение сессии дожидается своей вставки, не дожидаясь таймера пачки
+    assert cache.get_session_messages("s1") == [("вопрос", "ответ")]
+    assert cache.get_last_session_id() == "s1"
+    assert row_key in cache.get_message_ids([row_key])
+
+
+def test_flush_with_key_waits_only_for_own_key(writer, db_path):
+    writer.put(INSERT, ("a",), ("a",))
+
+    # По чужому ключу нет незаписанных операций: возврат без записи пачки
+    assert writer.flush(timeout=0.1, key="b")
+    assert writer.is_pending("a")
+    assert names(db_path) == []
+
+    assert writer.flush(timeout=5, key="a")
+    assert not writer.is_pending("a")
+    assert names(db_path) == ["a"]
+
+
+def test_failing_row_does_not_drop_batch_neighbours(writer, db_path):
+    writer.put(INSERT, ("first",), ("items",))
+    writer.put(INSERT, (None,), ("items",))  # Нарушение NOT NULL
+    writer.put(INSERT, ("third",), ("items",))
+
+    assert writer.flush(timeout=5)
+    assert names(db_path) == ["first", "third"]
+    assert writer.pending == 0
+    assert not writer.is_pending("items")
+
+
+def test_close_drains_queue(writer, db_path):
+    for i in range(50):
+        writer.put(INSERT, (f"row{i}",), ("items",))
+
+    writer.close()
+    assert not writer.thread.is_alive()
+    assert names(db_path) == [f"row{i}" for i in range(50)]
+    assert writer.pending == 0
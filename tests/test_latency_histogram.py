@@ -0,0 +1,126 @@
+"""
+Тесты гистограммы задержек: точность перцентилей, объединение и сериализация.
+"""
+# Импорт необходимых библиотек
+import math    # Бесконечность для пустой гистограммы
+import random  # Генерация задержек
+import pytest  # Проверки
+
+from utils.latency_histogram import LatencyHistogram  # noqa: E402
+
+
+def exact_quantile(values, q):
+    """Точный перцентиль в той же нотации ранга, что и LatencyHistogram.quantile."""
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def sample(n, seed):
+    """Задержки с длинным хвостом: от миллисекунд до десятков секунд."""
+    rng = random.Random(seed)
+    return [rng.lognormvariate(0, 1.5) for _ in range(n)]
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_quantile_within_relative_accuracy(accuracy):
+    values = sample(20000, seed=1)
+    histogram = LatencyHistogram(accuracy)
+    for value in values:
+        histogram.record(value)
+    for q in (0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0):
+        exact = exact_quantile(values, q)
+        assert histogram.quantile(q) == pytest.approx(exact, rel=accuracy)
+
+
+def test_summary_statistics():
+    values = [0.2, 1.5, 3.0, 0.7]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == 4
+    assert histogram.min == 0.2
+    assert histogram.max == 3.0
+    assert histogram.mean == pytest.approx(sum(values) / 4)
+
+
+def test_invalid_values_ignored_and_zeros_counted():
+    histogram = LatencyHistogram()
+    for value in (None, -1.0, float("nan")):
+        histogram.record(value)
+    assert histogram.count == 0
+    assert histogram.quantile(0.5) == 0.0
+
+    histogram.record(0.0)
+    histogram.record(0.0)
+    histogram.record(2.0)
+    assert histogram.zero_count == 2
+    assert histogram.quantile(0.5) == 0.0
+    assert histogram.quantile(1.0) == pytest.approx(2.0, rel=0.01)
+
+
+def test_merge_equals_single_histogram():
+    first, second = sample(5000, seed=2), sample(3000, seed=3)
+    merged = LatencyHistogram()
+    other = LatencyHistogram()
+    combined = LatencyHistogram()
+    for value in first:
+        merged.record(value)
+        combined.record(value)
+    for value in second:
+        other.record(value)
+        combined.record(value)
+
+    merged.merge(other)
+    assert merged.bins == combined.bins
+    assert merged.count == combined.count
+    assert merged.total == pytest.approx(combined.total)
+    assert (merged.min, merged.max) == (combined.min, combined.max)
+    for q in (0.5, 0.9, 0.99):
+        assert merged.quantile(q) == combined.quantile(q)
+
+
+def test_merge_empty_keeps_values():
+    histogram = LatencyHistogram()
+    histogram.record(1.0)
+    histogram.merge(LatencyHistogram())
+    assert histogram.count == 1
+    assert histogram.min == 1.0
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0.01).merge(LatencyHistogram(0.02))
+
+
+def test_json_round_trip():
+    histogram = LatencyHistogram(0.02)
+    for value in sample(2000, seed=4) + [0.0]:
+        histogram.record(value)
+
+    restored = LatencyHistogram.from_json(histogram.to_json())
+    assert restored.accuracy == histogram.accuracy
+    assert restored.bins == histogram.bins
+    assert restored.zero_count == histogram.zero_count
+    assert restored.count == histogram.count
+    assert restored.total == pytest.approx(histogram.total)
+    assert (restored.min, restored.max) == (histogram.min, histogram.max)
+    for q in (0.0, 0.5, 0.99, 1.0):
+        assert restored.quantile(q) == histogram.quantile(q)
+
+
+def test_json_round_trip_empty():
+    restored = LatencyHistogram.from_json(LatencyHistogram().to_json())
+    assert restored.count == 0
+    assert restored.min == math.inf
+    restored.record(0.5)
+    assert restored.min == 0.5
+
+
+def test_restored_histograms_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.1)
+    second.record(10.0)
+    merged = LatencyHistogram.from_json(first.to_json())
+    merged.merge(LatencyHistogram.from_json(second.to_json()))
+    assert merged.count == 2
+    assert merged.quantile(1.0) == pytest.approx(10.0, rel=0.01)
@@ -0,0 +1,201 @@
+"""
+Тесты ограничителя запросов: token bucket, AIMD и отмена в очереди.
+"""
+# Импорт необходимых библиотек
+import asyncio  # Отмена ожидающих задач
+import pytest   # Фикстуры и проверки
+
+from utils import rate_limiter  # noqa: E402
+from utils.rate_limiter import RateLimiter, TokenBucket, DECREASE_COOLDOWN  # noqa: E402
+
+
+class FakeClock:
+    """Управляемые часы вместо модуля time: sleep только сдвигает время."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Подмена времени в модуле ограничителя."""
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", fake)
+    return fake
+
+
+def make_limiter(**kwargs):
+    """Ограничитель без лимитов из окружения."""
+    params = dict(rpm=0, tpm=0, model_rpm=0, model_tpm=0, initial_concurrency=2,
+                  max_concurrency=10, latency_target=0)
+    params.update(kwargs)
+    return RateLimiter(**params)
+
+
+def test_bucket_burst_then_wait(clock):
+    bucket = TokenBucket(60, capacity=2)  # Одна единица в секунду
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_bucket_refill_capped_at_capacity(clock):
+    bucket = TokenBucket(60, capacity=2)
+    bucket.reserve(2)
+    clock.now += 100
+    assert bucket.reserve(2) == 0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_oversized_request_goes_into_debt(clock):
+    bucket = TokenBucket(60, capacity=10)
+    # Полный запас: запрос больше запаса проходит сразу, но списывается целиком
+    assert bucket.reserve(25) == 0
+    assert bucket.tokens == pytest.approx(-15)
+    # Следующий запрос ждет погашения долга
+    assert bucket.reserve(1) == pytest.approx(16.0)
+
+
+def test_bucket_oversized_request_waits_for_full_capacity(clock):
+    bucket = TokenBucket(60, capacity=10)
+    bucket.reserve(4)
+    # Не вечное ожидание: только до полного запаса
+    assert bucket.reserve(25) == pytest.approx(4.0)
+
+
+def test_bucket_refund_capped_at_capacity(clock):
+    bucket = TokenBucket(60, capacity=10)
+    bucket.reserve(3)
+    bucket.reserve(-100)
+    assert bucket.tokens == pytest.approx(10)
+
+
+def test_release_reconciles_against_charged_tokens(clock):
+    limiter = make_limiter(tpm=600)  # Запас 100 токенов
+    lease = limiter.acquire("m", tokens=250)
+    assert lease.charged == [(limiter.tpm, 250)]
+    assert limiter.tpm.tokens == pytest.approx(-150)
+
+    # Фактический расход меньше оценки: возвращается разница со списанным
+    limiter.release(lease, {"total_tokens": 50})
+    assert limiter.tpm.tokens == pytest.approx(50)
+    assert lease.charged == []
+
+
+def test_release_charges_underestimated_tokens(clock):
+    limiter = make_limiter(tpm=600, model_tpm=600)
+    lease = limiter.acquire("m", tokens=10)
+    limiter.release(lease, {"total_tokens": 70})
+    model_tpm = limiter.model_buckets["m"][1]
+    assert limiter.tpm.tokens == pytest.approx(30)
+    assert model_tpm.tokens == pytest.approx(30)
+
+
+def test_retry_does_not_charge_tokens_again(clock):
+    limiter = make_limiter(tpm=600)
+    lease = limiter.acquire("m", tokens=40)
+    limiter.pace(lease)
+    assert limiter.tpm.tokens == pytest.approx(60)
+    assert len(lease.charged) == 1
+
+
+def test_aimd_additive_increase(clock):
+    limiter = make_limiter(initial_concurrency=2, max_concurrency=3)
+    lease = limiter.acquire()
+    limiter.on_response(lease, 200, 0.1)
+    assert limiter.limit == pytest.approx(2.5)
+    limiter.on_response(lease, 200, 0.1)
+    assert limiter.limit == pytest.approx(2.9)
+    for _ in range(10):
+        limiter.on_response(lease, 200, 0.1)
+    assert limiter.limit == 3
+
+
+def test_aimd_decrease_on_throttle_with_cooldown(clock):
+    limiter = make_limiter(initial_concurrency=8)
+    lease = limiter.acquire("m")
+    limiter.on_response(lease, 429, 0.1)
+    assert limiter.limit == 4
+    # Серия 429 от одного всплеска снижает предел один раз
+    limiter.on_response(lease, 429, 0.1)
+    assert limiter.limit == 4
+    clock.now += DECREASE_COOLDOWN
+    limiter.on_response(lease, 429, 0.1)
+    assert limiter.limit == 2
+    assert limiter.get_stats()["throttled"] == 3
+    assert limiter.get_stats()["decreases"] == 2
+
+
+def test_aimd_limit_never_below_one(clock):
+    limiter = make_limiter(initial_concurrency=1)
+    lease = limiter.acquire()
+    limiter.on_response(lease, 429, 0.1)
+    assert limiter.limit == 1
+
+
+def test_aimd_decrease_on_latency(clock):
+    limiter = make_limiter(initial_concurrency=6, latency_target=1.0)
+    lease = limiter.acquire()
+    limiter.on_response(lease, 200, 2.0)
+    assert limiter.limit == 3
+
+
+def test_retry_after_pauses_model(clock):
+    limiter = make_limiter()
+    lease = limiter.acquire("m")
+    limiter.on_response(lease, 429, 0.1, retry_after=5)
+    limiter.release(lease)
+    start = clock.now
+    limiter.release(limiter.acquire("m"))
+    assert clock.now - start == pytest.approx(5)
+    # Другие модели не ждут
+    start = clock.now
+    limiter.release(limiter.acquire("other"))
+    assert clock.now == start
+
+
+def test_cancel_in_queue_removes_waiter():
+    async def scenario():
+        limiter = make_limiter(initial_concurrency=1)
+        first = await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+        assert limiter.get_stats()["queued"] == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.get_stats()["queued"] == 0
+        assert limiter.get_stats()["in_flight"] == 1
+
+        limiter.release(first)
+        assert limiter.get_stats()["in_flight"] == 0
+        lease = await asyncio.wait_for(limiter.acquire_async(), 1)
+        assert lease.granted
+
+    asyncio.run(scenario())
+
+
+def test_cancel_after_wake_releases_slot():
+    async def scenario():
+        limiter = make_limiter(initial_concurrency=1)
+        first = await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+
+        # Место выдано ожидающему, но задача отменена до продолжения
+        limiter.release(first)
+        assert limiter.get_stats()["in_flight"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.get_stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
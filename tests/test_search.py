@@ -0,0 +1,110 @@
+"""
+Тесты полнотекстового поиска: синхронизация FTS5, экранирование запроса и постраничная выдача.
+"""
+# Импорт необходимых библиотек
+import pytest  # Фикстуры
+
+from utils.cache import ChatCache  # noqa: E402
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """ChatCache с синхронной записью на временной базе."""
+    monkeypatch.chdir(tmp_path)
+    return ChatCache(write_behind=False)
+
+
+def found_ids(cache, query, **kwargs):
+    return {result["id"] for result in cache.search(query, **kwargs)["results"]}
+
+
+def all_pages(cache, query, limit, **kwargs):
+    """Обход всех страниц поиска по next_cursor."""
+    pages, cursor = [], None
+    while True:
+        page = cache.search(query, limit=limit, cursor=cursor, **kwargs)
+        pages.append([result["id"] for result in page["results"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_triggers_sync_index_on_insert_and_delete(cache):
+    cache.save_message("m", "как настроить базу", "включите журнал WAL", 10)
+    cache.save_message("m", "другой вопрос", "про кэш ответов", 10)
+    (first_id,) = found_ids(cache, "журнал")
+    assert found_ids(cache, "кэш")
+
+    conn = cache.get_connection()
+    conn.execute('DELETE FROM messages WHERE id = ?', (first_id,))
+    conn.commit()
+    assert found_ids(cache, "журнал") == set()
+    assert found_ids(cache, "кэш")
+
+    cache.clear_history()
+    assert found_ids(cache, "кэш") == set()
+    assert cache.get_connection().execute(
+        "SELECT count(*) FROM messages_fts WHERE messages_fts MATCH 'кэш'").fetchone() == (0,)
+
+
+def test_fts_query_quotes_terms_and_operators():
+    assert ChatCache._fts_query('say "hi" OR NOT x*') == '"say" """hi""" "OR" "NOT" "x*"*'
+    assert ChatCache._fts_query('   ') == ''
+
+
+@pytest.mark.parametrize("query", ['"', 'AND', 'a OR', '(x', 'col:value', 'NEAR(a b)', '-', '^start'])
+def test_search_accepts_fts_syntax_as_text(cache, query):
+    cache.save_message("m", "обычный текст", "ответ", 10)
+    # Спецсимволы не вызывают ошибку синтаксиса FTS5
+    assert cache.search(query)["results"] == []
+
+
+def test_operator_words_match_literally(cache):
+    cache.save_message("m", "cats AND dogs", "ответ", 10)
+    cache.save_message("m", "cats only", "ответ", 10)
+    assert len(found_ids(cache, "cats AND")) == 1
+
+
+@pytest.fixture
+def corpus(cache):
+    """
+    Сообщения двух моделей с разной релевантностью и одинаковыми оценками.
+
+    Returns:
+        dict: Модель (None - все) -> ID сообщений, содержащих "python"
+    """
+    matching = {None: [], "a": [], "b": []}
+    for i in range(23):
+        model = "a" if i % 3 else "b"
+        # Повторы слова меняют оценку BM25, одинаковые тексты дают равные оценки
+        text = " ".join(["python"] * (1 + i % 4) + ["filler"] * (i % 5))
+        row_key = cache.save_message(model, text, "ответ", 10)
+        message_id = cache.get_message_ids([row_key])[row_key]
+        matching[None].append(message_id)
+        matching[model].append(message_id)
+    cache.save_message("a", "без совпадений", "ответ", 10)
+    cache.save_message("b", "тоже мимо", "ответ", 10)
+    return {model: set(ids) for model, ids in matching.items()}
+
+
+@pytest.mark.parametrize("model", [None, "a", "b"])
+@pytest.mark.parametrize("limit", [1, 5, 7, 23])
+def test_keyset_pages_are_disjoint_and_complete(cache, corpus, model, limit):
+    pages = all_pages(cache, "python", limit, model=model)
+    ids = [message_id for page in pages for message_id in page]
+
+    assert len(ids) == len(set(ids))  # Страницы не пересекаются
+    assert set(ids) == corpus[model]
+    assert all(len(page) <= limit for page in pages)
+
+
+def test_pages_follow_rank_order(cache, corpus):
+    ranks, cursor = [], None
+    while True:
+        page = cache.search("python", limit=4, cursor=cursor)
+        ranks.extend((result["rank"], result["id"]) for result in page["results"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(ranks) == len(corpus[None])
+    assert ranks == sorted(ranks)